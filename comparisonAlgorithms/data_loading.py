@@ -1,15 +1,32 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Union
+from typing import Dict, Union
+
+# Numeric OHLCV columns (lower-cased names) and the dtype they are read as
+_PRICE_DTYPES = {'open': 'float64', 'high': 'float64', 'low': 'float64', 'close': 'float64', 'volume': 'float64'}
 
 def load_price_csv(path: Union[str, Path]) -> pd.DataFrame:
     """Load a OHLCV CSV (expects columns: date, open, high, low, close, volume)."""
-    df = pd.read_csv(path)
+    # Header names may be capitalised; map dtypes onto them so read_csv skips inference
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {c: _PRICE_DTYPES[c.lower()] for c in header if c.lower() in _PRICE_DTYPES}
+    df = pd.read_csv(path, dtype=dtypes)
     # Normalize column names
     df.columns = [c.lower() for c in df.columns]
-    # Parse date
+    # Parse date (ISO8601 fast path instead of per-row format inference)
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
+        df['date'] = pd.to_datetime(df['date'], format='ISO8601')
         df = df.sort_values('date')
         df = df.set_index('date')
     return df
+
+
+def price_arrays(df: pd.DataFrame, dtype=np.float32) -> Dict[str, np.ndarray]:
+    """Extract the columns the indicators read (close/high/low) as contiguous arrays.
+
+    float32 halves the memory held for these columns; the indicators upcast them to
+    float64 before running their kernels, and cash/share bookkeeping keeps reading the
+    float64 close column.
+    """
+    return {col: np.ascontiguousarray(df[col].to_numpy(dtype=dtype)) for col in ('close', 'high', 'low')}
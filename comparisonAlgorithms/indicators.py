@@ -1,17 +1,247 @@
 import pandas as pd
 import numpy as np
 
+from tradingagents.utils.njit import njit
+
+# --- Streaming kernels ---
+# Single-pass loops over float64 arrays. NaN handling mirrors pandas:
+# rolling windows require `window` non-NaN observations, EWM (adjust=False) carries
+# its state across NaN gaps.
+
+@njit(cache=True)
+def _sma_nb(x, w):
+    n = x.shape[0]
+    out = np.empty(n)
+    total = 0.0
+    nobs = 0
+    for i in range(n):
+        v = x[i]
+        if v == v:
+            total += v
+            nobs += 1
+        if i >= w:
+            old = x[i - w]
+            if old == old:
+                total -= old
+                nobs -= 1
+        out[i] = total / nobs if nobs >= w else np.nan
+    return out
+
+
+@njit(cache=True)
+def _std_nb(x, w):
+    # Rolling sample std (ddof=1) via Welford add/remove updates
+    n = x.shape[0]
+    out = np.empty(n)
+    mean = 0.0
+    ssqdm = 0.0
+    nobs = 0
+    for i in range(n):
+        v = x[i]
+        if v == v:
+            nobs += 1
+            delta = v - mean
+            mean += delta / nobs
+            ssqdm += delta * (v - mean)
+        if i >= w:
+            old = x[i - w]
+            if old == old:
+                nobs -= 1
+                if nobs:
+                    delta = old - mean
+                    mean -= delta / nobs
+                    ssqdm -= (nobs + 1) * delta * delta / nobs
+                else:
+                    mean = 0.0
+                    ssqdm = 0.0
+        if nobs >= w and nobs > 1:
+            var = ssqdm / (nobs - 1)
+            out[i] = np.sqrt(var) if var > 0.0 else 0.0
+        else:
+            out[i] = np.nan
+    return out
+
+
+@njit(cache=True)
+def _ema_step(weighted, old_wt, cur, alpha):
+    # One adjust=False EWM update; returns the new (weighted, old_wt) state
+    if weighted == weighted:
+        old_wt *= 1.0 - alpha
+        if cur == cur:
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+    elif cur == cur:
+        weighted = cur
+    return weighted, old_wt
+
+
+@njit(cache=True)
+def _ema_nb(x, alpha):
+    n = x.shape[0]
+    out = np.empty(n)
+    weighted = np.nan
+    old_wt = 1.0
+    for i in range(n):
+        weighted, old_wt = _ema_step(weighted, old_wt, x[i], alpha)
+        out[i] = weighted
+    return out
+
+
+@njit(cache=True)
+def _macd_12_26_9_nb(x):
+    # MACD(12, 26, 9) specialised: the three EMA alphas are literals the compiler can
+    # fold, and all three lines come out of one pass with no intermediate arrays.
+    n = x.shape[0]
+    macd_out = np.empty(n)
+    signal_out = np.empty(n)
+    hist_out = np.empty(n)
+    fast = slow = sig = np.nan
+    fast_wt = slow_wt = sig_wt = 1.0
+    for i in range(n):
+        cur = x[i]
+        fast, fast_wt = _ema_step(fast, fast_wt, cur, 2.0 / 13.0)
+        slow, slow_wt = _ema_step(slow, slow_wt, cur, 2.0 / 27.0)
+        m = fast - slow
+        sig, sig_wt = _ema_step(sig, sig_wt, m, 2.0 / 10.0)
+        macd_out[i] = m
+        signal_out[i] = sig
+        hist_out[i] = m - sig
+    return macd_out, signal_out, hist_out
+
+
+@njit(cache=True)
+def _kdj_9_3_3_nb(low, high, close):
+    # KDJ(9, 3, 3) specialised: rsv, K, D and J fused into one pass after the
+    # rolling low/high, with the 1/3 smoothing alphas baked in.
+    n = close.shape[0]
+    low_min, high_max = _rolling_min_max_nb(low, high, 9)
+    k_out = np.empty(n)
+    d_out = np.empty(n)
+    j_out = np.empty(n)
+    k = d = np.nan
+    k_wt = d_wt = 1.0
+    for i in range(n):
+        rng = high_max[i] - low_min[i]
+        if rng != rng:
+            rsv = np.nan
+        elif rng > 0:
+            rsv = (close[i] - low_min[i]) * 100 / rng
+        else:
+            rsv = 50.0  # flat window, see kdj()
+        k, k_wt = _ema_step(k, k_wt, rsv, 1.0 / 3.0)
+        d, d_wt = _ema_step(d, d_wt, k, 1.0 / 3.0)
+        k_out[i] = k
+        d_out[i] = d
+        j_out[i] = 3 * k - 2 * d
+    return k_out, d_out, j_out
+
+
+@njit(cache=True)
+def _rsi_nb(x, period):
+    # Gains and losses share one pass: both running window sums advance together
+    n = x.shape[0]
+    out = np.empty(n)
+    deltas = np.empty(n)
+    g_sum = 0.0
+    l_sum = 0.0
+    nobs = 0
+    for i in range(n):
+        delta = x[i] - x[i - 1] if i > 0 else np.nan
+        deltas[i] = delta
+        if delta == delta:
+            if delta > 0:
+                g_sum += delta
+            else:
+                l_sum -= delta
+            nobs += 1
+        if i >= period:
+            old = deltas[i - period]
+            if old == old:
+                if old > 0:
+                    g_sum -= old
+                else:
+                    l_sum += old
+                nobs -= 1
+        if nobs < period:
+            out[i] = np.nan
+        else:
+            avg_gain = g_sum / nobs
+            avg_loss = l_sum / nobs
+            if avg_loss == 0:
+                out[i] = 100.0 if avg_gain > 0 else np.nan
+            else:
+                out[i] = 100 - (100 / (1 + avg_gain / avg_loss))
+    return out
+
+
+@njit(cache=True)
+def _rolling_min_max_nb(low, high, w):
+    # Monotonic deques (index ring buffers) give O(N) rolling min/max
+    n = low.shape[0]
+    lo_out = np.empty(n)
+    hi_out = np.empty(n)
+    lo_q = np.empty(n, dtype=np.int64)
+    hi_q = np.empty(n, dtype=np.int64)
+    lo_head = lo_tail = 0
+    hi_head = hi_tail = 0
+    lo_obs = hi_obs = 0
+    for i in range(n):
+        lv = low[i]
+        hv = high[i]
+        if lv == lv:
+            lo_obs += 1
+            while lo_tail > lo_head and low[lo_q[lo_tail - 1]] >= lv:
+                lo_tail -= 1
+            lo_q[lo_tail] = i
+            lo_tail += 1
+        if hv == hv:
+            hi_obs += 1
+            while hi_tail > hi_head and high[hi_q[hi_tail - 1]] <= hv:
+                hi_tail -= 1
+            hi_q[hi_tail] = i
+            hi_tail += 1
+        if i >= w:
+            if low[i - w] == low[i - w]:
+                lo_obs -= 1
+            if high[i - w] == high[i - w]:
+                hi_obs -= 1
+        while lo_tail > lo_head and lo_q[lo_head] <= i - w:
+            lo_head += 1
+        while hi_tail > hi_head and hi_q[hi_head] <= i - w:
+            hi_head += 1
+        lo_out[i] = low[lo_q[lo_head]] if lo_obs >= w else np.nan
+        hi_out[i] = high[hi_q[hi_head]] if hi_obs >= w else np.nan
+    return lo_out, hi_out
+
+
+def _values(series) -> np.ndarray:
+    # Kernels index element-wise (e.g. x[i] - x[i-1]), so float32 columns from
+    # price_arrays are upcast here; float64 arrays pass through without a copy.
+    if isinstance(series, np.ndarray):
+        return series.astype(np.float64, copy=False)
+    return series.to_numpy(dtype=np.float64)
+
+
+def _wrap(values: np.ndarray, like):
+    # Series in -> Series out (legacy callers); arrays in -> arrays out (hot path)
+    if isinstance(like, np.ndarray):
+        return values
+    return pd.Series(values, index=like.index)
+
 # --- Helper Moving Averages ---
 
 def sma(series: pd.Series, window: int) -> pd.Series:
-    return series.rolling(window).mean()
+    return _wrap(_sma_nb(_values(series), window), series)
 
 def ema(series: pd.Series, window: int) -> pd.Series:
-    return series.ewm(span=window, adjust=False).mean()
+    return _wrap(_ema_nb(_values(series), 2.0 / (window + 1)), series)
 
 # --- Core Indicators ---
 
 def macd(close: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9):
+    if (fast, slow, signal) == (12, 26, 9):
+        return tuple(_wrap(x, close) for x in _macd_12_26_9_nb(_values(close)))
     fast_ema = ema(close, fast)
     slow_ema = ema(close, slow)
     macd_line = fast_ema - slow_ema
@@ -22,34 +252,41 @@ def macd(close: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9):
 # KDJ (Stochastic + J line)
 
 def kdj(df: pd.DataFrame, period: int = 9, k_smooth: int = 3, d_smooth: int = 3):
-    low_min = df['low'].rolling(period).min()
-    high_max = df['high'].rolling(period).max()
-    rsv = (df['close'] - low_min) * 100 / (high_max - low_min)
-    k = rsv.ewm(alpha=1/k_smooth, adjust=False).mean()
-    d = k.ewm(alpha=1/d_smooth, adjust=False).mean()
+    like = df['close']
+    if (period, k_smooth, d_smooth) == (9, 3, 3):
+        k, d, j = _kdj_9_3_3_nb(_values(df['low']), _values(df['high']), _values(like))
+        return _wrap(k, like), _wrap(d, like), _wrap(j, like)
+    close = _values(df['close'])
+    low_min, high_max = _rolling_min_max_nb(_values(df['low']), _values(df['high']), period)
+    rng = high_max - low_min
+    # Flat windows (high == low) read as mid-range instead of 0/0 NaN, which the EWM
+    # would otherwise carry into K/D/J; warm-up bars stay NaN.
+    rsv = np.where(np.isnan(rng), np.nan, 50.0)
+    ok = rng > 0
+    rsv[ok] = (close[ok] - low_min[ok]) * 100 / rng[ok]
+    k = _ema_nb(rsv, 1 / k_smooth)
+    d = _ema_nb(k, 1 / d_smooth)
     j = 3 * k - 2 * d
-    return k, d, j
+    return _wrap(k, like), _wrap(d, like), _wrap(j, like)
 
 # RSI
 
 def rsi(close: pd.Series, period: int = 14):
-    delta = close.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-    avg_gain = gain.rolling(period).mean()
-    avg_loss = loss.rolling(period).mean()
-    rs = avg_gain / avg_loss
-    rsi_val = 100 - (100 / (1 + rs))
-    return rsi_val
+    # Simple rolling means of gains/losses (not Wilder smoothing), as the rules expect
+    return _wrap(_rsi_nb(_values(close), period), close)
 
 # Z-score Momentum Ratio (simplified example of custom ZMR metric)
 
 def zmr(close: pd.Series, lookback: int = 20):
-    returns = close.pct_change()
-    mean = returns.rolling(lookback).mean()
-    std = returns.rolling(lookback).std()
-    z_score = (returns - mean) / std
-    # Momentum ratio: current z over rolling |z| mean
-    denom = z_score.abs().rolling(lookback).mean()
-    momentum_ratio = z_score / denom
-    return z_score, momentum_ratio
+    values = _values(close)
+    returns = np.empty_like(values)
+    returns[0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = values[1:] / values[:-1] - 1
+        mean = _sma_nb(returns, lookback)
+        std = _std_nb(returns, lookback)
+        z_score = (returns - mean) / std
+        # Momentum ratio: current z over rolling |z| mean
+        denom = _sma_nb(np.abs(z_score), lookback)
+        momentum_ratio = z_score / denom
+    return _wrap(z_score, close), _wrap(momentum_ratio, close)
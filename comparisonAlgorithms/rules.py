@@ -1,129 +1,208 @@
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from enum import IntEnum
+from typing import Optional, Dict, Any, Union
+import numpy as np
 import pandas as pd
 from .indicators import macd, kdj, rsi, zmr, sma
 
+class Decision(IntEnum):
+    """Rule decision as an int code (the same codes the vectorized *_signals emit)."""
+    HOLD = 0
+    BUY = 1
+    SELL = -1
+
+
+# Labels used when decisions are printed or serialized to JSON
+DECISION_LABELS = {Decision.BUY: 'buy', Decision.SELL: 'sell', Decision.HOLD: 'hold'}
+
+
 @dataclass
 class Signal:
     name: str
     value: Any
-    decision: str  # 'buy', 'sell', 'hold'
+    decision: Decision
     rationale: str
 
 
+# --- Last-bar rules ---
+# Thin wrappers that compute just the indicators a rule needs and evaluate the
+# positional variant below at the last bar.
+
+def _arrays(**values) -> Dict[str, np.ndarray]:
+    return {k: np.asarray(v, dtype=np.float64) for k, v in values.items()}
+
+
 def macd_rule(df: pd.DataFrame) -> Optional[Signal]:
     macd_line, signal_line, hist = macd(df['close'])
-    if len(hist.dropna()) < 3:
+    return macd_rule_at(len(df) - 1, _arrays(macd_line=macd_line, signal_line=signal_line, hist=hist))
+
+
+def kdj_rule(df: pd.DataFrame) -> Optional[Signal]:
+    K, D, J = kdj(df)
+    return kdj_rule_at(len(df) - 1, _arrays(K=K, D=D, J=J))
+
+
+def rsi_rule(df: pd.DataFrame, low: int = 30, high: int = 70) -> Optional[Signal]:
+    return rsi_rule_at(len(df) - 1, _arrays(rsi_arr=rsi(df['close'])), low, high)
+
+
+def zmr_rule(df: pd.DataFrame) -> Optional[Signal]:
+    z, mr = zmr(df['close'])
+    return zmr_rule_at(len(df) - 1, _arrays(z=z, mr=mr))
+
+
+def sma_crossover_rule(df: pd.DataFrame, fast: int = 10, slow: int = 30) -> Optional[Signal]:
+    close = df['close']
+    arrays = _arrays(**{f'sma_{fast}': sma(close, fast), f'sma_{slow}': sma(close, slow)})
+    return sma_crossover_rule_at(len(df) - 1, arrays, fast, slow)
+
+
+def kdj_rsi_combo_rule(df: pd.DataFrame) -> Optional[Signal]:
+    """Combined KDJ + RSI rule for confluence-based signals.
+
+    Logic:
+      - Build a score from KDJ cross/overbought/oversold and RSI oversold/overbought/midline crosses.
+      - +1 for each bullish condition, -1 for each bearish condition.
+      - Decision: score >= 1 => buy; score <= -1 => sell; else hold.
+    """
+    K, D, J = kdj(df)
+    return kdj_rsi_combo_rule_at(len(df) - 1, _arrays(K=K, D=D, J=J, rsi_arr=rsi(df['close'])))
+
+
+# --- Positional variants (simulation) ---
+# Indicators are causal, so the value at position i over the full series equals the
+# last value over df.iloc[:i+1]. Computing them once lets the simulator evaluate every
+# day by integer index instead of re-running rolling/ewm over a growing prefix.
+# Every *_rule_at returns None for i < 1, where i-1 would wrap to the last bar.
+
+def precompute_indicators(data: Union[pd.DataFrame, Dict[str, np.ndarray]],
+                          fast: int = 10, slow: int = 30) -> Dict[str, np.ndarray]:
+    """Compute every indicator used by the rules once over the full series.
+
+    data: the OHLCV DataFrame, or the column arrays from data_loading.price_arrays.
+    fast/slow: SMA windows, stored as 'sma_<window>' for the SMA crossover rule.
+    """
+    close = data['close']
+    macd_line, signal_line, hist = macd(close)
+    K, D, J = kdj(data)
+    z, mr = zmr(close)
+    values = {
+        'macd_line': macd_line,
+        'signal_line': signal_line,
+        'hist': hist,
+        'K': K,
+        'D': D,
+        'J': J,
+        'rsi_arr': rsi(close),
+        'z': z,
+        'mr': mr,
+        f'sma_{fast}': sma(close, fast),
+        f'sma_{slow}': sma(close, slow),
+    }
+    return _arrays(**values)
+
+
+def macd_rule_at(i: int, arrays: Dict[str, np.ndarray]) -> Optional[Signal]:
+    m, s, h = arrays['macd_line'], arrays['signal_line'], arrays['hist']
+    if i < 2:
         return None
-    # Classic crossover conditions
-    cross_up = macd_line.iloc[-2] < signal_line.iloc[-2] and macd_line.iloc[-1] > signal_line.iloc[-1]
-    cross_down = macd_line.iloc[-2] > signal_line.iloc[-2] and macd_line.iloc[-1] < signal_line.iloc[-1]
-    # Additional momentum conditions to increase trade frequency
-    hist_rising = hist.iloc[-3] < hist.iloc[-2] < hist.iloc[-1]
-    hist_falling = hist.iloc[-3] > hist.iloc[-2] > hist.iloc[-1]
-    zero_cross_up = hist.iloc[-2] < 0 <= hist.iloc[-1]
-    zero_cross_down = hist.iloc[-2] > 0 >= hist.iloc[-1]
+    cross_up = m[i-1] < s[i-1] and m[i] > s[i]
+    cross_down = m[i-1] > s[i-1] and m[i] < s[i]
+    hist_rising = h[i-2] < h[i-1] < h[i]
+    hist_falling = h[i-2] > h[i-1] > h[i]
+    zero_cross_up = h[i-1] < 0 <= h[i]
+    zero_cross_down = h[i-1] > 0 >= h[i]
 
     if cross_up or zero_cross_up or hist_rising:
-        return Signal('MACD', float(hist.iloc[-1]), 'buy',
+        return Signal('MACD', float(h[i]), Decision.BUY,
                       'MACD bullish (crossover/zero-cross/momentum rising)')
     if cross_down or zero_cross_down or hist_falling:
-        return Signal('MACD', float(hist.iloc[-1]), 'sell',
+        return Signal('MACD', float(h[i]), Decision.SELL,
                       'MACD bearish (crossover/zero-cross/momentum falling)')
-    return Signal('MACD', float(hist.iloc[-1]), 'hold', 'MACD mixed')
+    return Signal('MACD', float(h[i]), Decision.HOLD, 'MACD mixed')
 
 
-def kdj_rule(df: pd.DataFrame) -> Optional[Signal]:
-    K, D, J = kdj(df)
-    if K.isna().iloc[-1] or D.isna().iloc[-1]:
+def kdj_rule_at(i: int, arrays: Dict[str, np.ndarray]) -> Optional[Signal]:
+    K, D, J = arrays['K'], arrays['D'], arrays['J']
+    if i < 1 or np.isnan(K[i]) or np.isnan(D[i]):
         return None
-    # Crossover logic (increases frequency)
-    k_cross_up = K.iloc[-2] < D.iloc[-2] and K.iloc[-1] > D.iloc[-1]
-    k_cross_down = K.iloc[-2] > D.iloc[-2] and K.iloc[-1] < D.iloc[-1]
-    overbought = K.iloc[-1] > 80 and D.iloc[-1] > 80
-    oversold = K.iloc[-1] < 20 and D.iloc[-1] < 20
-    if k_cross_up or (oversold and J.iloc[-1] < 10):
-        return Signal('KDJ', float(J.iloc[-1]), 'buy', 'K%D bullish crossover / oversold rebound')
-    if k_cross_down or (overbought and J.iloc[-1] > 90):
-        return Signal('KDJ', float(J.iloc[-1]), 'sell', 'K%D bearish crossover / overbought fade')
-    return Signal('KDJ', float(J.iloc[-1]), 'hold', 'KDJ neutral')
+    k_cross_up = K[i-1] < D[i-1] and K[i] > D[i]
+    k_cross_down = K[i-1] > D[i-1] and K[i] < D[i]
+    overbought = K[i] > 80 and D[i] > 80
+    oversold = K[i] < 20 and D[i] < 20
+    if k_cross_up or (oversold and J[i] < 10):
+        return Signal('KDJ', float(J[i]), Decision.BUY, 'K%D bullish crossover / oversold rebound')
+    if k_cross_down or (overbought and J[i] > 90):
+        return Signal('KDJ', float(J[i]), Decision.SELL, 'K%D bearish crossover / overbought fade')
+    return Signal('KDJ', float(J[i]), Decision.HOLD, 'KDJ neutral')
 
 
-def rsi_rule(df: pd.DataFrame, low: int = 30, high: int = 70) -> Optional[Signal]:
-    val = rsi(df['close'])
-    if val.isna().iloc[-1]:
+def rsi_rule_at(i: int, arrays: Dict[str, np.ndarray], low: int = 30, high: int = 70) -> Optional[Signal]:
+    if i < 1:
+        return None
+    val = arrays['rsi_arr']
+    current = val[i]
+    if np.isnan(current):
         return None
-    current = val.iloc[-1]
-    # Midline (50) cross signals to increase activity
-    mid_cross_up = val.iloc[-2] < 50 <= current
-    mid_cross_down = val.iloc[-2] > 50 >= current
-    if current < low or mid_cross_up and current < 55:  # allow early buy when regaining strength
-        return Signal('RSI', float(current), 'buy', 'RSI oversold or crossing above 50')
-    if current > high or mid_cross_down and current > 45:  # early sell when weakening
-        return Signal('RSI', float(current), 'sell', 'RSI overbought or dropping below 50')
-    return Signal('RSI', float(current), 'hold', 'RSI neutral')
+    mid_cross_up = val[i-1] < 50 <= current
+    mid_cross_down = val[i-1] > 50 >= current
+    if current < low or mid_cross_up and current < 55:
+        return Signal('RSI', float(current), Decision.BUY, 'RSI oversold or crossing above 50')
+    if current > high or mid_cross_down and current > 45:
+        return Signal('RSI', float(current), Decision.SELL, 'RSI overbought or dropping below 50')
+    return Signal('RSI', float(current), Decision.HOLD, 'RSI neutral')
 
 
-def zmr_rule(df: pd.DataFrame) -> Optional[Signal]:
-    z_score, momentum_ratio = zmr(df['close'])
-    if momentum_ratio.isna().iloc[-1]:
+def zmr_rule_at(i: int, arrays: Dict[str, np.ndarray]) -> Optional[Signal]:
+    if i < 1:
+        return None
+    mr = arrays['mr'][i]
+    if np.isnan(mr):
         return None
-    mr = momentum_ratio.iloc[-1]
-    # Lower thresholds for more frequent trades
     if mr > 0.5:
-        return Signal('ZMR', float(mr), 'buy', 'Momentum positive (ZMR > 0.5)')
+        return Signal('ZMR', float(mr), Decision.BUY, 'Momentum positive (ZMR > 0.5)')
     if mr < -0.5:
-        return Signal('ZMR', float(mr), 'sell', 'Momentum negative (ZMR < -0.5)')
-    return Signal('ZMR', float(mr), 'hold', 'Momentum neutral band')
+        return Signal('ZMR', float(mr), Decision.SELL, 'Momentum negative (ZMR < -0.5)')
+    return Signal('ZMR', float(mr), Decision.HOLD, 'Momentum neutral band')
 
 
-def sma_crossover_rule(df: pd.DataFrame, fast: int = 10, slow: int = 30) -> Optional[Signal]:
+def sma_crossover_rule_at(i: int, arrays: Dict[str, np.ndarray], fast: int = 10, slow: int = 30) -> Optional[Signal]:
     # Shorter windows for higher signal frequency
-    if len(df) < slow + 5:
+    if i < 1 or i + 1 < slow + 5:
         return None
-    fast_ma = sma(df['close'], fast)
-    slow_ma = sma(df['close'], slow)
-    spread = fast_ma.iloc[-1] - slow_ma.iloc[-1]
-    prev_spread = fast_ma.iloc[-2] - slow_ma.iloc[-2]
+    fast_ma, slow_ma = arrays[f'sma_{fast}'], arrays[f'sma_{slow}']
+    spread = fast_ma[i] - slow_ma[i]
+    prev_spread = fast_ma[i-1] - slow_ma[i-1]
     cross_up = prev_spread < 0 and spread > 0
     cross_down = prev_spread > 0 and spread < 0
-    widening_bull = spread > 0 and spread > prev_spread * 1.05  # fast pulling away upward
-    widening_bear = spread < 0 and spread < prev_spread * 1.05  # fast pulling away downward (more negative)
+    widening_bull = spread > 0 and spread > prev_spread * 1.05
+    widening_bear = spread < 0 and spread < prev_spread * 1.05
     if cross_up or widening_bull:
-        return Signal(f'SMA_{fast}_{slow}', float(spread), 'buy', 'Fast SMA bullish (cross/widening)')
+        return Signal(f'SMA_{fast}_{slow}', float(spread), Decision.BUY, 'Fast SMA bullish (cross/widening)')
     if cross_down or widening_bear:
-        return Signal(f'SMA_{fast}_{slow}', float(spread), 'sell', 'Fast SMA bearish (cross/widening)')
-    return Signal(f'SMA_{fast}_{slow}', float(spread), 'hold', 'SMA neutral')
+        return Signal(f'SMA_{fast}_{slow}', float(spread), Decision.SELL, 'Fast SMA bearish (cross/widening)')
+    return Signal(f'SMA_{fast}_{slow}', float(spread), Decision.HOLD, 'SMA neutral')
 
 
-def kdj_rsi_combo_rule(df: pd.DataFrame) -> Optional[Signal]:
-    """Combined KDJ + RSI rule for confluence-based signals.
-
-    Logic:
-      - Build a score from KDJ cross/overbought/oversold and RSI oversold/overbought/midline crosses.
-      - +1 for each bullish condition, -1 for each bearish condition.
-      - Decision: score >= 1 => buy; score <= -1 => sell; else hold.
-    """
-    K, D, J = kdj(df)
-    r = rsi(df['close'])
-    if K.isna().iloc[-1] or D.isna().iloc[-1] or r.isna().iloc[-1]:
+def kdj_rsi_combo_rule_at(i: int, arrays: Dict[str, np.ndarray]) -> Optional[Signal]:
+    """Positional counterpart of kdj_rsi_combo_rule (same scoring)."""
+    K, D, J, r = arrays['K'], arrays['D'], arrays['J'], arrays['rsi_arr']
+    if i < 1 or np.isnan(K[i]) or np.isnan(D[i]) or np.isnan(r[i]):
         return None
     score = 0
     notes = []
 
-    # KDJ signals
-    k_cross_up = K.iloc[-2] < D.iloc[-2] and K.iloc[-1] > D.iloc[-1]
-    k_cross_down = K.iloc[-2] > D.iloc[-2] and K.iloc[-1] < D.iloc[-1]
-    overbought = K.iloc[-1] > 80 and D.iloc[-1] > 80
-    oversold = K.iloc[-1] < 20 and D.iloc[-1] < 20
-    if k_cross_up or (oversold and J.iloc[-1] < 10):
+    k_cross_up = K[i-1] < D[i-1] and K[i] > D[i]
+    k_cross_down = K[i-1] > D[i-1] and K[i] < D[i]
+    overbought = K[i] > 80 and D[i] > 80
+    oversold = K[i] < 20 and D[i] < 20
+    if k_cross_up or (oversold and J[i] < 10):
         score += 1; notes.append('KDJ bullish')
-    if k_cross_down or (overbought and J.iloc[-1] > 90):
+    if k_cross_down or (overbought and J[i] > 90):
         score -= 1; notes.append('KDJ bearish')
 
-    # RSI signals
-    r_curr = r.iloc[-1]
-    r_prev = r.iloc[-2]
+    r_curr = r[i]
+    r_prev = r[i-1]
     r_mid_cross_up = r_prev < 50 <= r_curr
     r_mid_cross_down = r_prev > 50 >= r_curr
     if r_curr < 30 or (r_mid_cross_up and r_curr < 55):
@@ -132,26 +211,105 @@ def kdj_rsi_combo_rule(df: pd.DataFrame) -> Optional[Signal]:
         score -= 1; notes.append('RSI bearish')
 
     if score >= 1:
-        decision = 'buy'
+        decision = Decision.BUY
     elif score <= -1:
-        decision = 'sell'
+        decision = Decision.SELL
     else:
-        decision = 'hold'
-    # Value: average of normalized J (scaled ~0-1 via /100) and RSI/100
-    value = (min(max(J.iloc[-1]/100.0, -1), 2) + r_curr/100.0) / 2
+        decision = Decision.HOLD
+    value = (min(max(J[i]/100.0, -1), 2) + r_curr/100.0) / 2
     rationale = ' | '.join(notes) if notes else 'No clear combined signal'
     return Signal('KDJ_RSI', float(value), decision, rationale)
 
 
+# --- Vectorized signals (simulation) ---
+# Each *_signals function returns an int8 Decision code per bar (HOLD also covers
+# insufficient data), matching the corresponding *_rule_at evaluated at every position.
+
+
+def _prev(x: np.ndarray, lag: int = 1) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    out[lag:] = x[:-lag]
+    return out
+
+
+def _decisions(buy: np.ndarray, sell: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    # Buy conditions take precedence over sell conditions, as in the rule functions
+    out = np.where(buy, Decision.BUY, np.where(sell, Decision.SELL, Decision.HOLD)).astype(np.int8)
+    out[~valid] = Decision.HOLD
+    # Bar 0 has no previous bar; the *_rule_at functions return None there
+    out[:1] = Decision.HOLD
+    return out
+
+
+def macd_signals(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    m, s, h = arrays['macd_line'], arrays['signal_line'], arrays['hist']
+    m1, s1, h1, h2 = _prev(m), _prev(s), _prev(h), _prev(h, 2)
+    buy = ((m1 < s1) & (m > s)) | ((h1 < 0) & (0 <= h)) | ((h2 < h1) & (h1 < h))
+    sell = ((m1 > s1) & (m < s)) | ((h1 > 0) & (0 >= h)) | ((h2 > h1) & (h1 > h))
+    valid = np.arange(len(h)) >= 2
+    return _decisions(buy, sell, valid)
+
+
+def _kdj_conditions(arrays: Dict[str, np.ndarray]):
+    K, D, J = arrays['K'], arrays['D'], arrays['J']
+    K1, D1 = _prev(K), _prev(D)
+    overbought = (K > 80) & (D > 80)
+    oversold = (K < 20) & (D < 20)
+    bull = ((K1 < D1) & (K > D)) | (oversold & (J < 10))
+    bear = ((K1 > D1) & (K < D)) | (overbought & (J > 90))
+    return bull, bear, ~np.isnan(K) & ~np.isnan(D)
+
+
+def _rsi_conditions(arrays: Dict[str, np.ndarray], low: int = 30, high: int = 70):
+    r = arrays['rsi_arr']
+    r1 = _prev(r)
+    bull = (r < low) | ((r1 < 50) & (50 <= r) & (r < 55))
+    bear = (r > high) | ((r1 > 50) & (50 >= r) & (r > 45))
+    return bull, bear, ~np.isnan(r)
+
+
+def kdj_signals(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    return _decisions(*_kdj_conditions(arrays))
+
+
+def rsi_signals(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    return _decisions(*_rsi_conditions(arrays))
+
+
+def zmr_signals(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    mr = arrays['mr']
+    return _decisions(mr > 0.5, mr < -0.5, ~np.isnan(mr))
+
+
+def sma_crossover_signals(arrays: Dict[str, np.ndarray], fast: int = 10, slow: int = 30) -> np.ndarray:
+    spread = arrays[f'sma_{fast}'] - arrays[f'sma_{slow}']
+    prev_spread = _prev(spread)
+    buy = ((prev_spread < 0) & (spread > 0)) | ((spread > 0) & (spread > prev_spread * 1.05))
+    sell = ((prev_spread > 0) & (spread < 0)) | ((spread < 0) & (spread < prev_spread * 1.05))
+    valid = np.arange(len(spread)) + 1 >= slow + 5
+    return _decisions(buy, sell, valid)
+
+
+def kdj_rsi_combo_signals(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    k_bull, k_bear, k_valid = _kdj_conditions(arrays)
+    r_bull, r_bear, r_valid = _rsi_conditions(arrays)
+    score = (k_bull.astype(np.int8) - k_bear.astype(np.int8)
+             + r_bull.astype(np.int8) - r_bear.astype(np.int8))
+    return _decisions(score >= 1, score <= -1, k_valid & r_valid)
+
+
 def evaluate_all_rules(df: pd.DataFrame) -> Dict[str, Signal]:
-    """Run all rule functions and return their signals."""
-    rules = [macd_rule, kdj_rule, rsi_rule, zmr_rule, sma_crossover_rule, kdj_rsi_combo_rule]
+    """Run all rule functions and return their signals.
+
+    Indicators are computed once and shared (KDJ and RSI each feed two rules), then
+    every rule is evaluated at the last bar.
+    """
+    indicators = precompute_indicators(df)
+    last = len(df) - 1
+    rules = [macd_rule_at, kdj_rule_at, rsi_rule_at, zmr_rule_at, sma_crossover_rule_at, kdj_rsi_combo_rule_at]
     results: Dict[str, Signal] = {}
     for rule in rules:
-        try:
-            sig = rule(df)
-        except TypeError:
-            sig = rule(df)  # fallback
+        sig = rule(last, indicators)
         if sig:
             results[sig.name] = sig
     return results
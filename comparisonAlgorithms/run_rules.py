@@ -1,36 +1,107 @@
 import argparse
 from pathlib import Path
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
-from .data_loading import load_price_csv
+from tradingagents.utils.njit import njit
+from .data_loading import load_price_csv, price_arrays
 from .rules import (
-    macd_rule,
-    kdj_rule,
-    rsi_rule,
-    zmr_rule,
-    sma_crossover_rule,
-    kdj_rsi_combo_rule,  # added
+    DECISION_LABELS,
+    Decision,
+    precompute_indicators,
+    macd_signals,
+    kdj_signals,
+    rsi_signals,
+    zmr_signals,
+    sma_crossover_signals,
+    kdj_rsi_combo_signals,  # added
 )
 
+# Vectorized rules: fn(indicators) -> int8 Decision code per bar, indicators computed once
 RULES = {
-    "MACD": macd_rule,
-    # "KDJ": kdj_rule,
-    # "RSI": rsi_rule,
-    "ZMR": zmr_rule,
-    "SMA": sma_crossover_rule,
-    "KDJ_RSI": kdj_rsi_combo_rule,  # combined confluence rule
+    "MACD": macd_signals,
+    # "KDJ": kdj_signals,
+    # "RSI": rsi_signals,
+    "ZMR": zmr_signals,
+    "SMA": sma_crossover_signals,
+    "KDJ_RSI": kdj_rsi_combo_signals,  # combined confluence rule
 }
 
 
-def simulate_rule(name: str, rule_fn, df: pd.DataFrame, start_date: str, days: int, budget: float,
-                  position_step: float = 0.25):
-    """Simulate one rule over a window with incremental scaling.
+@njit(cache=True)
+def _run_sim(decisions, close, budget, step):
+    """Cash/share bookkeeping for K rules at once over Decision codes decisions[K, N].
 
+    All rules step through the days together so each close is read once per day.
+    Returns per-rule, per-day (equity, cash, shares, target_position) arrays and trade counts.
+    """
+    k, n = decisions.shape
+    equity = np.empty((k, n))
+    cash_arr = np.empty((k, n))
+    shares_arr = np.empty((k, n), dtype=np.int64)
+    target_arr = np.empty((k, n))
+    cash = np.full(k, budget)
+    shares = np.zeros(k, dtype=np.int64)
+    trades = np.zeros(k, dtype=np.int64)
+    target = np.zeros(k)  # 0..1 fraction of capital deployed
+    for i in range(n):
+        close_price = close[i]
+        for r in range(k):
+            # Adjust target position fraction; hold => no change
+            if decisions[r, i] == Decision.BUY:
+                target[r] = min(1.0, target[r] + step)
+            elif decisions[r, i] == Decision.SELL:
+                target[r] = max(0.0, target[r] - step)
+
+            if target[r] == 0.0 and shares[r] == 0:
+                # Flat and staying flat (no buy yet, or sells while out): nothing to size
+                equity[r, i] = cash[r]
+                cash_arr[r, i] = cash[r]
+                shares_arr[r, i] = 0
+                target_arr[r, i] = 0.0
+                continue
+
+            # Compute desired shares based on target position and current equity
+            current_equity = cash[r] + shares[r] * close_price
+            desired_value = target[r] * current_equity
+            desired_shares = int(desired_value // close_price) if close_price > 0 else 0
+
+            if desired_shares > shares[r]:  # need to buy more
+                add_shares = desired_shares - shares[r]
+                cost = add_shares * close_price
+                if cost > cash[r]:  # adjust to available cash
+                    add_shares = int(cash[r] // close_price)
+                    cost = add_shares * close_price
+                if add_shares > 0:
+                    shares[r] += add_shares
+                    cash[r] -= cost
+                    trades[r] += 1
+            elif desired_shares < shares[r]:  # need to sell some
+                sell_shares = shares[r] - desired_shares
+                shares[r] -= sell_shares
+                cash[r] += sell_shares * close_price
+                trades[r] += 1
+
+            equity[r, i] = cash[r] + shares[r] * close_price
+            cash_arr[r, i] = cash[r]
+            shares_arr[r, i] = shares[r]
+            target_arr[r, i] = target[r]
+    return equity, cash_arr, shares_arr, target_arr, trades
+
+
+def simulate_rules(rules, df: pd.DataFrame, start_date: str, days: int, budget: float,
+                   position_step: float = 0.25, equity_curve: bool = True):
+    """Simulate several rules over the same window with incremental scaling.
+
+    rules: mapping of name -> vectorized rule ``fn(indicators) -> int8 decisions``.
+    Indicators are computed once over df and shared; the bookkeeping for every rule runs
+    in a single fused ``_run_sim`` pass.
     position_step: fraction of capital to add/remove on each buy/sell signal (default 0.25).
     This increases trade frequency compared to all-in/all-out logic.
+    equity_curve: build the per-day list of dicts (only needed for JSON output); when
+    False the result's 'equity_curve' is None.
     """
     # Ensure datetime index
     if not isinstance(df.index, pd.DatetimeIndex):
@@ -41,87 +112,63 @@ def simulate_rule(name: str, rule_fn, df: pd.DataFrame, start_date: str, days: i
     except ValueError as e:
         raise ValueError(f"Invalid start_date format: {e}") from e
 
-    window_mask = df.index >= pd.Timestamp(start_date)
-    window_index = df.index[window_mask]
-    window_dates = window_index[:days]
-    if len(window_dates) < days:
-        raise ValueError(f"Not enough trading days after {start_date} (needed {days}, have {len(window_dates)})")
-
-    cash = budget
-    shares = 0
-    trades = 0
-    target_position = 0.0  # 0..1 fraction of capital deployed
-    equity_curve = []
-
-    for day in window_dates:
-        day_df = df.loc[:day]
-        close_price = float(day_df['close'].iloc[-1])
-        # Get signal (may be None early due to insufficient data)
-        try:
-            signal = rule_fn(day_df)
-        except Exception as e:
-            # If rule raises, treat as hold
-            signal = None
-        decision = signal.decision if signal else 'hold'
-
-        # Adjust target position fraction
-        if decision == 'buy':
-            target_position = min(1.0, target_position + position_step)
-        elif decision == 'sell':
-            target_position = max(0.0, target_position - position_step)
-        # hold => no change
-
-        # Compute desired shares based on target position and current equity
-        current_equity = cash + shares * close_price
-        desired_value = target_position * current_equity
-        desired_shares = int(desired_value // close_price) if close_price > 0 else 0
-
-        if desired_shares > shares:  # need to buy more
-            add_shares = desired_shares - shares
-            cost = add_shares * close_price
-            if cost > cash:  # adjust to available cash
-                add_shares = int(cash // close_price)
-                cost = add_shares * close_price
-            if add_shares > 0:
-                shares += add_shares
-                cash -= cost
-                trades += 1
-        elif desired_shares < shares:  # need to sell some
-            sell_shares = shares - desired_shares
-            proceeds = sell_shares * close_price
-            if sell_shares > 0:
-                shares -= sell_shares
-                cash += proceeds
-                trades += 1
-
-        equity = cash + shares * close_price
-        equity_curve.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'equity': equity,
-            'cash': cash,
-            'shares': shares,
-            'close': close_price,
-            'decision': decision,
-            'target_position': target_position,
+    # Binary search on the sorted index; the window is a contiguous position range
+    start_pos = int(df.index.searchsorted(pd.Timestamp(start_date), side='left'))
+    end_pos = start_pos + days
+    if end_pos > len(df):
+        raise ValueError(f"Not enough trading days after {start_date} (needed {days}, have {len(df) - start_pos})")
+    window_dates = df.index[start_pos:end_pos]
+
+    # float64 so the signals match the ones computed from the DataFrame itself
+    indicators = precompute_indicators(price_arrays(df, dtype=np.float64))
+    close_np = df['close'].to_numpy(dtype=np.float64)
+    names = list(rules)
+    decisions = np.stack([rules[name](indicators)[start_pos:end_pos] for name in names])
+    equity, cash, shares, target, trades = _run_sim(decisions, close_np[start_pos:end_pos],
+                                                    float(budget), float(position_step))
+
+    # Format every window date once (vectorized) rather than strftime per row per rule
+    date_strs = window_dates.strftime('%Y-%m-%d').tolist() if equity_curve else None
+
+    results = []
+    for r, name in enumerate(names):
+        curve = None
+        if equity_curve:
+            # Columns -> row dicts once, at the end (bulk tolist() instead of per-cell casts)
+            curve = [
+                {
+                    'date': day,
+                    'equity': eq,
+                    'cash': c,
+                    'shares': sh,
+                    'close': px,
+                    'decision': DECISION_LABELS[code],
+                    'target_position': tp,
+                }
+                for day, eq, c, sh, px, code, tp in zip(
+                    date_strs, equity[r].tolist(), cash[r].tolist(), shares[r].tolist(),
+                    close_np[start_pos:end_pos].tolist(), decisions[r].tolist(), target[r].tolist())
+            ]
+
+        final_equity = float(equity[r, -1])
+        results.append({
+            'rule': name,
+            'start_date': start_date,
+            'days': days,
+            'initial_budget': budget,
+            'final_equity': final_equity,
+            'return_pct': (final_equity / budget - 1.0) * 100.0,
+            'trades': int(trades[r]),
+            'holding_shares': int(shares[r, -1]),
+            'equity_curve': curve,
         })
+    return results
 
-    final_close = df.at[window_dates[-1], 'close']
-    try:
-        final_price = float(final_close)
-    except (TypeError, ValueError):
-        final_price = float(pd.to_numeric(final_close))
-    final_equity = cash + shares * final_price
-    return {
-        'rule': name,
-        'start_date': start_date,
-        'days': days,
-        'initial_budget': budget,
-        'final_equity': final_equity,
-        'return_pct': (final_equity / budget - 1.0) * 100.0,
-        'trades': trades,
-        'holding_shares': shares,
-        'equity_curve': equity_curve,
-    }
+
+def simulate_rule(name: str, rule_fn, df: pd.DataFrame, start_date: str, days: int, budget: float,
+                  position_step: float = 0.25, equity_curve: bool = True):
+    """Simulate one rule over a window with incremental scaling (see simulate_rules)."""
+    return simulate_rules({name: rule_fn}, df, start_date, days, budget, position_step, equity_curve)[0]
 
 
 def run_single_snapshot(df: pd.DataFrame):
@@ -130,18 +177,15 @@ def run_single_snapshot(df: pd.DataFrame):
     signals = evaluate_all_rules(df)
     print("Signals (single snapshot):")
     for name, sig in signals.items():
-        print(f"{name}: decision={sig.decision} value={sig.value:.4f} rationale={sig.rationale}")
-    return {k: sig.__dict__ for k, sig in signals.items()}
+        print(f"{name}: decision={DECISION_LABELS[sig.decision]} value={sig.value:.4f} rationale={sig.rationale}")
+    return {k: {**sig.__dict__, 'decision': DECISION_LABELS[sig.decision]} for k, sig in signals.items()}
 
 
-def run_parallel_simulation(df: pd.DataFrame, start_date: str, days: int, budget: float, max_workers: int | None):
-    futures = []
-    results = []
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        for name, fn in RULES.items():
-            futures.append(ex.submit(simulate_rule, name, fn, df, start_date, days, budget))
-        for fut in as_completed(futures):
-            results.append(fut.result())
+def run_parallel_simulation(df: pd.DataFrame, start_date: str, days: int, budget: float,
+                            equity_curve: bool = True):
+    # All rules share one indicator pass and one fused bookkeeping kernel, which is
+    # cheaper than shipping the frame to worker processes.
+    results = simulate_rules(RULES, df, start_date, days, budget, equity_curve=equity_curve)
     # Sort results by return descending
     results.sort(key=lambda r: r['return_pct'], reverse=True)
     return results
@@ -154,14 +198,14 @@ def main():
     parser.add_argument("--start-date", dest="start_date", help="Start date YYYY-MM-DD for 30-day (or --days) simulation; if omitted runs single snapshot")
     parser.add_argument("--days", type=int, default=30, help="Number of trading days to simulate (default 30)")
     parser.add_argument("--budget", type=float, default=1000000.0, help="Initial budget (default 1000000)")
-    parser.add_argument("--workers", type=int, default=None, help="Parallel worker threads (default len(rules))")
     args = parser.parse_args()
 
     df = load_price_csv(args.csv)
 
     if args.start_date:
-        max_workers = args.workers or len(RULES)
-        sim_results = run_parallel_simulation(df, args.start_date, args.days, args.budget, max_workers)
+        # The per-day equity curve only ends up in the JSON output
+        sim_results = run_parallel_simulation(df, args.start_date, args.days, args.budget,
+                                              equity_curve=bool(args.out))
         print(f"\nSimulation Results ({args.days} days starting {args.start_date}, budget {args.budget:,.2f}):")
         for r in sim_results:
             print(f"{r['rule']}: final_equity={r['final_equity']:,.2f} return={r['return_pct']:.2f}% trades={r['trades']} shares={r['holding_shares']}")
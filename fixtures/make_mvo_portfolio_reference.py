@@ -0,0 +1,84 @@
+"""Regenerate fixtures/mvo_portfolio_reference.json.
+
+The expected results come from the original dict-based testing/mvo/portfolio.py,
+read out of git at the baseline revision, so the fixture keeps pinning the
+behaviour the optimised versions have to reproduce.
+
+Usage: python fixtures/make_mvo_portfolio_reference.py [--rev REV] [--cases N]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT = os.path.join(ROOT, "fixtures", "mvo_portfolio_reference.json")
+
+
+def _baseline_rev():
+    out = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stdout.split()
+    return out[-1]
+
+
+def load_portfolio_module(rev):
+    source = subprocess.run(["git", "show", f"{rev}:testing/mvo/portfolio.py"], cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    module = types.ModuleType("baseline_portfolio")
+    exec(compile(source, f"{rev}:testing/mvo/portfolio.py", "exec"), module.__dict__)
+    return module
+
+
+def make_case(rng):
+    names = [f"T{i}" for i in range(rng.randint(3, 9))]
+    portfolio = {}
+    for t in rng.sample(names, rng.randint(0, len(names))):
+        portfolio[t] = {
+            "totalAmount": rng.choice([0, 1, 3, 10, 50, 120, 400]),
+            "last_price": round(rng.uniform(5, 300), 2),
+            "entry_price": round(rng.uniform(5, 300), 2),
+        }
+    cash = rng.choice([0.0, 1000.0, 25000.0, 250000.0, -5000.0, -60000.0, round(rng.uniform(-1e4, 1e5), 2)])
+    # Most tickers are priced, some are quoted at zero and the rest are missing
+    prices = {}
+    for t in names:
+        r = rng.random()
+        if r < 0.75:
+            prices[t] = round(rng.uniform(5, 300), 2)
+        elif r < 0.85:
+            prices[t] = 0.0
+    weights = {t: round(rng.uniform(-0.1, 0.6), 4) for t in rng.sample(names, rng.randint(1, len(names)))}
+    return {"snapshot": {"portfolio": portfolio, "cash": cash}, "prices": prices, "weights": weights}
+
+
+def expected_for(module, case):
+    snapshot, changes = module.apply_partial_target_weights(
+        json.loads(json.dumps(case["snapshot"])), case["prices"], case["weights"])
+    forced = module.force_cash_non_negative(json.loads(json.dumps(case["snapshot"])), case["prices"])
+    return {"partial": {"snapshot": snapshot, "changes": [list(c) for c in changes]}, "forced": forced}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rev", default=None, help="revision holding the reference portfolio.py (default: root commit)")
+    parser.add_argument("--cases", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=OUT)
+    args = parser.parse_args()
+
+    module = load_portfolio_module(args.rev or _baseline_rev())
+    rng = random.Random(args.seed)
+    cases = []
+    for _ in range(args.cases):
+        case = make_case(rng)
+        cases.append({**case, "expected": expected_for(module, case)})
+    with open(args.out, "w") as f:
+        json.dump(cases, f, indent=1)
+    print(f"Wrote {len(cases)} cases to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import argparse
-import json
-import os
+import atexit
+import bisect
+import functools
+import re
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
 
 try:
     import pandas_market_calendars as mcal  # type: ignore
@@ -14,10 +20,16 @@ except Exception:
 import yfinance as yf  # fallback only
 
 from tradingagents.agents.managers.MVO_BLM.pipeline import size_positions
-from tradingagents.dataflows import interface as data_interface
+from tradingagents.dataflows.json_io import dumps_json, read_json, write_atomic
+from tradingagents.dataflows.price_cache import cached_close_price
 from tradingagents.default_config import DEFAULT_CONFIG
 
 
+_TICKER_SEP_RE = re.compile(r"[\s,]+")
+# Reports that only belong in rebalance-day output folders
+_REBALANCE_REPORTS = ("resizingReport.md", "portfolio_optimizer_report.md")
+
+
 def _normalize_base(sym: str) -> str:
     return str(sym).strip().upper().lstrip("$")
 
@@ -27,31 +39,33 @@ def _normalize_for_yf(sym: str) -> str:
     return _normalize_base(sym).replace(".", "-")
 
 
+def _load_portfolio(portfolio_path: Path) -> Dict:
+    try:
+        return read_json(portfolio_path)
+    except Exception:
+        return {"portfolio": {}, "liquid": 1000000}
+
+
 def _load_tickers(path: str | None) -> List[str]:
     if not path:
         return []
     p = Path(path).resolve()
     if not p.exists():
         return []
-    txt = p.read_text(encoding="utf-8")
-    raw = [x.strip() for x in txt.replace("\n", " ").replace(",", " ").split(" ") if x.strip()]
-    seen = set()
-    out: List[str] = []
-    for t in raw:
-        u = _normalize_base(t)
-        if u not in seen:
-            seen.add(u)
-            out.append(u)
-    return out
+    raw = _TICKER_SEP_RE.split(p.read_text(encoding="utf-8"))
+    # dict.fromkeys keeps first-seen order while dropping duplicates
+    return list(dict.fromkeys(_normalize_base(t) for t in raw if t))
 
 
-def _market_days(start_date: str, end_date: str) -> List[str]:
+@functools.lru_cache(maxsize=8)
+def _market_days(start_date: str, end_date: str) -> Tuple[str, ...]:
+    # Building the exchange schedule is slow; cache it per (start, end)
     sd = datetime.strptime(start_date, "%Y-%m-%d")
     ed = datetime.strptime(end_date, "%Y-%m-%d")
     if mcal is not None:
         nyse = mcal.get_calendar("XNYS")
         schedule = nyse.schedule(start_date=sd.strftime("%Y-%m-%d"), end_date=ed.strftime("%Y-%m-%d"))
-        return [d.strftime("%Y-%m-%d") for d in schedule.index]
+        return tuple(schedule.index.strftime("%Y-%m-%d"))
     # Fallback: weekdays
     days: List[str] = []
     d = sd
@@ -59,31 +73,123 @@ def _market_days(start_date: str, end_date: str) -> List[str]:
         if d.weekday() < 5:
             days.append(d.strftime("%Y-%m-%d"))
         d += timedelta(days=1)
-    return days
+    return tuple(days)
 
 
 def _generate_llm_views(tickers: List[str], date_str: str) -> Dict[str, float]:
     # Lightweight view generator: bias to small positive expected returns
     # to open long-only positions when pipelines are skipped.
     # Values are clamped in size_positions; keep within [-0.1, 0.1].
-    views: Dict[str, float] = {t: 0.02 for t in tickers}
+    views: Dict[str, float] = dict.fromkeys(tickers, 0.02)
     return views
 
 
-def _get_prices_for_date(tickers: List[str], date_str: str) -> Dict[str, float]:
-    prices: Dict[str, float] = {}
-    for t in tickers:
+def _decisions_from_views(tickers: List[str], views: Dict[str, float]) -> Dict[str, str]:
+    # Sign of each view -> BUY / SELL / HOLD in one vectorized pass
+    vals = np.fromiter((views.get(t, 0.0) for t in tickers), dtype=np.float64, count=len(tickers))
+    labels = np.select([vals > 0, vals < 0], ["BUY", "SELL"], default="HOLD")
+    return dict(zip(tickers, labels.tolist()))
+
+
+# One bounded pool for every resolver lookup (CSV reads / HTTP), shared by the price
+# prefetch, the reval warm-up and _snapshot, so concurrent lookups never exceed this.
+# Created on first use so importing the module starts no threads.
+_LOOKUP_WORKERS = 16
+_lookup_pool: ThreadPoolExecutor | None = None
+_lookup_pool_lock = threading.Lock()
+
+
+def _lookup_executor() -> ThreadPoolExecutor:
+    global _lookup_pool
+    with _lookup_pool_lock:
+        if _lookup_pool is None:
+            _lookup_pool = ThreadPoolExecutor(max_workers=_LOOKUP_WORKERS, thread_name_prefix="close-lookup")
+        return _lookup_pool
+
+
+def _resolve_close(sym: str, date_str: str) -> float | None:
+    try:
+        return cached_close_price(sym, date_str)
+    except Exception:
+        return None
+
+
+def _download_closes(
+    tickers: List[str], date_str: str, yf_syms: Dict[str, str] | None = None
+) -> Dict[str, float]:
+    # One batched Yahoo request for every symbol the resolver could not price
+    yf_syms = yf_syms or {}
+    yf_map = {yf_syms.get(t) or _normalize_for_yf(t): t for t in tickers}
+    start = datetime.strptime(date_str, "%Y-%m-%d")
+    end = start + timedelta(days=1)
+    out: Dict[str, float] = {}
+    try:
+        hist = yf.download(
+            list(yf_map), start=start, end=end, group_by="ticker",
+            threads=True, progress=False, auto_adjust=True,
+        )
+    except Exception:
+        return out
+    if hist is None or hist.empty:
+        return out
+    for yf_sym, t in yf_map.items():
         try:
-            prices[t] = float(data_interface.get_close_price(t, date_str))
+            if getattr(hist.columns, "nlevels", 1) > 1:
+                closes = hist[yf_sym]["Close"].dropna()
+            else:
+                # Single-symbol downloads may come back with flat columns
+                closes = hist["Close"].dropna()
+            if not closes.empty:
+                out[t] = float(closes.iloc[-1])
         except Exception:
-            try:
-                start = datetime.strptime(date_str, "%Y-%m-%d")
-                end = start + timedelta(days=1)
-                hist = yf.Ticker(_normalize_for_yf(t)).history(start=start, end=end)
-                prices[t] = float(hist["Close"].iloc[-1]) if not hist.empty else 0.0
-            except Exception:
-                prices[t] = 0.0
-    return prices
+            continue
+    return out
+
+
+def _resolve_closes(tickers: List[str], date_str: str) -> List[float | None]:
+    # Resolver lookups are I/O bound, so run them concurrently on the shared pool
+    if not tickers:
+        return []
+    return list(_lookup_executor().map(lambda t: _resolve_close(t, date_str), tickers))
+
+
+def _warm_closes(symbols: List[str], dates: List[str]) -> Dict[str, List[Future]]:
+    # Queue lookups without waiting; callers wait on a date's futures before reading it
+    pool = _lookup_executor()
+    return {d: [pool.submit(_resolve_close, s, d) for s in symbols] for d in dates}
+
+
+def _get_prices_for_date(
+    tickers: List[str], date_str: str, yf_syms: Dict[str, str] | None = None,
+    resolved: List[float | None] | None = None,
+) -> Dict[str, float]:
+    if resolved is None:
+        resolved = _resolve_closes(tickers, date_str)
+    prices: Dict[str, float] = {}
+    missing: List[str] = []
+    for t, px in zip(tickers, resolved):
+        if px is None:
+            missing.append(t)
+        else:
+            prices[t] = px
+    if missing:
+        fetched = _download_closes(missing, date_str, yf_syms)
+        for t in missing:
+            prices[t] = fetched.get(t, 0.0)
+    # Keep the caller's ticker order
+    return {t: prices[t] for t in tickers}
+
+
+def _prefetch_prices(tickers: List[str], rebalance_dates: List[str]) -> Dict[str, Dict[str, float]]:
+    # Rebalance-day prices do not depend on portfolio state, so every date's lookups are
+    # queued up front while the portfolio walk itself stays sequential.
+    # Yahoo symbols are derived once for the universe, not per date.
+    yf_syms = {t: _normalize_for_yf(t) for t in tickers}
+    queued = _warm_closes(tickers, rebalance_dates)
+    return {
+        d: _get_prices_for_date(tickers, d, yf_syms, [f.result() for f in queued[d]])
+        for d in rebalance_dates
+    }
 
 
 def _execute_trades_long_only(
@@ -91,84 +197,94 @@ def _execute_trades_long_only(
     decisions: Dict[str, str],
     portfolio_path: Path,
 ) -> Dict:
-    try:
-        with open(portfolio_path, "r") as f:
-            data = json.load(f)
-    except Exception:
-        data = {"portfolio": {}, "liquid": 1000000}
+    data = _load_portfolio(portfolio_path)
 
     if "portfolio" not in data or not isinstance(data["portfolio"], dict):
         data["portfolio"] = {}
     if "liquid" not in data or not isinstance(data["liquid"], (int, float)):
         data["liquid"] = 1000000
 
-    for sym, tr in (trades or {}).items():
-        price = float(tr.get("price", 0.0) or 0.0)
-        if price <= 0:
-            continue
-        holdings = data["portfolio"].get(sym, {"totalAmount": 0})
-        current_qty = int(holdings.get("totalAmount", 0))
-        proposed_target = int(tr.get("target_qty", current_qty + int(tr.get("delta_shares", 0))))
-        target_qty = max(0, proposed_target)  # enforce long-only
-        delta = target_qty - current_qty
-
-        if delta > 0:
-            max_affordable = int((float(data.get("liquid", 0.0)) // price))
-            buy_qty = min(delta, max_affordable)
+    # Struct-of-arrays view of the trade list (dict order is execution order)
+    trades = trades or {}
+    syms = list(trades)
+    holdings = [data["portfolio"].get(sym, {"totalAmount": 0}) for sym in syms]
+    px = np.array([float(trades[sym].get("price", 0.0) or 0.0) for sym in syms], dtype=np.float64)
+    current = np.array([int(h.get("totalAmount", 0)) for h in holdings], dtype=np.int64)
+    proposed = np.array([
+        int(trades[sym].get("target_qty", cur + int(trades[sym].get("delta_shares", 0))))
+        for sym, cur in zip(syms, current.tolist())
+    ], dtype=np.int64)
+    target = np.maximum(proposed, 0)  # enforce long-only
+    delta = target - current
+    valid = px > 0
+
+    # Sells always fill; buys are capped by the cash on hand at their turn,
+    # so only the trades that move cash are walked in order
+    filled = np.zeros(len(syms), dtype=np.int64)
+    liquid = data.get("liquid", 0.0)
+    px_list = px.tolist()
+    delta_list = delta.tolist()
+    for i in np.flatnonzero(valid & (delta != 0)).tolist():
+        price = px_list[i]
+        if delta_list[i] > 0:
+            max_affordable = int((float(liquid) // price))
+            buy_qty = min(delta_list[i], max_affordable)
             if buy_qty <= 0:
-                # cannot afford; skip
-                holdings["last_price"] = price
-                data["portfolio"][sym] = holdings
-                continue
-            cost = buy_qty * price
-            prev_qty = int(holdings.get("totalAmount", 0))
-            new_qty = prev_qty + buy_qty
-            holdings["totalAmount"] = new_qty
-            holdings["last_price"] = price
-            prev_entry = float(holdings.get("entry_price", 0.0) or 0.0)
+                continue  # cannot afford; skip
+            liquid = float(liquid) - buy_qty * price
+            filled[i] = buy_qty
+        else:
+            liquid = float(liquid) + (-delta_list[i]) * price
+            filled[i] = delta_list[i]
+    data["liquid"] = liquid
+    new_qty = (current + filled).tolist()
+
+    for i in np.flatnonzero(valid).tolist():
+        sym, h, price, qty = syms[i], holdings[i], px_list[i], int(filled[i])
+        h["last_price"] = price
+        if qty > 0:
+            prev_qty = int(current[i])
+            h["totalAmount"] = new_qty[i]
+            prev_entry = float(h.get("entry_price", 0.0) or 0.0)
             if prev_qty > 0 and prev_entry > 0:
-                holdings["entry_price"] = ((prev_entry * prev_qty) + (price * buy_qty)) / max(new_qty, 1)
+                h["entry_price"] = ((prev_entry * prev_qty) + (price * qty)) / max(new_qty[i], 1)
             else:
-                holdings["entry_price"] = price
-            data["liquid"] = float(data.get("liquid", 0.0)) - cost
-            data["portfolio"][sym] = holdings
-        elif delta < 0:
-            sell_qty = min(abs(delta), max(0, current_qty))
-            new_qty = current_qty - sell_qty
-            proceeds = sell_qty * price
-            holdings["totalAmount"] = new_qty
-            holdings["last_price"] = price
-            if new_qty == 0:
-                holdings["entry_price"] = 0.0
-            data["liquid"] = float(data.get("liquid", 0.0)) + proceeds
-            data["portfolio"][sym] = holdings
-        else:
-            # HOLD
-            holdings["last_price"] = price
-            data["portfolio"][sym] = holdings
-
-    with open(portfolio_path, "w") as f:
-        json.dump(data, f, indent=2)
+                h["entry_price"] = price
+        elif qty < 0:
+            h["totalAmount"] = new_qty[i]
+            if new_qty[i] == 0:
+                h["entry_price"] = 0.0
+        data["portfolio"][sym] = h
+
+    write_atomic(portfolio_path, dumps_json(data))
     return data
 
 
-def _snapshot(date_str: str, data: Dict, out_date_dir: Path, portfolio_path: Path | None = None) -> None:
-    # Revalue last_price using official resolver for accuracy
+def _snapshot(
+    date_str: str,
+    data: Dict,
+    out_date_dir: Path,
+    portfolio_path: Path | None = None,
+    writer: ThreadPoolExecutor | None = None,
+) -> Tuple[Dict, Future | None]:
+    # Revalue last_price using official resolver for accuracy (one batched lookup)
     persisted = dict(data)
-    for sym, info in list(persisted.get("portfolio", {}).items()):
-        try:
-            px = float(data_interface.get_close_price(sym, date_str))
-        except Exception:
-            px = float(info.get("last_price", 0.0) or 0.0)
-        info["last_price"] = px
-        persisted["portfolio"][sym] = info
+    portfolio = persisted.get("portfolio", {})
+    syms = list(portfolio)
+    resolved = _resolve_closes(syms, date_str)
+    pxs = np.array([
+        px if px is not None else float(portfolio[sym].get("last_price", 0.0) or 0.0)
+        for sym, px in zip(syms, resolved)
+    ], dtype=np.float64)
+    qtys = np.fromiter(
+        (float(portfolio[sym].get("totalAmount", 0) or 0) for sym in syms),
+        dtype=np.float64, count=len(syms),
+    )
+    for sym, px in zip(syms, pxs.tolist()):
+        portfolio[sym]["last_price"] = px
 
     liquid_cash = float(persisted.get("liquid", 0.0) or 0.0)
-    net_liq = liquid_cash
-    for sym, info in persisted.get("portfolio", {}).items():
-        qty = float(info.get("totalAmount", 0) or 0)
-        px = float(info.get("last_price", 0.0) or 0.0)
-        net_liq += qty * px
+    net_liq = liquid_cash + float(qtys @ pxs)
 
     enriched = dict(persisted)
     enriched["net_liquidation"] = net_liq
@@ -177,34 +293,32 @@ def _snapshot(date_str: str, data: Dict, out_date_dir: Path, portfolio_path: Pat
     enriched["buying_power"] = net_liq
 
     snap_path = out_date_dir / f"portfolio_snapshot_{date_str}.json"
-    snap_path.write_text(json.dumps(enriched, indent=2), encoding="utf-8")
-    # Persist revalued state so subsequent days build from this snapshot
+    payload = dumps_json(enriched)
+    # Persist revalued state so subsequent days build from this snapshot; this one is
+    # read back by the next day's sizing, so it is written before returning
     if portfolio_path is not None:
         try:
-            portfolio_path.write_text(json.dumps(enriched, indent=2), encoding="utf-8")
+            write_atomic(portfolio_path, payload)
         except Exception:
             pass
+    # The dated snapshot is output only: hand it to the background writer if given
+    pending = None
+    if writer is not None:
+        pending = writer.submit(write_atomic, snap_path, payload)
+    else:
+        write_atomic(snap_path, payload)
     print(f"📸 Portfolio snapshot saved -> {snap_path.as_posix()}")
+    return enriched, pending
 
 
-def _build_schedule(start: str, end: str, anchor: str, cadence_days: int) -> List[str]:
-    valid_days = _market_days(start, end)
-    if not valid_days:
-        return []
-    # First rebalance at first valid day >= anchor
-    anchor_idx = None
-    for i, d in enumerate(valid_days):
-        if d >= anchor:
-            anchor_idx = i
-            break
-    if anchor_idx is None:
-        return []
-    dates: List[str] = []
-    i = anchor_idx
-    while i < len(valid_days):
-        dates.append(valid_days[i])
-        i += cadence_days
-    return dates
+def _flush_portfolio(portfolio_path: Path, state: Dict) -> None:
+    write_atomic(portfolio_path, dumps_json(state))
+
+
+def _build_schedule(valid_days: Sequence[str], anchor: str, cadence_days: int) -> List[str]:
+    # First rebalance at first valid day >= anchor (valid_days is sorted)
+    anchor_idx = bisect.bisect_left(valid_days, anchor)
+    return list(valid_days[anchor_idx::cadence_days])
 
 
 def main():
@@ -224,7 +338,7 @@ def main():
     portfolio_path = (Path.cwd() / "testing" / "portfolio.json").resolve()
     if not portfolio_path.exists():
         portfolio_path.parent.mkdir(parents=True, exist_ok=True)
-        portfolio_path.write_text(json.dumps({"portfolio": {}, "liquid": 1000000}, indent=2), encoding="utf-8")
+        write_atomic(portfolio_path, dumps_json({"portfolio": {}, "liquid": 1000000}))
 
     # Build schedule and full market-day range
     cadence_mode = False
@@ -235,8 +349,8 @@ def main():
         if not args.start or not args.end:
             raise SystemExit("Either --dates or both --start and --end must be provided")
         cadence_mode = True
-        target_dates = _build_schedule(args.start, args.end, args.anchor, args.cadence)
-        full_days = _market_days(args.start, args.end)
+        full_days = list(_market_days(args.start, args.end))
+        target_dates = _build_schedule(full_days, args.anchor, args.cadence)
 
     if not target_dates:
         print("No target dates to run.")
@@ -247,6 +361,27 @@ def main():
     # In cadence mode, write revaluation snapshots on non-rebalance days too
     day_iterable = full_days if cadence_mode else target_dates
     target_set = set(target_dates)
+    print(f"🧮 [MVO-BLM] Prefetching prices for {len(target_dates)} dates...")
+    prefetched = _prefetch_prices(universe, target_dates)
+    # Reval days only price held symbols, so their closes are warmed per stretch of reval
+    # days once the holdings going into that stretch are known
+    reval_runs: Dict[str | None, List[str]] = {}
+    last_rebalance = None
+    for d in day_iterable:
+        if d in target_set:
+            last_rebalance = d
+        else:
+            reval_runs.setdefault(last_rebalance, []).append(d)
+
+    # Output-only files (dated snapshots, reports) are written on a background thread so
+    # disk writes for one date overlap the next date's work; portfolio.json stays synchronous
+    writer = ThreadPoolExecutor(max_workers=1)
+    pending: List[Future] = []
+    # Portfolio state lives in memory across days; portfolio.json is only rewritten when
+    # sizing needs to read it (rebalance days) and once at the end
+    state = _load_portfolio(portfolio_path)
+    dirty = False
+    warm = _warm_closes(list(state.get("portfolio", {})), reval_runs.get(None, []))
 
     for date_str in day_iterable:
         out_date_dir = out_root / date_str
@@ -255,43 +390,48 @@ def main():
         if date_str not in target_set and cadence_mode:
             # Non-rebalance market day: revaluation-only snapshot
             print(f"⏩ Reval-only snapshot for {date_str} (no MVO-BLM run)")
+            for fut in warm.pop(date_str, []):
+                fut.result()
             # Ensure no extra reports exist on non-rebalance days
-            try:
-                rr = out_date_dir / "resizingReport.md"
-                if rr.exists():
-                    rr.unlink()
-            except Exception:
-                pass
-            try:
-                por = out_date_dir / "portfolio_optimizer_report.md"
-                if por.exists():
-                    por.unlink()
-            except Exception:
-                pass
-            try:
-                with open(portfolio_path, "r") as f:
-                    data = json.load(f)
-            except Exception:
-                data = {"portfolio": {}, "liquid": 1000000}
-            _snapshot(date_str, data, out_date_dir, portfolio_path)
+            for name in _REBALANCE_REPORTS:
+                try:
+                    (out_date_dir / name).unlink(missing_ok=True)
+                except OSError:
+                    pass
+            enriched, fut = _snapshot(date_str, state, out_date_dir, None, writer)
+            state.clear()
+            state.update(enriched)
+            if not dirty:
+                # unflushed revaluations still reach disk if the run dies early
+                atexit.register(_flush_portfolio, portfolio_path, state)
+                dirty = True
+            pending.append(fut)
             continue
 
         print(f"🧮 [MVO-BLM] Preparing views for {date_str} ({len(universe)} tickers)...")
         llm_views = _generate_llm_views(universe, date_str)
-        decisions = {t: ("BUY" if llm_views.get(t, 0.0) > 0 else ("SELL" if llm_views.get(t, 0.0) < 0 else "HOLD")) for t in universe}
+        decisions = _decisions_from_views(universe, llm_views)
 
         print(f"🧮 [MVO-BLM] Fetching prices for {date_str}...")
-        prices = _get_prices_for_date(universe, date_str)
+        prices = prefetched[date_str]
         if sum(1 for p in prices.values() if (p or 0.0) > 0) == 0:
             print(f"Skipping {date_str}: no usable prices for any tickers.")
-            try:
-                with open(portfolio_path, "r") as f:
-                    data = json.load(f)
-            except Exception:
-                data = {"portfolio": {}, "liquid": 1000000}
-            _snapshot(date_str, data, out_date_dir, portfolio_path)
+            enriched, fut = _snapshot(date_str, state, out_date_dir, None, writer)
+            state.clear()
+            state.update(enriched)
+            if not dirty:
+                # unflushed revaluations still reach disk if the run dies early
+                atexit.register(_flush_portfolio, portfolio_path, state)
+                dirty = True
+            pending.append(fut)
+            warm.update(_warm_closes(list(state.get("portfolio", {})), reval_runs.get(date_str, [])))
             continue
 
+        if dirty:
+            # size_positions reads the portfolio from disk
+            _flush_portfolio(portfolio_path, state)
+            atexit.unregister(_flush_portfolio)
+            dirty = False
         print(f"🚀 [MVO-BLM] Running sizing (long-only) for {date_str}...")
         t0 = time.time()
         trades = size_positions(universe, date_str, decisions, str(portfolio_path), prices, views=llm_views)
@@ -305,11 +445,23 @@ def main():
                 rr_lines.append(f"- {t}: delta={tr.get('delta_shares')}, target_qty={tr.get('target_qty')}, current_qty={tr.get('current_qty')}, price={tr.get('price')}")
             else:
                 rr_lines.append(f"- {t}: no change")
-        (out_date_dir / "resizingReport.md").write_text("\n".join(rr_lines), encoding="utf-8")
+        pending.append(writer.submit(
+            write_atomic, out_date_dir / "resizingReport.md", "\n".join(rr_lines).encode("utf-8")
+        ))
 
         data_after = _execute_trades_long_only(trades, decisions, portfolio_path)
-        _snapshot(date_str, data_after, out_date_dir, portfolio_path)
-
+        enriched, fut = _snapshot(date_str, data_after, out_date_dir, portfolio_path, writer)
+        state.clear()
+        state.update(enriched)
+        pending.append(fut)
+        warm.update(_warm_closes(list(state.get("portfolio", {})), reval_runs.get(date_str, [])))
+
+    if dirty:
+        _flush_portfolio(portfolio_path, state)
+        atexit.unregister(_flush_portfolio)
+    writer.shutdown(wait=True)
+    for fut in pending:
+        fut.result()  # surface any failed background write
     print("✅ MVO-BLM Runner finished.")
 
 
@@ -25,6 +25,7 @@ setup(
         "typer>=0.9.0",
         "rich>=13.0.0",
         "questionary>=2.0.1",
+        "filelock>=3.12.0",
     ],
     python_requires=">=3.10",
     entry_points={
@@ -0,0 +1,132 @@
+"""Equivalence tests for the indicator kernels in comparisonAlgorithms/indicators.py.
+
+The kernels are checked against the pandas rolling/ewm code they replaced and, when
+numba is installed, the compiled kernels against their plain Python ``py_func``.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparisonAlgorithms import indicators
+from comparisonAlgorithms.data_loading import price_arrays
+
+
+def _py(kernel):
+    # The plain Python body of an njit kernel (the kernel itself without numba)
+    return getattr(kernel, "py_func", kernel)
+
+
+def _ohlc(n=300, seed=0, gaps=False):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    spread = rng.random(n)
+    df = pd.DataFrame(
+        {"open": close, "high": close + spread, "low": close - spread, "close": close},
+        index=pd.date_range("2024-01-01", periods=n),
+    )
+    if gaps:
+        df.iloc[[40, 41, 120], :] = np.nan
+    return df
+
+
+def _reference_indicators(df):
+    # The pandas implementations the kernels replaced
+    close = df["close"]
+
+    def ema(s, span):
+        return s.ewm(span=span, adjust=False).mean()
+
+    macd_line = ema(close, 12) - ema(close, 26)
+    signal_line = ema(macd_line, 9)
+    low_min = df["low"].rolling(9).min()
+    high_max = df["high"].rolling(9).max()
+    rsv = (close - low_min) * 100 / (high_max - low_min)
+    k = rsv.ewm(alpha=1 / 3, adjust=False).mean()
+    d = k.ewm(alpha=1 / 3, adjust=False).mean()
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).rolling(14).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(14).mean()
+    returns = close.pct_change()
+    z = (returns - returns.rolling(20).mean()) / returns.rolling(20).std()
+    return {
+        "sma": close.rolling(10).mean(),
+        "ema": ema(close, 10),
+        "macd": (macd_line, signal_line, macd_line - signal_line),
+        "kdj": (k, d, 3 * k - 2 * d),
+        "rsi": 100 - (100 / (1 + avg_gain / avg_loss)),
+        "zmr": (z, z / z.abs().rolling(20).mean()),
+    }
+
+
+def _indicator_values(data):
+    return {
+        "sma": indicators.sma(data["close"], 10),
+        "ema": indicators.ema(data["close"], 10),
+        "macd": indicators.macd(data["close"]),
+        "kdj": indicators.kdj(data),
+        "rsi": indicators.rsi(data["close"]),
+        "zmr": indicators.zmr(data["close"]),
+    }
+
+
+def _assert_indicators_close(actual, expected, rtol=1e-9, atol=1e-9):
+    for name, exp in expected.items():
+        act = actual[name]
+        if not isinstance(exp, tuple):
+            act, exp = (act,), (exp,)
+        for a, e in zip(act, exp):
+            np.testing.assert_allclose(np.asarray(a, dtype=float), np.asarray(e, dtype=float),
+                                       rtol=rtol, atol=atol, equal_nan=True, err_msg=name)
+
+
+@pytest.mark.parametrize("gaps", [False, True])
+def test_indicator_kernels_match_pandas(gaps):
+    df = _ohlc(gaps=gaps)
+    _assert_indicators_close(_indicator_values(df), _reference_indicators(df))
+
+
+def test_indicator_kernels_python_matches_compiled(monkeypatch):
+    df = _ohlc(gaps=True)
+    compiled = _indicator_values(df)
+    for name in dir(indicators):
+        if name.endswith("_nb") or name == "_ema_step":
+            monkeypatch.setattr(indicators, name, _py(getattr(indicators, name)))
+    _assert_indicators_close(_indicator_values(df), compiled)
+
+
+def test_price_arrays_match_dataframe_indicators():
+    df = _ohlc(gaps=True)
+    expected = _indicator_values(df)
+    # float64 arrays, as run_rules passes them, reproduce the DataFrame results exactly
+    _assert_indicators_close(_indicator_values(price_arrays(df, dtype=np.float64)), expected, rtol=0, atol=0)
+    # float32 storage loses precision on the way in but stays close
+    _assert_indicators_close(_indicator_values(price_arrays(df)), expected, rtol=1e-4, atol=1e-3)
+
+
+def test_kdj_flat_window_reads_mid_range():
+    df = _ohlc(n=60)
+    # Twelve identical bars give several 9-bar windows with high == low
+    df.iloc[20:32] = 100.0
+    k, d, j = indicators.kdj(df)
+    low_min = df["low"].rolling(9).min()
+    high_max = df["high"].rolling(9).max()
+    rsv = ((df["close"] - low_min) * 100 / (high_max - low_min)).mask(high_max == low_min, 50.0)
+    expected_k = rsv.ewm(alpha=1 / 3, adjust=False).mean()
+    expected_d = expected_k.ewm(alpha=1 / 3, adjust=False).mean()
+    _assert_indicators_close({"kdj": (k, d, j)}, {"kdj": (expected_k, expected_d, 3 * expected_k - 2 * expected_d)})
+    assert not np.isnan(np.asarray(k, dtype=float)[8:]).any()
+
+
+def test_rsi_fused_pass_matches_separate_rolling_means():
+    close = _ohlc(n=120)["close"].copy()
+    # A steady climb (no losses) followed by a flat run (no gains or losses)
+    close.iloc[40:70] = np.linspace(100, 130, 30)
+    close.iloc[70:100] = 130.0
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).rolling(14).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(14).mean()
+    expected = 100 - (100 / (1 + avg_gain / avg_loss))
+    actual = np.asarray(indicators.rsi(close), dtype=float)
+    np.testing.assert_allclose(actual, expected.to_numpy(), rtol=1e-9, atol=1e-9, equal_nan=True)
+    assert (actual[54:70] == 100.0).all()
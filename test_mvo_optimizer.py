@@ -0,0 +1,79 @@
+"""Tests for the MVO and Black-Litterman solvers in testing/mvo/optimizer.py.
+
+The expected values use the pseudoinverse formulas the optimizer was written with.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "testing"))
+
+from mvo import optimizer  # noqa: E402
+
+
+def _spd(n, seed, rank=None):
+    # Positive definite covariance, or a singular one of the given rank
+    rng = np.random.default_rng(seed)
+    a = rng.normal(size=(n, rank or n))
+    cov = a @ a.T / n
+    return cov if rank else cov + 1e-3 * np.eye(n)
+
+
+@pytest.mark.parametrize("rank", [None, 4])
+@pytest.mark.parametrize("omega", ["none", "diagonal", "full"])
+def test_black_litterman_matches_pinv(omega, rank):
+    n = 6
+    cov = _spd(n, 3, rank)
+    rng = np.random.default_rng(4)
+    w = rng.dirichlet(np.ones(n))
+    P = np.eye(n)[:3]
+    Q = rng.normal(scale=0.01, size=3)
+    Omega = {
+        "none": None,
+        "diagonal": np.diag(rng.random(3) * 1e-3),
+        "full": np.diag(rng.random(3) * 1e-3) + 1e-5,
+    }[omega]
+    inv_cov = np.linalg.pinv(cov)
+    pi = 2.5 * cov @ w
+    Om = Omega if Omega is not None else np.diag(np.maximum(np.diag(P @ (0.05 * cov) @ P.T), 1e-8))
+    M = np.linalg.pinv(inv_cov + P.T @ np.linalg.pinv(Om) @ P)
+    expected = M @ (inv_cov @ pi + P.T @ np.linalg.pinv(Om) @ Q)
+    np.testing.assert_allclose(optimizer.black_litterman(w, cov, 2.5, P, Q, Omega=Omega),
+                               expected, rtol=1e-7, atol=1e-12)
+
+
+def test_black_litterman_without_views_returns_equilibrium():
+    cov = _spd(4, 8)
+    w = np.full(4, 0.25)
+    np.testing.assert_allclose(optimizer.black_litterman(w, cov, 2.5, np.zeros((0, 4)), np.zeros(0)), 2.5 * cov @ w)
+
+
+def _py(kernel):
+    # The plain Python body of an njit kernel (the kernel itself without numba)
+    return getattr(kernel, "py_func", kernel)
+
+
+@pytest.mark.parametrize("rank", [None, 3])
+@pytest.mark.parametrize("long_only", [True, False])
+def test_mean_variance_optimize_matches_pinv(rank, long_only):
+    cov = _spd(8, 1, rank)
+    mu = np.random.default_rng(2).normal(scale=0.01, size=8)
+    raw = (1.0 / 3.0) * np.linalg.pinv(cov) @ mu
+    if long_only:
+        raw = np.maximum(raw, 0.0)
+    expected = raw / raw.sum() if raw.sum() > 0 else np.ones(8) / 8
+    np.testing.assert_allclose(optimizer.mean_variance_optimize(mu, cov, 3.0, long_only),
+                               expected, rtol=1e-7, atol=1e-10)
+    np.testing.assert_allclose(_py(optimizer._mvo_core)(mu, cov, 3.0, long_only),
+                               expected, rtol=1e-7, atol=1e-10)
+
+
+def test_bl_core_python_matches_compiled():
+    cov = _spd(5, 5)
+    rng = np.random.default_rng(6)
+    args = (np.linalg.inv(cov), rng.normal(size=5), np.eye(5)[:2].copy(), rng.normal(size=2), rng.random(2) + 0.5)
+    np.testing.assert_allclose(optimizer._bl_core(*args), _py(optimizer._bl_core)(*args), rtol=1e-10)
@@ -0,0 +1,66 @@
+"""Regression tests for the MVO portfolio rebalance helpers.
+
+fixtures/mvo_portfolio_reference.json holds snapshots, prices and partial target
+weights together with the results the original dict-based implementations of
+apply_partial_target_weights and force_cash_non_negative produced for them;
+fixtures/make_mvo_portfolio_reference.py regenerates it from the baseline commit.
+"""
+
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "testing"))
+
+from mvo import portfolio  # noqa: E402
+from mvo.portfolio import apply_partial_target_weights, force_cash_non_negative  # noqa: E402
+
+with open(os.path.join(ROOT, "fixtures", "mvo_portfolio_reference.json")) as f:
+    CASES = json.load(f)
+
+
+def _assert_matches(actual, expected, path="result"):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        # Key order is part of the snapshot files, so it has to match as well
+        assert list(actual) == list(expected), path
+        for key in expected:
+            _assert_matches(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            _assert_matches(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-6), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("case", CASES, ids=[f"case{i}" for i in range(len(CASES))])
+def test_apply_partial_target_weights_matches_reference(case):
+    snapshot = copy.deepcopy(case["snapshot"])
+    new_snapshot, changes = apply_partial_target_weights(snapshot, case["prices"], case["weights"])
+    _assert_matches(new_snapshot, case["expected"]["partial"]["snapshot"])
+    _assert_matches([list(c) for c in changes], case["expected"]["partial"]["changes"])
+    # The input snapshot is left untouched
+    assert snapshot == case["snapshot"]
+
+
+
+def test_rebalance_core_python_matches_compiled(monkeypatch):
+    compiled = [apply_partial_target_weights(copy.deepcopy(c["snapshot"]), c["prices"], c["weights"]) for c in CASES]
+    kernel = portfolio._rebalance_core
+    monkeypatch.setattr(portfolio, "_rebalance_core", getattr(kernel, "py_func", kernel))
+    for case, expected in zip(CASES, compiled):
+        assert apply_partial_target_weights(copy.deepcopy(case["snapshot"]), case["prices"], case["weights"]) == expected
+
+
+@pytest.mark.parametrize("case", CASES, ids=[f"case{i}" for i in range(len(CASES))])
+def test_force_cash_non_negative_matches_reference(case):
+    out = force_cash_non_negative(copy.deepcopy(case["snapshot"]), case["prices"])
+    _assert_matches(out, case["expected"]["forced"])
+    assert out["cash"] >= 0
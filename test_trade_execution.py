@@ -0,0 +1,80 @@
+"""Tests for the trade execution kernel in testingLoopMultithreaded.py."""
+
+import ast
+import os
+
+import numpy as np
+import pytest
+
+try:
+    import numba
+except Exception:
+    numba = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_apply_trades():
+    # testingLoopMultithreaded imports the LLM stack at module level, so take the
+    # kernel straight from its source
+    path = os.path.join(ROOT, "testingLoopMultithreaded.py")
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    fn = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == "_apply_trades")
+    fn.decorator_list = []
+    namespace = {"np": np}
+    exec(compile(ast.Module(body=[fn], type_ignores=[]), path, "exec"), namespace)
+    return namespace["_apply_trades"]
+
+
+def _reference_trades(rows, liquid):
+    # The per-symbol dict loop the kernel replaced (long-only)
+    out = []
+    for price, target, holdings in rows:
+        holdings = dict(holdings)
+        if price > 0:
+            current_qty = holdings["totalAmount"]
+            delta = max(0, target) - current_qty
+            if delta > 0:
+                buy_qty = min(delta, int(liquid // price))
+                if buy_qty > 0:
+                    new_qty = current_qty + buy_qty
+                    prev_entry = holdings["entry_price"]
+                    if current_qty > 0 and prev_entry > 0:
+                        holdings["entry_price"] = ((prev_entry * current_qty) + (price * buy_qty)) / max(new_qty, 1)
+                    else:
+                        holdings["entry_price"] = price
+                    holdings["totalAmount"] = new_qty
+                    liquid -= buy_qty * price
+            elif delta < 0:
+                sell_qty = min(-delta, max(0, current_qty))
+                holdings["totalAmount"] = current_qty - sell_qty
+                if holdings["totalAmount"] == 0:
+                    holdings["entry_price"] = 0.0
+                liquid += sell_qty * price
+        out.append(holdings)
+    return out, liquid
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_apply_trades_matches_reference_loop(seed):
+    kernel = _load_apply_trades()
+    variants = [kernel] + ([numba.njit(kernel)] if numba is not None else [])
+    rng = np.random.default_rng(seed)
+    n = 12
+    prices = np.round(rng.uniform(5, 300, size=n), 2)
+    prices[rng.random(n) < 0.15] = 0.0
+    qtys = rng.integers(0, 60, size=n).astype(np.int64)
+    entries = np.where(qtys > 0, np.round(rng.uniform(5, 300, size=n), 2), 0.0)
+    targets = rng.integers(-10, 80, size=n).astype(np.int64)
+    liquid = float(rng.choice([500.0, 5000.0, 50000.0]))
+
+    rows = [(p, t, {"totalAmount": int(q), "entry_price": float(e)}) for p, t, q, e in zip(prices, targets, qtys, entries)]
+    expected, expected_liquid = _reference_trades(rows, liquid)
+    for fn in variants:
+        new_qtys, new_entries, new_liquid, applied = fn(prices, targets, qtys, entries, liquid)
+        assert new_liquid == pytest.approx(expected_liquid, rel=1e-12)
+        assert new_qtys.tolist() == [h["totalAmount"] for h in expected]
+        np.testing.assert_allclose(new_entries, [h["entry_price"] for h in expected], rtol=1e-12)
+        # Unpriced rows are skipped entirely
+        assert not applied[prices <= 0].any()
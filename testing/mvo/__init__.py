@@ -1,6 +1,7 @@
 """MVO-BLM module.
 
 Implements data loading, MVO, Black-Litterman, scheduling, snapshotting, and reporting.
-"""
-
 
+The kernels use the shared numba shim in tradingagents/utils, so the repo root has to
+be importable as well, e.g. ``PYTHONPATH=. python testing/mvo_blm_runner.py``.
+"""
@@ -1,78 +1,99 @@
+import bisect
+import io
 import re
 import datetime as dt
-from typing import Dict, List, Tuple
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Tuple
 
+import numpy as np
+import pandas as pd
 
-def read_prices_csv(csv_path: str) -> Tuple[List[str], Dict[str, Dict[str, float]]]:
 
-    dates: List[str] = []
-    date_to_prices: Dict[str, Dict[str, float]] = {}
+class PriceRows(Mapping):
+    """Read-only date -> {ticker: close} view over the parsed price grid.
+
+    Row dicts are built on first access and memoized, so callers that only touch
+    a window of dates never pay for materializing the whole file.
+    """
+
+    def __init__(self, dates: List[str], tickers: List[str], values: np.ndarray):
+        self._tickers = tickers
+        self._values = values
+        # a repeated date keeps its last row, as with a plain dict build
+        self._row_of = {d: i for i, d in enumerate(dates)}
+        self._rows: Dict[str, Dict[str, float]] = {}
+
+    def __getitem__(self, date_str: str) -> Dict[str, float]:
+        row = self._rows.get(date_str)
+        if row is None:
+            vals = self._values[self._row_of[date_str]]
+            # missing or non-numeric cells are left out of the row
+            row = {t: v for t, v in zip(self._tickers, vals.tolist()) if v == v}
+            self._rows[date_str] = row
+        return row
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._row_of)
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def reindex(self, dates: List[str], tickers: List[str]) -> np.ndarray:
+        """Closes as a len(dates) x len(tickers) array; NaN where the file has no close."""
+        col_of = {t: j for j, t in enumerate(self._tickers)}
+        rows = np.fromiter((self._row_of.get(d, -1) for d in dates), dtype=np.intp, count=len(dates))
+        cols = np.fromiter((col_of.get(t, -1) for t in tickers), dtype=np.intp, count=len(tickers))
+        out = np.full((len(dates), len(tickers)), np.nan)
+        known_rows, known_cols = rows >= 0, cols >= 0
+        out[np.ix_(known_rows, known_cols)] = self._values[np.ix_(rows[known_rows], cols[known_cols])]
+        return out
+
+
+_DATE_LINE_RE = re.compile(r"\n(?!\d{4}-\d{2}-\d{2})")
+
+
+def read_prices_csv(csv_path: str) -> Tuple[List[str], Mapping]:
 
     with open(csv_path, "r") as f:
-        lines = [ln.rstrip("\n") for ln in f]
-
-    # Build header across wrapped lines until first date line
-    date_re = re.compile(r"^\d{4}-\d{2}-\d{2}")
-    header_parts: List[str] = []
-    i = 0
-    while i < len(lines) and not date_re.match(lines[i]):
-        part = lines[i].strip()
-        if part:
-            header_parts.append(part)
-        i += 1
-    header_line = "".join(header_parts)
-    header_cols = [c.strip() for c in header_line.split(",") if c.strip()]
+        text = "\n".join(ln.strip() for ln in f)
+
+    # Unwrap: header and data rows may be wrapped over several lines; a row only starts
+    # on a line beginning with a date, so glue every other line onto the previous one
+    records = _DATE_LINE_RE.sub("", text).split("\n", 1)
+    header_cols = [c.strip() for c in records[0].split(",") if c.strip()]
     if len(header_cols) == 0 or header_cols[0].lower() != "date":
         raise ValueError("CSV header must start with Date")
     tickers = header_cols[1:]
+    body = records[1] if len(records) > 1 else ""
+    if not body.strip():
+        return [], PriceRows([], tickers, np.zeros((0, len(tickers))))
 
-    # Now iterate blocks: each data row may be wrapped over multiple lines until next date line or EOF
-    while i < len(lines):
-        # line starting a new row
-        if not date_re.match(lines[i]):
-            i += 1
-            continue
-        block = [lines[i].strip()]
-        i += 1
-        while i < len(lines) and not date_re.match(lines[i]):
-            if lines[i].strip():
-                block.append(lines[i].strip())
-            i += 1
-        row_joined = "".join(block)
-        cols = [c.strip() for c in row_joined.split(",")]
-        if len(cols) < 2:
-            continue
-        date_str = cols[0]
-        prices: Dict[str, float] = {}
-        for idx, ticker in enumerate(tickers, start=1):
-            if idx >= len(cols):
-                break
-            cell = cols[idx]
-            if cell == "":
-                continue
-            try:
-                prices[ticker] = float(cell)
-            except ValueError:
-                continue
-        dates.append(date_str)
-        date_to_prices[date_str] = prices
-
-    return dates, date_to_prices
+    # One C-level parse for every cell; short rows pad with NaN, extra cells are ignored
+    width = max(len(header_cols), max(ln.count(",") for ln in body.split("\n")) + 1)
+    df = pd.read_csv(
+        io.StringIO(body),
+        header=None,
+        names=range(width),
+        index_col=False,
+        dtype={0: str},
+        skipinitialspace=True,
+        skip_blank_lines=True,
+        engine="c",
+    )
+    prices = df.iloc[:, 1:len(header_cols)]
+    text_cols = [c for c in prices.columns if not pd.api.types.is_numeric_dtype(prices[c])]
+    if len(text_cols):
+        # Cells that are not numbers are skipped, like empty ones
+        prices = prices.copy()
+        prices[text_cols] = prices[text_cols].apply(pd.to_numeric, errors="coerce")
+    dates: List[str] = df[0].str.strip().tolist()
+    return dates, PriceRows(dates, tickers, prices.to_numpy(dtype=float))
 
 
 def previous_trading_day(dates: List[str], date_str: str) -> str:
 
-    if date_str in dates:
-        idx = dates.index(date_str)
-    else:
-        # insert position
-        idx = 0
-        for i, d in enumerate(dates):
-            if d > date_str:
-                idx = i
-                break
-        else:
-            idx = len(dates)
+    # dates is sorted: first position >= date_str is the date itself or its insert point
+    idx = bisect.bisect_left(dates, date_str)
     if idx == 0:
         raise ValueError("No previous trading day available")
     return dates[idx - 1]
@@ -1,6 +1,7 @@
+import asyncio
 import os
-import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional
 
 import numpy as np
@@ -11,15 +12,63 @@ class LLMViewsGenerator:
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
         # lazy import to avoid hard dependency if key missing
-        self._client = None
+        self._client_cls = None
+        # cap on in-flight completion requests
+        self.max_concurrency = 32
 
     def _ensure_client(self):
-        if self._client is None and self.api_key:
+        # The async client is bound to the event loop it runs on, so keep the class
+        # here and open a fresh client inside each generate() call
+        if self._client_cls is None and self.api_key:
             try:
-                from openai import OpenAI
-                self._client = OpenAI(api_key=self.api_key)
+                from openai import AsyncOpenAI
+                self._client_cls = AsyncOpenAI
             except Exception:
-                self._client = None
+                self._client_cls = None
+
+    @staticmethod
+    def _run(coro):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        # Called from inside a running loop (e.g. a notebook), where asyncio.run
+        # raises: run the coroutine on a worker thread with its own loop
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coro).result()
+
+    async def _sample_views(
+        self, prompts: Dict[str, str], num_samples: int
+    ) -> Dict[str, List[float]]:
+        sem = asyncio.Semaphore(self.max_concurrency)
+        async with self._client_cls(api_key=self.api_key) as client:
+
+            async def one(t: str) -> Tuple[str, float]:
+                async with sem:
+                    resp = await client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": "You output strict JSON only."},
+                            {"role": "user", "content": prompts[t]},
+                        ],
+                        temperature=0.8,
+                    )
+                content = resp.choices[0].message.content
+                data = json.loads(content)
+                return t, float(data.get("avg_daily_return", 0.0))
+
+            results = await asyncio.gather(
+                *(one(t) for t in prompts for _ in range(num_samples)),
+                return_exceptions=True,
+            )
+        samples: Dict[str, List[float]] = {t: [] for t in prompts}
+        for res in results:
+            # failed samples are dropped, as before
+            if isinstance(res, BaseException):
+                continue
+            t, val = res
+            samples[t].append(val)
+        return samples
 
     def generate(
         self,
@@ -32,7 +81,7 @@ class LLMViewsGenerator:
 
         # If no key/client, fallback to a simple heuristic using recent mean returns
         self._ensure_client()
-        if not use_api or self._client is None:
+        if not use_api or self._client_cls is None:
             mus = []
             vars_ = []
             for t in tickers:
@@ -53,38 +102,29 @@ class LLMViewsGenerator:
 
         # With LLM: query per ticker and aggregate mean/variance of predicted avg daily return next two weeks
         # Clamp predictions to a reasonable range to avoid runaway allocations
-        mus = []
-        vars_ = []
+        prompts: Dict[str, str] = {}
         for t in tickers:
             series = window_returns.get(t, [])
             if len(series) == 0:
-                mus.append(0.0)
-                vars_.append(0.0004)
                 continue
-            prompt = (
+            prompts[t] = (
                 f"You are positioned on {date_str} market close. Use only the PAST two weeks.\n"
                 f"Daily returns for {t}: {','.join([str(round(x,6)) for x in series])}.\n"
                 "Predict the average DAILY return for the NEXT two weeks (10 trading days). "
                 "Return strict JSON: {\"avg_daily_return\": number}."
             )
-            samples = []
-            for _ in range(num_samples):
-                try:
-                    resp = self._client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": "You output strict JSON only."},
-                            {"role": "user", "content": prompt},
-                        ],
-                        temperature=0.8,
-                    )
-                    content = resp.choices[0].message.content
-                    data = json.loads(content)
-                    val = float(data.get("avg_daily_return", 0.0))
-                    samples.append(val)
-                    time.sleep(0.05)
-                except Exception:
-                    continue
+        # issue every (ticker, sample) request concurrently
+        sampled = self._run(self._sample_views(prompts, num_samples)) if prompts else {}
+
+        mus = []
+        vars_ = []
+        for t in tickers:
+            series = window_returns.get(t, [])
+            if len(series) == 0:
+                mus.append(0.0)
+                vars_.append(0.0004)
+                continue
+            samples = sampled.get(t, [])
             if len(samples) == 0:
                 mus.append(float(np.mean(series)))
                 vars_.append(float(np.var(series)) + 1e-4)
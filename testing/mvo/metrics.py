@@ -1,58 +1,62 @@
-from typing import List, Tuple
+from typing import List
 import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 def rolling_sharpe(returns: List[float], window: int = 20) -> List[float]:
-    r = np.array(returns, dtype=float)
-    out = []
-    for i in range(len(r)):
-        s = max(0, i - window + 1)
-        w = r[s : i + 1]
-        # use sample std (ddof=1) for unbiased volatility estimate
-        vol = np.std(w, ddof=1) if w.size > 1 else 0.0
-        if w.size < 2 or vol <= 0:
-            out.append(float("nan"))
-        else:
-            out.append(float(np.mean(w) / vol * np.sqrt(252)))
-    return out
+    r = np.asarray(returns, dtype=float)
+    # expanding until a full window is available, as before
+    roll = pd.Series(r).rolling(window, min_periods=1)
+    mean = roll.mean().to_numpy()
+    # use sample std (ddof=1) for unbiased volatility estimate
+    vol = roll.std(ddof=1).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = mean / vol * np.sqrt(252)
+    out[~(vol > 0)] = np.nan
+    return out.tolist()
 
 
 def rolling_sortino(returns: List[float], window: int = 20) -> List[float]:
-    r = np.array(returns, dtype=float)
-    out = []
-    for i in range(len(r)):
-        s = max(0, i - window + 1)
-        w = r[s : i + 1]
-        # downside semideviation over the full window: sqrt(mean(min(w,0)^2))
-        downside = np.minimum(w, 0.0)
-        dd = float(np.sqrt(np.mean(np.square(downside)))) if w.size > 0 else 0.0
-        if w.size < 2 or dd <= 0:
-            out.append(float("nan"))
-        else:
-            out.append(float(np.mean(w) / dd * np.sqrt(252)))
-    return out
+    r = np.asarray(returns, dtype=float)
+    mean = pd.Series(r).rolling(window, min_periods=1).mean().to_numpy()
+    # downside semideviation over the full window: sqrt(mean(min(w,0)^2))
+    downside = np.minimum(r, 0.0)
+    dd = np.sqrt(pd.Series(downside * downside).rolling(window, min_periods=1).mean().to_numpy())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = mean / dd * np.sqrt(252)
+    size = np.minimum(np.arange(r.size) + 1, window)
+    out[(size < 2) | ~(dd > 0)] = np.nan
+    return out.tolist()
 
 
 def rolling_calmar(returns: List[float], window: int = 60) -> List[float]:
-    r = np.array(returns, dtype=float)
+    r = np.asarray(returns, dtype=float)
+    n = r.size
+    if n == 0:
+        return []
     cum = np.cumprod(1.0 + r)
-    out = []
-    for i in range(len(r)):
-        s = max(0, i - window + 1)
-        # annualized return approx (daily compounding)
-        period = i - s + 1
-        if period < 2:
-            out.append(float("nan"))
-            continue
-        ret = (cum[i] / (cum[s - 1] if s > 0 else 1.0)) ** (252.0 / period) - 1.0
-        # max drawdown over window
-        window_cum = cum[s : i + 1]
-        peak = np.maximum.accumulate(window_cum)
-        mdd = np.max((peak - window_cum) / peak) if peak.size > 0 else 0.0
-        if mdd == 0:
-            out.append(float("nan"))
-        else:
-            out.append(float(ret / mdd))
-    return out
-
-
+    i = np.arange(n)
+    s = np.maximum(0, i - window + 1)
+    period = i - s + 1
+    # annualized return approx (daily compounding)
+    base = np.where(s > 0, cum[np.maximum(s - 1, 0)], 1.0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        ret = (cum / base) ** (252.0 / period) - 1.0
+
+    # max drawdown over window, measured from the running peak inside each window
+    mdd = np.empty(n)
+    head = min(n, window - 1)
+    if head > 0:
+        # expanding windows all start at 0, so one running peak covers them
+        peak = np.maximum.accumulate(cum[:head])
+        mdd[:head] = np.maximum.accumulate((peak - cum[:head]) / peak)
+    if n >= window:
+        windows = sliding_window_view(cum, window)
+        peaks = np.maximum.accumulate(windows, axis=1)
+        mdd[window - 1:] = ((peaks - windows) / peaks).max(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = ret / mdd
+    out[(period < 2) | (mdd == 0)] = np.nan
+    return out.tolist()
@@ -1,6 +1,8 @@
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 
+from .optimizer_nb import _bl_core, _mvo_core
+
 
 def mean_variance_optimize(
     expected_returns: np.ndarray,
@@ -16,23 +18,23 @@ def mean_variance_optimize(
     # Quadratic utility: maximize mu^T w - (risk_aversion/2) w^T Sigma w
     # -> Solve equivalent to minimize (risk_aversion/2) w^T Sigma w - mu^T w
     # Closed form for unconstrained: w* = (1/risk_aversion) Sigma^{-1} mu
-    try:
-        inv_cov = np.linalg.pinv(covariance)
-    except np.linalg.LinAlgError:
-        inv_cov = np.linalg.pinv(covariance + 1e-6 * np.eye(n))
-
-    raw_weights = (1.0 / risk_aversion) * inv_cov @ expected_returns
+    return _mvo_core(
+        np.ascontiguousarray(expected_returns, dtype=np.float64),
+        np.ascontiguousarray(covariance, dtype=np.float64),
+        float(risk_aversion),
+        bool(long_only),
+    )
 
-    if long_only:
-        raw_weights = np.maximum(raw_weights, 0.0)
 
-    # Normalize to sum to 1 if any positive weight exists; otherwise equal weight
-    s = raw_weights.sum()
-    if s > 0:
-        weights = raw_weights / s
-    else:
-        weights = np.ones(n) / n
-    return weights
+def _covariance_inverse(covariance: np.ndarray) -> np.ndarray:
+    cov = np.ascontiguousarray(covariance, dtype=np.float64)
+    try:
+        # Positive definite (the usual shrunk estimate): Sigma^{-1} = L^{-T} L^{-1}
+        L = np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(cov)
+    L_inv = np.linalg.solve(L, np.eye(cov.shape[0]))
+    return L_inv.T @ L_inv
 
 
 def black_litterman(
@@ -46,19 +48,35 @@ def black_litterman(
 ) -> np.ndarray:
 
     n = market_weights.shape[0]
-    inv_cov = np.linalg.pinv(covariance)
     # Implied equilibrium returns: pi = lambda * Sigma * w_m
     pi = risk_aversion * covariance @ market_weights
 
     if P.size == 0:
         return pi
+    inv_cov = _covariance_inverse(covariance)
 
     # Black-Litterman posterior
     tauSigma = tau * covariance
     if Omega is None or Omega.size == 0:
         Omega = np.diag(np.maximum(np.diag(P @ tauSigma @ P.T), 1e-8))
-    M = np.linalg.pinv(inv_cov + P.T @ np.linalg.pinv(Omega) @ P)
-    mu_bl = M @ (inv_cov @ pi + P.T @ np.linalg.pinv(Omega) @ Q)
+    omega_diag = np.diag(Omega)
+    if np.count_nonzero(Omega - np.diag(omega_diag)) == 0:
+        # Diagonal view uncertainty: invert elementwise (zero stays zero, as with pinv)
+        omega_inv = np.divide(1.0, omega_diag, out=np.zeros_like(omega_diag, dtype=float), where=omega_diag != 0)
+        return _bl_core(
+            inv_cov,
+            np.ascontiguousarray(pi, dtype=np.float64),
+            np.ascontiguousarray(P, dtype=np.float64),
+            np.ascontiguousarray(Q, dtype=np.float64),
+            omega_inv,
+        )
+    Pt_omega_inv = P.T @ np.linalg.pinv(Omega)
+    A = inv_cov + Pt_omega_inv @ P
+    b = inv_cov @ pi + Pt_omega_inv @ Q
+    try:
+        mu_bl = np.linalg.solve(A, b)
+    except np.linalg.LinAlgError:
+        mu_bl = np.linalg.pinv(A) @ b
     return mu_bl
 
 
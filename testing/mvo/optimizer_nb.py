@@ -0,0 +1,64 @@
+import numpy as np
+
+from tradingagents.utils.njit import njit, no_jit
+
+try:
+    # numba lowers np.linalg to SciPy's LAPACK bindings, so both are needed
+    import scipy  # noqa: F401
+except Exception:
+    njit = no_jit
+
+
+@njit(cache=True)
+def _sym_pinv_solve(cov, b):
+    # pinv(cov) @ b for a symmetric matrix via one eigendecomposition: same minimum-norm
+    # answer as the SVD-based pinv (same 1e-15 relative cutoff) at a fraction of the cost
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    cutoff = 1e-15 * np.max(np.abs(eigvals))
+    coeffs = eigvecs.T @ b
+    for k in range(eigvals.shape[0]):
+        if np.abs(eigvals[k]) > cutoff:
+            coeffs[k] = coeffs[k] / eigvals[k]
+        else:
+            coeffs[k] = 0.0
+    return eigvecs @ coeffs
+
+
+@njit(cache=True)
+def _mvo_core(mu, cov, risk_aversion, long_only):
+    n = mu.shape[0]
+    # w* = (1/risk_aversion) Sigma^{-1} mu; solve when Sigma is positive definite
+    try:
+        np.linalg.cholesky(cov)
+        raw_weights = np.linalg.solve(cov, mu) / risk_aversion
+    except Exception:
+        raw_weights = _sym_pinv_solve(cov, mu) / risk_aversion
+
+    if long_only:
+        raw_weights = np.maximum(raw_weights, 0.0)
+
+    # Normalize to sum to 1 if any positive weight exists; otherwise equal weight
+    s = raw_weights.sum()
+    if s > 0:
+        return raw_weights / s
+    return np.ones(n) / n
+
+
+@njit(cache=True)
+def _bl_core(inv_cov, pi, P, Q, omega_inv):
+    # Posterior with diagonal Omega: scale P's columns instead of forming Omega^{-1}
+    Pt_omega_inv = P.T * omega_inv
+    A = inv_cov + Pt_omega_inv @ P
+    b = inv_cov @ pi + Pt_omega_inv @ Q
+    try:
+        return np.linalg.solve(A, b)
+    except Exception:
+        return np.linalg.pinv(A) @ b
+
+
+def warmup() -> None:
+    """Compile (or load from the on-disk cache) the kernels before the first rebalance."""
+    eye = np.eye(2)
+    ones = np.ones(2)
+    _mvo_core(ones, eye, 1.0, True)
+    _bl_core(eye, ones, eye, ones, ones)
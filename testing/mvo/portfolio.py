@@ -3,35 +3,119 @@ import os
 import math
 from typing import Dict, Tuple, List
 
+import numpy as np
 
-def load_snapshot(path: str) -> Dict:
-    with open(path, "r") as f:
-        return json.load(f)
+from .portfolio_nb import _rebalance_core
 
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None
 
-def save_snapshot(path: str, snapshot: Dict) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w") as f:
-        json.dump(snapshot, f, indent=2)
+# Indented snapshot files are easier to eyeball but slower to write and ~2x larger
+PRETTY_SNAPSHOTS = os.getenv("MVO_PRETTY_SNAPSHOTS", "0") == "1"
+
+
+def load_snapshot(path: str) -> Dict:
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # e.g. NaN literals from files written by json.dump
+            pass
+    return json.loads(raw)
+
+
+def save_snapshot(path: str, snapshot: Dict, ensure_dir: bool = True) -> None:
+    # callers that already created the folder can skip the makedirs syscall
+    if ensure_dir:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if PRETTY_SNAPSHOTS else 0)
+        payload = orjson.dumps(snapshot, option=option)
+    else:
+        payload = json.dumps(snapshot, indent=2 if PRETTY_SNAPSHOTS else None).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+class PortfolioSoA:
+    """Struct-of-arrays form of a snapshot: one row per ticker, in portfolio order.
+
+    Snapshots stay dicts at the JSON boundary; convert with from_dict/to_dict.
+    """
+
+    def __init__(
+        self,
+        tickers: List[str],
+        qty: np.ndarray,
+        last_price: np.ndarray,
+        entry_price: np.ndarray,
+        cash: float = 0.0,
+    ):
+        self.tickers = list(tickers)
+        self.idx = {t: i for i, t in enumerate(self.tickers)}
+        self.qty = np.asarray(qty, dtype=np.int64)
+        self.last_price = np.asarray(last_price, dtype=float)
+        self.entry_price = np.asarray(entry_price, dtype=float)
+        self.cash = float(cash)
+
+    @classmethod
+    def from_dict(cls, snapshot: Dict) -> "PortfolioSoA":
+        portfolio = snapshot.get("portfolio", {})
+        infos = portfolio.values()
+        n = len(portfolio)
+        return cls(
+            list(portfolio),
+            np.fromiter((int(info.get("totalAmount", 0)) for info in infos), dtype=np.int64, count=n),
+            np.fromiter((float(info.get("last_price", 0.0)) for info in infos), dtype=float, count=n),
+            np.fromiter((float(info.get("entry_price", 0.0)) for info in infos), dtype=float, count=n),
+            snapshot.get("cash", 0.0),
+        )
+
+    def to_dict(self) -> Dict:
+        portfolio = {
+            t: {"totalAmount": q, "last_price": p, "entry_price": e}
+            for t, q, p, e in zip(
+                self.tickers, self.qty.tolist(), self.last_price.tolist(), self.entry_price.tolist()
+            )
+        }
+        return {"portfolio": portfolio, "cash": self.cash}
+
+    def append(self, tickers: List[str]) -> None:
+        # Empty rows (no shares, no prices) for tickers not yet held
+        for t in tickers:
+            self.idx[t] = len(self.tickers)
+            self.tickers.append(t)
+        k = len(tickers)
+        self.qty = np.concatenate([self.qty, np.zeros(k, dtype=np.int64)])
+        self.last_price = np.concatenate([self.last_price, np.zeros(k)])
+        self.entry_price = np.concatenate([self.entry_price, np.zeros(k)])
+
+    def prices_or_last(self, prices: Dict[str, float]) -> np.ndarray:
+        # Today's quote where there is one, else the last known price
+        return np.fromiter(
+            (float(prices.get(t, p)) for t, p in zip(self.tickers, self.last_price.tolist())),
+            dtype=float,
+            count=len(self.tickers),
+        )
+
+    def market_value(self) -> float:
+        return float(np.dot(self.qty, self.last_price))
 
 
 def compute_market_value(snapshot: Dict) -> float:
-    portfolio = snapshot.get("portfolio", {})
-    total = 0.0
-    for ticker, info in portfolio.items():
-        qty = float(info.get("totalAmount", 0))
-        price = float(info.get("last_price", 0.0))
-        total += qty * price
-    return total
+    return PortfolioSoA.from_dict(snapshot).market_value()
 
 
-def update_snapshot_prices(snapshot: Dict, prices: Dict[str, float]) -> Dict:
-    portfolio = snapshot.get("portfolio", {})
-    for ticker, info in portfolio.items():
-        if ticker in prices:
-            info["last_price"] = float(prices[ticker])
-    # update totals
-    market_value = compute_market_value(snapshot)
+def clone_portfolio(portfolio: Dict) -> Dict:
+    # Positions only hold scalars, so copying each position dict is a full copy
+    return {t: dict(info) for t, info in portfolio.items()}
+
+
+def _set_totals(snapshot: Dict, market_value: float) -> Dict:
     cash = float(snapshot.get("cash", 0.0))
     net_liq = market_value + cash
     snapshot["portfolio_value"] = net_liq
@@ -41,18 +125,25 @@ def update_snapshot_prices(snapshot: Dict, prices: Dict[str, float]) -> Dict:
     return snapshot
 
 
+def update_snapshot_prices(snapshot: Dict, prices: Dict[str, float]) -> Dict:
+    portfolio = snapshot.get("portfolio", {})
+    for ticker, info in portfolio.items():
+        if ticker in prices:
+            info["last_price"] = float(prices[ticker])
+    # update totals
+    return _set_totals(snapshot, compute_market_value(snapshot))
+
+
 def holdings_to_weights(snapshot: Dict, tickers: List[str]) -> List[float]:
-    market_value = compute_market_value(snapshot)
+    book = PortfolioSoA.from_dict(snapshot)
+    market_value = book.market_value()
     if market_value <= 0:
         return [0.0 for _ in tickers]
-    weights = []
-    portfolio = snapshot.get("portfolio", {})
-    for t in tickers:
-        qty = float(portfolio.get(t, {}).get("totalAmount", 0))
-        price = float(portfolio.get(t, {}).get("last_price", 0.0))
-        w = (qty * price) / market_value if market_value > 0 else 0.0
-        weights.append(w)
-    return weights
+    idx = np.fromiter((book.idx.get(t, -1) for t in tickers), dtype=np.intp, count=len(tickers))
+    found = idx >= 0
+    weights = np.zeros(len(tickers))
+    weights[found] = np.divide(book.qty[idx[found]] * book.last_price[idx[found]], market_value)
+    return weights.tolist()
 
 
 def apply_target_weights(
@@ -65,9 +156,8 @@ def apply_target_weights(
     portfolio_prev = snapshot_prev.get("portfolio", {})
     cash_prev = float(snapshot_prev.get("cash", 0.0))
     # compute current market value using latest prices
-    temp = {"portfolio": json.loads(json.dumps(portfolio_prev)), "cash": cash_prev}
-    temp = update_snapshot_prices(temp, prices)
-    market_value = compute_market_value(temp)
+    book = PortfolioSoA.from_dict(snapshot_prev)
+    market_value = float(np.dot(book.qty, book.prices_or_last(prices)))
     total_equity = market_value + cash_prev
 
     # target dollar per ticker
@@ -80,26 +170,26 @@ def apply_target_weights(
 
     for ticker, td in zip(tickers, target_dollars):
         price = float(prices.get(ticker, 0.0))
+        prev = portfolio_prev.get(ticker, {})
+        prev_qty = int(prev.get("totalAmount", 0))
         if price <= 0:
             # keep existing holdings if any
-            prev_qty = int(portfolio_prev.get(ticker, {}).get("totalAmount", 0))
             if prev_qty > 0:
                 new_portfolio[ticker] = {
                     "totalAmount": prev_qty,
-                    "last_price": price if price > 0 else float(portfolio_prev.get(ticker, {}).get("last_price", 0.0)),
-                    "entry_price": float(portfolio_prev.get(ticker, {}).get("entry_price", 0.0)),
+                    "last_price": float(prev.get("last_price", 0.0)),
+                    "entry_price": float(prev.get("entry_price", 0.0)),
                 }
             continue
 
         target_qty = int(td // price)
-        prev_qty = int(portfolio_prev.get(ticker, {}).get("totalAmount", 0))
 
         # adjust cash for delta shares
         delta_qty = target_qty - prev_qty
         cash -= delta_qty * price
 
         if target_qty > 0:
-            prev_entry = float(portfolio_prev.get(ticker, {}).get("entry_price", 0.0))
+            prev_entry = float(prev.get("entry_price", 0.0))
             if delta_qty > 0 and prev_qty > 0:
                 # weighted average cost for buys
                 new_entry = ((prev_qty * prev_entry) + (delta_qty * price)) / float(prev_qty + delta_qty)
@@ -141,164 +231,53 @@ def apply_partial_target_weights(
 ) -> Tuple[Dict, List[Tuple[str, int, int]]]:
 
     portfolio_prev = snapshot_prev.get("portfolio", {})
-    cash = float(snapshot_prev.get("cash", 0.0))
-
-    # Update prices first for accurate valuations
-    temp = {"portfolio": json.loads(json.dumps(portfolio_prev)), "cash": cash}
-    temp = update_snapshot_prices(temp, prices)
-    initial_total_equity = compute_market_value(temp) + float(temp.get("cash", 0.0))
-
-    # Compute subset equity (only rebalance within the subset), not full portfolio
-    market_value_total = compute_market_value(temp)
-    subset_value = 0.0
-    for t in target_weights_partial.keys():
-        qty = float(temp.get("portfolio", {}).get(t, {}).get("totalAmount", 0))
-        px = float(prices.get(t, temp.get("portfolio", {}).get(t, {}).get("last_price", 0.0)))
-        subset_value += qty * px
-    # Budget is current subset value plus available cash
-    total_equity = subset_value + cash
-
-    # Determine target dollars for subset only, cap per-name to 5% of total portfolio equity
-    total_portfolio_equity = market_value_total + cash
-    per_name_cap = 0.05 * total_portfolio_equity
-    target_dollars = {}
-    for t, w in target_weights_partial.items():
-        dollars = max(0.0, w) * total_equity
-        target_dollars[t] = min(dollars, per_name_cap)
-    target_qty = {}
-    for t, dollars in target_dollars.items():
-        px = float(prices.get(t, portfolio_prev.get(t, {}).get("last_price", 0.0)))
-        if px <= 0:
-            target_qty[t] = int(portfolio_prev.get(t, {}).get("totalAmount", 0))
-        else:
-            target_qty[t] = int(dollars // px)
-
-    # First, sell down within subset to free cash
-    changes: List[Tuple[str, int, int]] = []
-    for t, tq in target_qty.items():
-        prev_q = int(portfolio_prev.get(t, {}).get("totalAmount", 0))
-        px = float(prices.get(t, portfolio_prev.get(t, {}).get("last_price", 0.0)))
-        if tq < prev_q:
-            sell_q = prev_q - tq
-            cash += sell_q * px
-            changes.append((t, prev_q, tq))
-
-    # Then, buy within remaining budget for those needing increase
-    buy_reqs = []
-    for t, tq in target_qty.items():
-        prev_q = int(portfolio_prev.get(t, {}).get("totalAmount", 0))
-        if tq > prev_q:
-            px = float(prices.get(t, portfolio_prev.get(t, {}).get("last_price", 0.0)))
-            need_q = tq - prev_q
-            cost = need_q * px
-            buy_reqs.append((t, need_q, px, cost))
-
-    total_cost = sum(c for _, _, _, c in buy_reqs)
-    scale = 1.0
-    # Global cap: don't deploy more than available cash or 5% of total portfolio equity
-    allowable_budget = min(cash, 0.05 * total_portfolio_equity)
-    if total_cost > allowable_budget and total_cost > 0:
-        scale = allowable_budget / total_cost
-
-    # Apply buys with scaling if needed
-    new_portfolio = json.loads(json.dumps(portfolio_prev))
-    applied_buys = []  # track (t, buy_q, px)
-    for t, need_q, px, cost in buy_reqs:
-        buy_q = int(need_q * scale)
-        if buy_q <= 0:
-            continue
-        prev_q = int(new_portfolio.get(t, {}).get("totalAmount", 0))
-        new_q = prev_q + buy_q
-        cash -= buy_q * px
-        prev_entry = float(new_portfolio.get(t, {}).get("entry_price", 0.0))
-        if prev_q > 0:
-            new_entry = ((prev_q * prev_entry) + (buy_q * px)) / float(new_q)
-        else:
-            new_entry = px
-        new_portfolio[t] = {
-            "totalAmount": new_q,
-            "last_price": px,
-            "entry_price": float(new_entry),
+    book = PortfolioSoA.from_dict(snapshot_prev)
+    book.append([t for t in target_weights_partial if t not in book.idx])
+    names = list(target_weights_partial)
+    sub = np.fromiter((book.idx[t] for t in names), dtype=np.int64, count=len(names))
+    weights = np.fromiter(target_weights_partial.values(), dtype=float, count=len(names))
+
+    # Sell-first/buy-second sizing, unwind and emergency sells run in the compiled kernel
+    cash, initial_total_equity, touched, prune, change_rows, change_prev, change_new = _rebalance_core(
+        book.qty,
+        book.last_price,
+        book.entry_price,
+        book.prices_or_last(prices),
+        sub,
+        weights,
+        book.cash,
+    )
+    changes: List[Tuple[str, int, int]] = [
+        (book.tickers[i], q0, q1)
+        for i, q0, q1 in zip(change_rows.tolist(), change_prev.tolist(), change_new.tolist())
+    ]
+
+    # Untouched holdings are carried over as they were; only rows the
+    # rebalance changed are rebuilt (new tickers land at the end, in order)
+    new_portfolio = clone_portfolio(portfolio_prev)
+    for i in np.flatnonzero(touched).tolist():
+        new_portfolio[book.tickers[i]] = {
+            "totalAmount": int(book.qty[i]),
+            "last_price": float(book.last_price[i]),
+            "entry_price": float(book.entry_price[i]),
         }
-        changes.append((t, prev_q, new_q))
-        applied_buys.append((t, buy_q, px))
-
-    # Final guard: never allow negative cash due to rounding
-    if cash < 0 and applied_buys:
-        # Unwind buys starting from largest cash usage
-        applied_buys.sort(key=lambda x: x[1] * x[2], reverse=True)
-        for t, bq, px in applied_buys:
-            if cash >= 0:
-                break
-            # remove 1 share at a time until cash >= 0 or no more to unwind
-            while bq > 0 and cash < 0:
-                prev_q = int(new_portfolio.get(t, {}).get("totalAmount", 0))
-                if prev_q <= 0:
-                    break
-                # unwind one share
-                new_q = prev_q - 1
-                cash += px
-                # recompute entry stays the same (removing a share at cost basis doesn't change average cost)
-                prev_entry = float(new_portfolio.get(t, {}).get("entry_price", 0.0))
-                new_portfolio[t]["totalAmount"] = new_q
-                new_portfolio[t]["last_price"] = px
-                new_portfolio[t]["entry_price"] = prev_entry
-                bq -= 1
-        # remove any tickers that reached zero
-        for t in list(new_portfolio.keys()):
-            if int(new_portfolio[t].get("totalAmount", 0)) <= 0:
-                del new_portfolio[t]
-
-    # If cash is still negative (e.g., inherited from prior days or no buys to unwind),
-    # enforce emergency sells across holdings to bring cash to non-negative.
-    if cash < 0:
-        shortfall = -cash
-        # Build sell candidates from all holdings with positive quantity and valid prices
-        sell_candidates = []  # (ticker, qty, px, market_value)
-        for t, info in list(new_portfolio.items()):
-            qty = int(info.get("totalAmount", 0))
-            if qty <= 0:
-                continue
-            px = float(prices.get(t, info.get("last_price", 0.0)))
-            if px <= 0:
-                continue
-            sell_candidates.append((t, qty, px, qty * px))
-        # Sort by largest market value first to minimize churn
-        sell_candidates.sort(key=lambda x: x[3], reverse=True)
-        for t, qty, px, _ in sell_candidates:
-            if shortfall <= 0:
-                break
-            # Compute shares to sell to cover remaining shortfall
-            sell_qty = min(qty, int(math.ceil(shortfall / px)))
-            if sell_qty <= 0:
-                continue
-            prev_q = int(new_portfolio.get(t, {}).get("totalAmount", 0))
-            new_q = prev_q - sell_qty
-            cash += sell_qty * px
-            shortfall = max(0.0, shortfall - sell_qty * px)
-            # Keep entry price constant on sells
-            prev_entry = float(new_portfolio.get(t, {}).get("entry_price", 0.0))
-            new_portfolio[t]["totalAmount"] = new_q
-            new_portfolio[t]["last_price"] = px
-            new_portfolio[t]["entry_price"] = prev_entry
-            changes.append((t, prev_q, new_q))
+    if prune:
         # Drop any positions that went to zero
-        for t in list(new_portfolio.keys()):
-            if int(new_portfolio[t].get("totalAmount", 0)) <= 0:
-                del new_portfolio[t]
+        for i in np.flatnonzero(book.qty <= 0).tolist():
+            new_portfolio.pop(book.tickers[i], None)
 
-    # Ensure all other tickers are preserved unchanged
     # Update prices and totals
     new_snapshot = {"portfolio": new_portfolio, "cash": float(cash)}
-    new_snapshot = update_snapshot_prices(new_snapshot, prices)
-    # Enforce equity invariance (no jump in net_liquidation due to rebalancing)
-    after_equity = compute_market_value(new_snapshot) + float(new_snapshot.get("cash", 0.0))
-    delta = initial_total_equity - after_equity
+    for t, info in new_portfolio.items():
+        if t in prices:
+            info["last_price"] = float(prices[t])
+    market_value = compute_market_value(new_snapshot)
+    # Enforce equity invariance (no jump in net_liquidation due to rebalancing);
+    # only cash moves, so the market value above still holds for the totals
+    delta = initial_total_equity - (market_value + new_snapshot["cash"])
     if abs(delta) > 1e-6:
-        new_snapshot["cash"] = float(new_snapshot.get("cash", 0.0) + delta)
-        # Recompute aggregates
-        new_snapshot = update_snapshot_prices(new_snapshot, prices)
-    return new_snapshot, changes
+        new_snapshot["cash"] = float(new_snapshot["cash"] + delta)
+    return _set_totals(new_snapshot, market_value), changes
 
 def force_cash_non_negative(snapshot: Dict, prices: Dict[str, float]) -> Dict:
     """
@@ -308,32 +287,30 @@ def force_cash_non_negative(snapshot: Dict, prices: Dict[str, float]) -> Dict:
     cash = float(snapshot.get("cash", 0.0))
     if cash >= 0:
         return update_snapshot_prices(snapshot, prices)
-    portfolio = json.loads(json.dumps(snapshot.get("portfolio", {})))
+    portfolio = clone_portfolio(snapshot.get("portfolio", {}))
     shortfall = -cash
-    sell_candidates = []  # (ticker, qty, px, mv)
-    for t, info in portfolio.items():
-        qty = int(info.get("totalAmount", 0))
-        if qty <= 0:
-            continue
-        px = float(prices.get(t, info.get("last_price", 0.0)))
-        if px <= 0:
-            continue
-        sell_candidates.append((t, qty, px, qty * px))
-    sell_candidates.sort(key=lambda x: x[3], reverse=True)
-    for t, qty, px, _ in sell_candidates:
-        if shortfall <= 0:
-            break
-        sell_qty = min(qty, int(math.ceil(shortfall / px)))
-        if sell_qty <= 0:
-            continue
-        prev_q = int(portfolio.get(t, {}).get("totalAmount", 0))
-        new_q = prev_q - sell_qty
-        cash += sell_qty * px
-        shortfall = max(0.0, shortfall - sell_qty * px)
-        prev_entry = float(portfolio.get(t, {}).get("entry_price", 0.0))
-        portfolio[t]["totalAmount"] = new_q
-        portfolio[t]["last_price"] = px
-        portfolio[t]["entry_price"] = prev_entry
+    book = PortfolioSoA.from_dict(snapshot)
+    book_px = book.prices_or_last(prices)
+    # Sell candidates: positive quantity and a valid price, largest market value first
+    cand = np.flatnonzero((book.qty > 0) & (book_px > 0))
+    cand = cand[np.argsort(-(book.qty[cand] * book_px[cand]), kind="stable")]
+    qty = book.qty[cand]
+    px = book_px[cand]
+    # Walking the candidates, every one before the first whose cumulative value
+    # covers the shortfall is sold out; that one sells just enough to cover the rest
+    cum_mv = np.cumsum(qty * px)
+    k = int(np.searchsorted(cum_mv, shortfall, side="left"))
+    sell_qty = qty.copy()
+    if k < len(cand):
+        remaining = shortfall - (cum_mv[k - 1] if k > 0 else 0.0)
+        sell_qty[k] = min(int(qty[k]), int(math.ceil(remaining / px[k])))
+        cand, sell_qty, px = cand[:k + 1], sell_qty[:k + 1], px[:k + 1]
+    cash += float(np.dot(sell_qty, px))
+    for i, q, p in zip(cand.tolist(), sell_qty.tolist(), px.tolist()):
+        info = portfolio[book.tickers[i]]
+        info["totalAmount"] = int(info.get("totalAmount", 0)) - q
+        info["last_price"] = p
+        info["entry_price"] = float(info.get("entry_price", 0.0))
     for t in list(portfolio.keys()):
         if int(portfolio[t].get("totalAmount", 0)) <= 0:
             del portfolio[t]
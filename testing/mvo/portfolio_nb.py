@@ -0,0 +1,168 @@
+import math
+
+import numpy as np
+
+from tradingagents.utils.njit import njit
+
+
+@njit(cache=True)
+def _rebalance_core(qty, last_price, entry_price, px, sub, weights, cash):
+    """Partial rebalance arithmetic over SoA rows (see apply_partial_target_weights).
+
+    qty/last_price/entry_price are updated in place. px is today's price (or the last
+    one) per row, sub the rows of the target tickers and weights their target weights.
+    Returns (cash, initial_total_equity, touched, prune, change_rows, change_prev,
+    change_new); change k moved row change_rows[k] from change_prev[k] to change_new[k].
+    """
+    n = qty.shape[0]
+    m = sub.shape[0]
+    touched = np.zeros(n, dtype=np.bool_)
+    change_rows = np.empty(2 * m + n, dtype=np.int64)
+    change_prev = np.empty(2 * m + n, dtype=np.int64)
+    change_new = np.empty(2 * m + n, dtype=np.int64)
+    n_changes = 0
+
+    # Value holdings at today's prices
+    market_value_total = 0.0
+    for i in range(n):
+        market_value_total += qty[i] * px[i]
+    initial_total_equity = market_value_total + cash
+
+    # Budget is current subset value plus available cash
+    subset_value = 0.0
+    for k in range(m):
+        subset_value += qty[sub[k]] * px[sub[k]]
+    total_equity = subset_value + cash
+
+    # Target dollars for the subset, capped per name to 5% of total portfolio equity
+    total_portfolio_equity = market_value_total + cash
+    per_name_cap = 0.05 * total_portfolio_equity
+    target_q = np.empty(m, dtype=np.int64)
+    for k in range(m):
+        i = sub[k]
+        if px[i] <= 0:
+            target_q[k] = qty[i]
+        else:
+            dollars = min(max(0.0, weights[k]) * total_equity, per_name_cap)
+            target_q[k] = int(dollars // px[i])
+
+    # First, sell down within subset to free cash
+    for k in range(m):
+        i = sub[k]
+        if target_q[k] < qty[i]:
+            cash += (qty[i] - target_q[k]) * px[i]
+            change_rows[n_changes] = i
+            change_prev[n_changes] = qty[i]
+            change_new[n_changes] = target_q[k]
+            n_changes += 1
+
+    # Then, buy within remaining budget for those needing increase
+    total_cost = 0.0
+    for k in range(m):
+        i = sub[k]
+        if target_q[k] > qty[i]:
+            total_cost += (target_q[k] - qty[i]) * px[i]
+    scale = 1.0
+    # Global cap: don't deploy more than available cash or 5% of total portfolio equity
+    allowable_budget = min(cash, 0.05 * total_portfolio_equity)
+    if total_cost > allowable_budget and total_cost > 0:
+        scale = allowable_budget / total_cost
+
+    buy_rows = np.empty(m, dtype=np.int64)
+    buy_q = np.empty(m, dtype=np.int64)
+    n_buys = 0
+    for k in range(m):
+        i = sub[k]
+        if target_q[k] <= qty[i]:
+            continue
+        bq = int((target_q[k] - qty[i]) * scale)
+        if bq <= 0:
+            continue
+        p = px[i]
+        prev_q = qty[i]
+        new_q = prev_q + bq
+        cash -= bq * p
+        if prev_q > 0:
+            entry_price[i] = ((prev_q * entry_price[i]) + (bq * p)) / new_q
+        else:
+            entry_price[i] = p
+        qty[i] = new_q
+        last_price[i] = p
+        touched[i] = True
+        buy_rows[n_buys] = i
+        buy_q[n_buys] = bq
+        n_buys += 1
+        change_rows[n_changes] = i
+        change_prev[n_changes] = prev_q
+        change_new[n_changes] = new_q
+        n_changes += 1
+    prune = False
+
+    # Final guard: never allow negative cash due to rounding
+    if cash < 0 and n_buys > 0:
+        # Unwind buys starting from largest cash usage
+        cost = np.empty(n_buys)
+        for b in range(n_buys):
+            cost[b] = -(buy_q[b] * px[buy_rows[b]])
+        for b in np.argsort(cost, kind="mergesort"):
+            if cash >= 0:
+                break
+            i = buy_rows[b]
+            # remove just enough of this buy to cover the shortfall, in one step
+            unwind = min(buy_q[b], qty[i], int(math.ceil(-cash / px[i])))
+            if unwind <= 0:
+                continue
+            qty[i] -= unwind
+            cash += unwind * px[i]
+        prune = True
+
+    # If cash is still negative, sell the largest holdings until it is covered
+    if cash < 0:
+        shortfall = -cash
+        cand = np.empty(n, dtype=np.int64)
+        n_cand = 0
+        for i in range(n):
+            if qty[i] > 0 and px[i] > 0:
+                cand[n_cand] = i
+                n_cand += 1
+        cand = cand[:n_cand]
+        mv = np.empty(n_cand)
+        for c in range(n_cand):
+            mv[c] = -(qty[cand[c]] * px[cand[c]])
+        for c in np.argsort(mv, kind="mergesort"):
+            if shortfall <= 0:
+                break
+            i = cand[c]
+            p = px[i]
+            sell_qty = min(qty[i], int(math.ceil(shortfall / p)))
+            if sell_qty <= 0:
+                continue
+            cash += sell_qty * p
+            shortfall = max(0.0, shortfall - sell_qty * p)
+            # Keep entry price constant on sells
+            change_rows[n_changes] = i
+            change_prev[n_changes] = qty[i]
+            change_new[n_changes] = qty[i] - sell_qty
+            n_changes += 1
+            qty[i] -= sell_qty
+            last_price[i] = p
+            touched[i] = True
+        prune = True
+
+    return (
+        cash,
+        initial_total_equity,
+        touched,
+        prune,
+        change_rows[:n_changes],
+        change_prev[:n_changes],
+        change_new[:n_changes],
+    )
+
+
+def warmup() -> None:
+    """Compile (or load from the on-disk cache) the rebalance kernel."""
+    rows = np.zeros(1, dtype=np.int64)
+    _rebalance_core(
+        np.ones(1, dtype=np.int64), np.ones(1), np.ones(1), np.ones(1), rows, np.ones(1), 1.0
+    )
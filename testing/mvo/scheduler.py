@@ -1,22 +1,31 @@
-import datetime as dt
 from typing import List
 
+import numpy as np
 
-def biweekly_rebalance_days(
+
+def biweekly_rebalance_mask(
     trading_dates: List[str], start_date: str
-) -> List[str]:
+) -> np.ndarray:
 
-    fmt = "%Y-%m-%d"
-    start = dt.datetime.strptime(start_date, fmt).date()
-    selected: List[str] = []
-    last_reb: dt.date = None
-    for d in trading_dates:
-        current = dt.datetime.strptime(d, fmt).date()
+    # Parse the whole calendar at once to day numbers; the walk is then integer compares
+    days = np.array(trading_dates, dtype="datetime64[D]").astype(np.int64)
+    start = int(np.datetime64(start_date, "D").astype(np.int64))
+    mask = np.zeros(len(days), dtype=bool)
+    last_reb = None
+    for i, current in enumerate(days.tolist()):
         if current < start:
             continue
-        if last_reb is None or (current - last_reb).days >= 14:
-            selected.append(d)
+        if last_reb is None or current - last_reb >= 14:
+            mask[i] = True
             last_reb = current
-    return selected
+    return mask
+
+
+def biweekly_rebalance_days(
+    trading_dates: List[str], start_date: str
+) -> List[str]:
+
+    mask = biweekly_rebalance_mask(trading_dates, start_date)
+    return [d for d, selected in zip(trading_dates, mask.tolist()) if selected]
 
 
@@ -1,21 +1,26 @@
 import os
 import json
 import math
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import numpy as np
 
-from mvo.data import read_prices_csv, previous_trading_day
+from mvo.data import read_prices_csv
 from mvo.optimizer import mean_variance_optimize, black_litterman, build_views_from_prices
-from mvo.portfolio import load_snapshot, save_snapshot, update_snapshot_prices, holdings_to_weights, apply_target_weights, apply_partial_target_weights, force_cash_non_negative
+from mvo.optimizer_nb import warmup as warmup_optimizer
+from mvo.portfolio_nb import warmup as warmup_portfolio
+from mvo.portfolio import PortfolioSoA, clone_portfolio, load_snapshot, save_snapshot, update_snapshot_prices, holdings_to_weights, apply_target_weights, apply_partial_target_weights, force_cash_non_negative
 from mvo.reporting import render_resizing_report
-from mvo.scheduler import biweekly_rebalance_days
+from mvo.scheduler import biweekly_rebalance_mask
 from mvo.llm_views import LLMViewsGenerator
 from mvo.metrics import rolling_sharpe, rolling_sortino, rolling_calmar
+from tradingagents.utils.ranking import top_by_value
 
 
 TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
 PRICES_CSV = os.path.join(TESTING_DIR, "stock_prices.csv")
+# tickers that get an LLM view on each rebalance
+MAX_VIEWS = 10
 
 
 def get_last_existing_snapshot_dir(base_dir: str, start_date: str) -> str:
@@ -43,14 +48,46 @@ def covariance_from_returns(returns: np.ndarray) -> np.ndarray:
     return np.cov(returns, rowvar=False) + 1e-8 * np.eye(returns.shape[1])
 
 
+def window_returns(prices_matrix: np.ndarray, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Day-over-day returns between rows start..stop-1; a return is defined where both
+    # closes exist and the previous one is positive, and is 0.0 elsewhere
+    if stop - start < 2:
+        empty = (0, prices_matrix.shape[1])
+        return np.zeros(empty), np.zeros(empty, dtype=bool)
+    p_prev = prices_matrix[start:stop - 1]
+    p_cur = prices_matrix[start + 1:stop]
+    valid = (p_prev > 0) & ~np.isnan(p_cur)
+    returns = np.where(valid, p_cur / np.where(valid, p_prev, 1.0) - 1.0, 0.0)
+    return returns, valid
+
+
+def book_prices(book: PortfolioSoA, prices_row: np.ndarray, tick_idx: Dict[str, int]) -> np.ndarray:
+    # Today's close per book row from a prices_matrix row; last price where there is none
+    cols = np.fromiter((tick_idx.get(t, -1) for t in book.tickers), dtype=np.intp, count=len(book.tickers))
+    today = np.where(cols >= 0, prices_row[cols], np.nan) if len(prices_row) else np.full(len(cols), np.nan)
+    return np.where(np.isnan(today), book.last_price, today)
+
+
+def daily_return(snapshot: Dict, prices_row: np.ndarray, tick_idx: Dict[str, int]) -> float:
+    # Holdings marked from their last prices to today's closes, over prior equity
+    book = PortfolioSoA.from_dict(snapshot)
+    mv_prev = book.market_value()
+    mv_today = float(np.dot(book.qty, book_prices(book, prices_row, tick_idx)))
+    equity_prev = mv_prev + book.cash
+    return (mv_today - mv_prev) / equity_prev if equity_prev > 0 else 0.0
+
+
 def run(start_date: str = "2025-01-06") -> None:
     base_dir = TESTING_DIR
+    # compile the optimizer and rebalance kernels up front rather than on the first rebalance day
+    warmup_optimizer()
+    warmup_portfolio()
 
     dates, date_to_prices = read_prices_csv(PRICES_CSV)
     dates_sorted = sorted(dates)
 
-    # determine rebalancing days
-    rebalance_days = set(biweekly_rebalance_days(dates_sorted, start_date))
+    # determine rebalancing days: rebalance_mask[i] is set for dates_sorted[i]
+    rebalance_mask = biweekly_rebalance_mask(dates_sorted, start_date)
 
     # starting portfolio: previous folder snapshot or portfolio.json in root
     prev_dir = get_last_existing_snapshot_dir(base_dir, start_date)
@@ -62,6 +99,13 @@ def run(start_date: str = "2025-01-06") -> None:
 
     # union of tickers from snapshot portfolio
     tickers = list(snapshot.get("portfolio", {}).keys())
+    # positions in the calendar and ticker list, looked up once per rebalance
+    tick_idx = {t: i for i, t in enumerate(tickers)}
+    date_idx: Dict[str, int] = {}
+    for i, d in enumerate(dates_sorted):
+        date_idx.setdefault(d, i)
+    # dense closes aligned to dates_sorted x tickers; NaN where a ticker has no close
+    prices_matrix = date_to_prices.reindex(dates_sorted, tickers)
 
     # set up LLM views generator
     api_key = os.getenv("OPENAI_API_KEY")
@@ -71,184 +115,160 @@ def run(start_date: str = "2025-01-06") -> None:
     llm = LLMViewsGenerator(api_key=api_key)
     use_llm_api = os.getenv("USE_LLM_API", "0") == "1"
 
-    # track portfolio daily returns for metrics
-    daily_returns = []
-
     # progress log file
     results_dir = os.path.join(base_dir, "results")
     os.makedirs(results_dir, exist_ok=True)
     progress_path = os.path.join(results_dir, "progress.log")
-
-    # walk through dates from start_date to last available
-    for d in dates_sorted:
-        if d < start_date:
-            continue
-        print(f"Processing {d} ...", flush=True)
+    # one line-buffered handle for the whole walk instead of an open/close per line
+    try:
+        progress = open(progress_path, "a", buffering=1)
+    except Exception:
+        progress = None
+
+    def log_progress(line: str) -> None:
+        if progress is None:
+            return
         try:
-            with open(progress_path, "a") as pf:
-                pf.write(f"{d} start\n")
+            progress.write(line + "\n")
         except Exception:
             pass
-        day_dir = os.path.join(base_dir, d)
-        os.makedirs(day_dir, exist_ok=True)
-
-        prices_today: Dict[str, float] = date_to_prices.get(d, {})
-        # daily snapshot update if not rebalance
-        if d not in rebalance_days:
-            updated = update_snapshot_prices(json.loads(json.dumps(snapshot)), prices_today)
-            # enforce non-negative cash in all written snapshots
-            updated = force_cash_non_negative(updated, prices_today)
-            save_snapshot(os.path.join(day_dir, f"portfolio_snapshot_{d}.json"), updated)
-            # compute portfolio daily return
-            mv_prev = sum(
-                float(info.get("totalAmount", 0)) * float(info.get("last_price", 0.0))
-                for info in snapshot.get("portfolio", {}).values()
-            )
-            mv_today = sum(
-                float(info.get("totalAmount", 0)) * float(prices_today.get(t, info.get("last_price", 0.0)))
-                for t, info in snapshot.get("portfolio", {}).items()
-            )
-            cash_prev = float(snapshot.get("cash", 0.0))
-            equity_prev = mv_prev + cash_prev
-            r = (mv_today - mv_prev) / equity_prev if equity_prev > 0 else 0.0
-            daily_returns.append(r)
-            snapshot = updated
-            try:
-                with open(progress_path, "a") as pf:
-                    pf.write(f"{d} snapshot\n")
-            except Exception:
-                pass
-            print(f"{d} snapshot written", flush=True)
-            continue
 
-        # Rebalance using MVO-BLM
-        # build returns window (use last 10 trading days for LLM views; last 60 for covariance)
-        idx = dates_sorted.index(d)
-        # Strictly avoid lookahead: only use dates strictly before d
-        window_start_cov = max(0, idx - 60)
-        window_dates = dates_sorted[window_start_cov:idx]
-        returns_rows: List[List[float]] = []
-        for i in range(1, len(window_dates)):
-            prev_prices = date_to_prices.get(window_dates[i - 1], {})
-            cur_prices = date_to_prices.get(window_dates[i], {})
-            row = []
-            for t in tickers:
-                if t in prev_prices and t in cur_prices and prev_prices[t] > 0:
-                    r = (cur_prices[t] / prev_prices[t]) - 1.0
-                else:
-                    r = 0.0
-                row.append(r)
-            returns_rows.append(row)
-        returns_arr = np.array(returns_rows) if returns_rows else np.zeros((0, len(tickers)))
-
-        # historical estimates (shorter window to reduce instability)
-        if returns_arr.shape[0] > 0:
-            mu_hist = np.clip(returns_arr.mean(axis=0), -0.02, 0.02)
-            cov = covariance_from_returns(returns_arr)
-            # shrink covariance slightly to reduce leverage to tiny variances
-            cov = 0.9 * cov + 0.1 * np.mean(np.diag(cov)) * np.eye(cov.shape[0])
-        else:
-            mu_hist = np.zeros(len(tickers))
-            cov = np.eye(len(tickers)) * 1e-4
-
-        # market weights from current holdings
-        market_w = np.array(holdings_to_weights(snapshot, tickers))
-        if market_w.sum() == 0:
-            market_w = np.ones(len(tickers)) / max(1, len(tickers))
-
-        # LLM-generated views per paper: use last two weeks (approx 10 trading days)
-        window_start_llm = max(0, idx - 10)
-        window_dates_llm = dates_sorted[window_start_llm:idx]
-        # Limit optimization universe for speed: keep top N by current market value
-        N = 50
-        portfolio = snapshot.get("portfolio", {})
-        mv_pairs = []
-        for t in tickers:
-            qty = float(portfolio.get(t, {}).get("totalAmount", 0))
-            px = float(prices_today.get(t, portfolio.get(t, {}).get("last_price", 0.0)))
-            mv_pairs.append((t, qty * px))
-        mv_pairs.sort(key=lambda x: x[1], reverse=True)
-        opt_universe = [t for t, _ in mv_pairs[:N]]
-
-        # For LLM views, restrict to top 10 of that universe
-        top_views = opt_universe[:10]
-        per_ticker_returns: Dict[str, List[float]] = {t: [] for t in top_views}
-        for i in range(1, len(window_dates_llm)):
-            prev_prices = date_to_prices.get(window_dates_llm[i - 1], {})
-            cur_prices = date_to_prices.get(window_dates_llm[i], {})
-            for t in top_views:
-                if t in prev_prices and t in cur_prices and prev_prices[t] > 0:
-                    per_ticker_returns[t].append((cur_prices[t] / prev_prices[t]) - 1.0)
-        P_opt, Q, Omega = llm.generate(d, top_views, per_ticker_returns, num_samples=30, use_api=use_llm_api)
-        # Expand P to full universe (K x N) selecting columns for opt_universe
-        K = len(top_views)
-        N_full = len(tickers)
-        P = np.zeros((K, N_full))
-        idxs_full = [tickers.index(t) for t in top_views]
-        for i, j in enumerate(idxs_full):
-            P[i, j] = 1.0
-
-        # get BL-implied expected returns
-        risk_aversion = 5.0
-        mu_bl = black_litterman(market_w, cov, risk_aversion, P, Q, tau=0.05, Omega=Omega)
-
-        # optimize
-        # align mu_bl/cov to full ticker list by embedding opt_universe weights and zero otherwise
-        # compute target weights for opt_universe only
-        # map indices
-        idx_map = {t: i for i, t in enumerate(opt_universe)}
-        # reduce covariance to opt universe
-        # Build expected returns vector for opt universe
-        mu_opt = np.array([mu_bl[t] if isinstance(t, int) else mu_bl[tickers.index(t)] for t in opt_universe]) if len(opt_universe) > 0 else np.array([])
-        # Build covariance for opt universe from full cov
-        if len(opt_universe) > 0:
-            idxs = [tickers.index(t) for t in opt_universe]
-            cov_opt = cov[np.ix_(idxs, idxs)]
-            target_w_opt = mean_variance_optimize(mu_opt, cov_opt, risk_aversion=risk_aversion, long_only=True)
-        else:
-            target_w_opt = np.array([])
-        # convert to partial weights dict for top 10 holders only (reduce churn)
-        top10 = opt_universe[:10]
-        partial = {}
-        s = 0.0
-        for t, w in zip(opt_universe, target_w_opt.tolist() if target_w_opt.size else []):
-            if t in top10:
-                partial[t] = max(0.0, float(w))
-                s += partial[t]
-        if s > 0:
-            for t in list(partial.keys()):
-                partial[t] /= s
-        # apply partial rebalance to avoid removing other holdings and prevent negative cash
-        new_snapshot, changes = apply_partial_target_weights(snapshot, prices_today, partial)
-        # enforce non-negative cash before writing
-        new_snapshot = force_cash_non_negative(new_snapshot, prices_today)
-
-        # write outputs: snapshot and resizingReport.md
-        save_snapshot(os.path.join(day_dir, f"portfolio_snapshot_{d}.json"), new_snapshot)
-        report = render_resizing_report(d, changes)
-        with open(os.path.join(day_dir, "resizingReport.md"), "w") as f:
-            f.write(report)
-
-        # compute day return using pre-trade holdings to post-trade prices (approximation)
-        mv_prev = sum(
-            float(info.get("totalAmount", 0)) * float(info.get("last_price", 0.0))
-            for info in snapshot.get("portfolio", {}).values()
-        )
-        mv_today = sum(
-            float(info.get("totalAmount", 0)) * float(prices_today.get(t, info.get("last_price", 0.0)))
-            for t, info in snapshot.get("portfolio", {}).items()
-        )
-        cash_prev = float(snapshot.get("cash", 0.0))
-        equity_prev = mv_prev + cash_prev
-        r = (mv_today - mv_prev) / equity_prev if equity_prev > 0 else 0.0
-        daily_returns.append(r)
-        snapshot = new_snapshot
-        try:
-            with open(progress_path, "a") as pf:
-                pf.write(f"{d} rebalance\n")
-        except Exception:
-            pass
-        print(f"{d} rebalance written", flush=True)
+    # view pick matrix rows are reused across rebalances; the ticker list is fixed
+    view_P = np.zeros((MAX_VIEWS, len(tickers)))
+
+    # create every output folder up front
+    run_days = [d for d in dates_sorted if d >= start_date]
+    for d in dict.fromkeys(run_days):
+        os.makedirs(os.path.join(base_dir, d), exist_ok=True)
+
+    # track portfolio daily returns for metrics: one slot per walked day
+    daily_returns = np.zeros(len(run_days))
+    n_returns = 0
+
+    try:
+        # walk through dates from start_date to last available
+        for d in dates_sorted:
+            if d < start_date:
+                continue
+            print(f"Processing {d} ...", flush=True)
+            log_progress(f"{d} start")
+            day_dir = os.path.join(base_dir, d)
+
+            prices_today: Dict[str, float] = date_to_prices.get(d, {})
+            prices_row = prices_matrix[date_idx[d]]
+            # daily snapshot update if not rebalance
+            if not rebalance_mask[date_idx[d]]:
+                # positions are updated in place, so copy them; every other field is a scalar
+                updated = dict(snapshot)
+                updated["portfolio"] = clone_portfolio(snapshot.get("portfolio", {}))
+                updated = update_snapshot_prices(updated, prices_today)
+                # enforce non-negative cash in all written snapshots
+                updated = force_cash_non_negative(updated, prices_today)
+                save_snapshot(os.path.join(day_dir, f"portfolio_snapshot_{d}.json"), updated, ensure_dir=False)
+                # compute portfolio daily return
+                daily_returns[n_returns] = daily_return(snapshot, prices_row, tick_idx)
+                n_returns += 1
+                snapshot = updated
+                log_progress(f"{d} snapshot")
+                print(f"{d} snapshot written", flush=True)
+                continue
+
+            # Rebalance using MVO-BLM
+            # build returns window (use last 10 trading days for LLM views; last 60 for covariance)
+            idx = date_idx[d]
+            # Strictly avoid lookahead: only use dates strictly before d
+            window_start_cov = max(0, idx - 60)
+            returns_arr, _ = window_returns(prices_matrix, window_start_cov, idx)
+
+            # historical estimates (shorter window to reduce instability)
+            if returns_arr.shape[0] > 0:
+                mu_hist = np.clip(returns_arr.mean(axis=0), -0.02, 0.02)
+                cov = covariance_from_returns(returns_arr)
+                # shrink covariance slightly to reduce leverage to tiny variances
+                cov = 0.9 * cov + 0.1 * np.mean(np.diag(cov)) * np.eye(cov.shape[0])
+            else:
+                mu_hist = np.zeros(len(tickers))
+                cov = np.eye(len(tickers)) * 1e-4
+
+            # market weights from current holdings
+            market_w = np.array(holdings_to_weights(snapshot, tickers))
+            if market_w.sum() == 0:
+                market_w = np.ones(len(tickers)) / max(1, len(tickers))
+
+            # LLM-generated views per paper: use last two weeks (approx 10 trading days)
+            window_start_llm = max(0, idx - 10)
+            # Limit optimization universe for speed: keep top N by current market value
+            N = 50
+            book = PortfolioSoA.from_dict(snapshot)
+            held_mv = book.qty * book_prices(book, prices_row, tick_idx)
+            rows = np.fromiter((book.idx.get(t, -1) for t in tickers), dtype=np.intp, count=len(tickers))
+            mv_arr = np.where(rows >= 0, held_mv[rows], 0.0) if len(held_mv) else np.zeros(len(tickers))
+            opt_universe = [tickers[i] for i in top_by_value(mv_arr, N)]
+
+            # For LLM views, restrict to top 10 of that universe
+            top_views = opt_universe[:MAX_VIEWS]
+            view_cols = [tick_idx[t] for t in top_views]
+            llm_returns, llm_valid = window_returns(prices_matrix, window_start_llm, idx)
+            per_ticker_returns: Dict[str, List[float]] = {
+                t: llm_returns[llm_valid[:, j], j].tolist() for t, j in zip(top_views, view_cols)
+            }
+            P_opt, Q, Omega = llm.generate(d, top_views, per_ticker_returns, num_samples=30, use_api=use_llm_api)
+            # Expand P to full universe (K x N) selecting columns for opt_universe
+            K = len(top_views)
+            P = view_P[:K]
+            P[:] = 0.0
+            P[np.arange(K), view_cols] = 1.0
+
+            # get BL-implied expected returns
+            risk_aversion = 5.0
+            mu_bl = black_litterman(market_w, cov, risk_aversion, P, Q, tau=0.05, Omega=Omega)
+
+            # optimize
+            # align mu_bl/cov to full ticker list by embedding opt_universe weights and zero otherwise
+            # compute target weights for opt_universe only
+            # map indices
+            idx_map = {t: i for i, t in enumerate(opt_universe)}
+            # reduce covariance to opt universe
+            # Build expected returns vector for opt universe
+            idxs = np.array([tick_idx[t] for t in opt_universe], dtype=np.intp)
+            mu_opt = mu_bl[idxs]
+            # Build covariance for opt universe from full cov
+            if len(opt_universe) > 0:
+                cov_opt = cov[np.ix_(idxs, idxs)]
+                target_w_opt = mean_variance_optimize(mu_opt, cov_opt, risk_aversion=risk_aversion, long_only=True)
+            else:
+                target_w_opt = np.array([])
+            # convert to partial weights dict for top 10 holders only (reduce churn)
+            top10 = opt_universe[:10]
+            partial = {}
+            s = 0.0
+            for t, w in zip(opt_universe, target_w_opt.tolist() if target_w_opt.size else []):
+                if t in top10:
+                    partial[t] = max(0.0, float(w))
+                    s += partial[t]
+            if s > 0:
+                for t in list(partial.keys()):
+                    partial[t] /= s
+            # apply partial rebalance to avoid removing other holdings and prevent negative cash
+            new_snapshot, changes = apply_partial_target_weights(snapshot, prices_today, partial)
+            # enforce non-negative cash before writing
+            new_snapshot = force_cash_non_negative(new_snapshot, prices_today)
+
+            # write outputs: snapshot and resizingReport.md
+            save_snapshot(os.path.join(day_dir, f"portfolio_snapshot_{d}.json"), new_snapshot, ensure_dir=False)
+            report = render_resizing_report(d, changes)
+            with open(os.path.join(day_dir, "resizingReport.md"), "w") as f:
+                f.write(report)
+
+            # compute day return using pre-trade holdings to post-trade prices (approximation)
+            daily_returns[n_returns] = daily_return(snapshot, prices_row, tick_idx)
+            n_returns += 1
+            snapshot = new_snapshot
+            log_progress(f"{d} rebalance")
+            print(f"{d} rebalance written", flush=True)
+    finally:
+        if progress is not None:
+            progress.close()
 
     # After loop: write results summary with rolling metrics
     results_dir = os.path.join(base_dir, "results")
@@ -257,7 +277,7 @@ def run(start_date: str = "2025-01-06") -> None:
     sortino = rolling_sortino(daily_returns, window=20)
     calmar = rolling_calmar(daily_returns, window=60)
     with open(os.path.join(results_dir, "rolling_metrics.json"), "w") as f:
-        json.dump({"dates": [d for d in dates_sorted if d >= start_date], "sharpe": sharpe, "sortino": sortino, "calmar": calmar}, f, indent=2)
+        json.dump({"dates": run_days, "sharpe": sharpe, "sortino": sortino, "calmar": calmar}, f, indent=2)
 
 
 if __name__ == "__main__":
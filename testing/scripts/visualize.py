@@ -1,131 +1,217 @@
 import os
+import datetime as _dt
 import json
+import math
 import re
 
+try:
+    import numpy as np
+    from tradingagents.utils.ranking import top_by_value
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+
+from tradingagents.utils.njit import njit
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+@njit(cache=True)
+def _rolling_sharpe_welford(a, window, out):
+    # Welford add/remove over the trailing window, so no sum-of-squares cancellation;
+    # works on numpy arrays (compiled when numba is present) or plain lists
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(len(a)):
+        if i >= window:
+            x = a[i - window]
+            if not math.isnan(x):
+                n -= 1
+                if n == 0:
+                    mean = 0.0
+                    m2 = 0.0
+                else:
+                    delta = x - mean
+                    mean -= delta / n
+                    m2 -= delta * (x - mean)
+        x = a[i]
+        if not math.isnan(x):
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+        if n < 2:
+            continue
+        var = m2 / (n - 1)
+        if var > 0:
+            out[i] = mean / math.sqrt(var) * math.sqrt(252.0)
 
-def _rolling_sharpe_from_returns(returns, window=20):
-    try:
-        import numpy as _np
-    except Exception:
-        _np = None
 
+def _rolling_sharpe_from_returns(returns, window=20):
     n = len(returns)
-    out = []
-    for i in range(n):
-        s = max(0, i - window + 1)
-        w = [r for r in returns[s : i + 1] if r == r]
-        if len(w) < 2:
-            out.append(float("nan"))
-            continue
-        if _np is not None:
-            vol = float(_np.std(_np.array(w, dtype=float), ddof=1))
-            mean = float(_np.mean(_np.array(w, dtype=float)))
-        else:
-            m = sum(w) / len(w)
-            var = sum((x - m) * (x - m) for x in w) / (len(w) - 1) if len(w) > 1 else 0.0
-            vol = var ** 0.5
-            mean = m
-        if vol <= 0:
-            out.append(float("nan"))
-        else:
-            out.append(mean / vol * (252.0 ** 0.5))
+    if np is not None:
+        a = np.asarray(returns, dtype=np.float64)
+        out = np.full(n, np.nan)
+        _rolling_sharpe_welford(a, window, out)
+        return out
+    out = [float("nan")] * n
+    _rolling_sharpe_welford(returns, window, out)
     return out
 
 
+def _read_json(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # e.g. NaN literals written by the stdlib encoder
+            pass
+    return json.loads(raw)
+
+
+def _write_csv(path, header, rows):
+    # Format the whole file up front and hand it to a single write
+    with open(path, "w") as f:
+        f.write(header + "\n" + "".join(",".join(map(str, row)) + "\n" for row in rows))
+
+
+def _extract(snap):
+    # Keep only the fields the report reads so the parsed snapshot can be dropped
+    nl = float(snap.get("net_liquidation", snap.get("portfolio_value", 0.0)))
+    try:
+        positions = [
+            (t, info.get("totalAmount", 0), info.get("last_price", 0), info.get("entry_price", 0))
+            for t, info in snap.get("portfolio", {}).items()
+        ]
+    except Exception:
+        positions = []
+    return nl, positions
+
+
 def main() -> None:
     root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    date_re = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
-    dates = []
-    for name in os.listdir(root):
-        if date_re.match(name):
-            path = os.path.join(root, name, f"portfolio_snapshot_{name}.json")
-            if not os.path.exists(path):
+    # Parse each day's snapshot once; both passes below reuse the extracted fields
+    snaps = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not _DATE_RE.match(entry.name):
                 continue
+            path = os.path.join(entry.path, f"portfolio_snapshot_{entry.name}.json")
             try:
-                with open(path, "r") as f:
-                    snap = json.load(f)
-                nl = float(snap.get("net_liquidation", snap.get("portfolio_value", 0.0)))
-                dates.append((name, nl))
+                nl, positions = _extract(_read_json(path))
             except Exception:
-                pass
+                continue
+            snaps.append((entry.name, nl, positions))
 
-    dates.sort(key=lambda x: x[0])
+    snaps.sort(key=lambda x: x[0])
+    dates = [(name, nl) for name, nl, _ in snaps]
+    # Column views of dates, built once for the plots and the Sharpe CSV
+    day_names = [name for name, _ in dates]
+    vals = [v for _, v in dates]
     results_dir = os.path.join(root, "results")
     os.makedirs(results_dir, exist_ok=True)
 
     # Net liquidation CSV
-    with open(os.path.join(results_dir, "net_liquidation.csv"), "w") as f:
-        f.write("date,net_liquidation\n")
-        for d, v in dates:
-            f.write(f"{d},{v}\n")
+    _write_csv(os.path.join(results_dir, "net_liquidation.csv"), "date,net_liquidation", dates)
 
     # Try to write a PNG if matplotlib exists
+    sharpe = None
     try:
+        import matplotlib
+
+        # Files only: skip GUI backend selection
+        matplotlib.use("Agg")
         import matplotlib.pyplot as plt
-        import datetime as _dt
 
-        dts = [_dt.datetime.strptime(d, "%Y-%m-%d") for d, _ in dates]
-        vals = [v for _, v in dates]
+        dts = [_dt.datetime.fromisoformat(d) for d in day_names]
         if dts:
-            plt.figure(figsize=(10, 4))
-            plt.plot(dts, vals, lw=1.8)
-            plt.grid(True, alpha=0.3)
-            plt.title("Net Liquidation")
-            plt.xlabel("Date")
-            plt.ylabel("Net Liq")
-            plt.tight_layout()
-            plt.savefig(os.path.join(results_dir, "net_liquidation.png"))
-            plt.close()
+            # One figure for both charts; the axes are cleared between them
+            fig, ax = plt.subplots(figsize=(10, 4))
+            ax.plot(dts, vals, lw=1.8)
+            ax.grid(True, alpha=0.3)
+            ax.set_title("Net Liquidation")
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Net Liq")
+            fig.tight_layout()
+            fig.savefig(os.path.join(results_dir, "net_liquidation.png"))
 
         # Rolling Sharpe (window=20) based on daily returns from net liq
         if len(dts) >= 2:
             # daily returns
-            rets = [float("nan")]
-            for i in range(1, len(vals)):
-                prev = vals[i - 1]
-                cur = vals[i]
-                r = (cur / prev - 1.0) if prev > 0 else float("nan")
-                rets.append(r)
+            if np is not None:
+                v = np.asarray(vals, dtype=np.float64)
+                rets = np.full(len(v), np.nan)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    rets[1:] = np.where(v[:-1] > 0, v[1:] / v[:-1] - 1.0, np.nan)
+            else:
+                rets = [float("nan")] + [
+                    (cur / prev - 1.0) if prev > 0 else float("nan") for prev, cur in zip(vals, vals[1:])
+                ]
 
             sharpe = _rolling_sharpe_from_returns(rets, window=20)
 
             # CSV output
-            with open(os.path.join(results_dir, "rolling_sharpe.csv"), "w") as f:
-                f.write("date,rolling_sharpe_20d\n")
-                for d, s in zip([d for d, _ in dates], sharpe):
-                    f.write(f"{d},{s}\n")
+            _write_csv(
+                os.path.join(results_dir, "rolling_sharpe.csv"),
+                "date,rolling_sharpe_20d",
+                zip(day_names, sharpe),
+            )
 
             # Plot with default autoscaled y-limits (normal behavior)
-            plt.figure(figsize=(10, 4))
-            plt.plot(dts, sharpe, lw=1.6, color="#1f77b4")
-            plt.grid(True, alpha=0.3)
-            plt.title("Rolling Sharpe (20d)")
-            plt.xlabel("Date")
-            plt.ylabel("Sharpe")
-            plt.tight_layout()
-            plt.savefig(os.path.join(results_dir, "rolling_sharpe.png"))
-            plt.close()
+            ax.clear()
+            ax.plot(dts, sharpe, lw=1.6, color="#1f77b4")
+            ax.grid(True, alpha=0.3)
+            ax.set_title("Rolling Sharpe (20d)")
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Sharpe")
+            fig.tight_layout()
+            fig.savefig(os.path.join(results_dir, "rolling_sharpe.png"))
+        if dts:
+            plt.close(fig)
     except Exception:
         pass
 
+    # Typed columnar copy of the series for notebooks and dashboards; the CSVs stay as-is
+    if pa is not None and dates:
+        try:
+            columns = {
+                "date": pa.array(day_names, type=pa.string()),
+                "net_liquidation": pa.array(vals, type=pa.float64()),
+            }
+            if sharpe is not None:
+                columns["rolling_sharpe_20d"] = pa.array(sharpe, type=pa.float64())
+            pq.write_table(pa.table(columns), os.path.join(results_dir, "series.parquet"), compression="zstd")
+        except Exception:
+            pass
+
     # Top gainers/losers on latest observation per ticker
+    # Walk newest first, so the first open position seen for a ticker is its latest
     latest = {}
-    for name, _ in dates:
-        path = os.path.join(root, name, f"portfolio_snapshot_{name}.json")
+    for name, _, positions in reversed(snaps):
         try:
-            with open(path, "r") as f:
-                snap = json.load(f)
-            port = snap.get("portfolio", {})
-            for t, info in port.items():
-                qty = float(info.get("totalAmount", 0))
+            for t, qty, last, entry in positions:
+                if t in latest:
+                    continue
+                qty = float(qty)
                 if qty <= 0:
                     continue
-                last = float(info.get("last_price", 0))
-                entry = float(info.get("entry_price", 0)) or last
-                # Keep latest date entry
-                if t not in latest or name > latest[t]["date"]:
-                    latest[t] = {"date": name, "qty": qty, "last": last, "entry": entry}
+                last = float(last)
+                entry = float(entry) or last
+                latest[t] = {"date": name, "qty": qty, "last": last, "entry": entry}
         except Exception:
             pass
 
@@ -136,23 +222,23 @@ def main() -> None:
         ret = (last / entry - 1.0) if entry > 0 else 0.0
         items.append((t, ret, entry, last, data["qty"]))
 
-    items.sort(key=lambda x: x[1], reverse=True)
-    gainers = items[:20]
-    losers = sorted(items, key=lambda x: x[1])[:20]
-
-    with open(os.path.join(results_dir, "top_gainers.csv"), "w") as f:
-        f.write("ticker,return,entry,last,qty\n")
-        for t, r, e, l, q in gainers:
-            f.write(f"{t},{r},{e},{l},{q}\n")
+    if np is not None:
+        # Partial selection of the 20 best and worst instead of sorting every ticker twice
+        rets = np.array([x[1] for x in items], dtype=np.float64)
+        gainers = [items[i] for i in top_by_value(rets, 20)]
+        losers = [items[i] for i in top_by_value(-rets, 20)]
+    else:
+        items.sort(key=lambda x: x[1], reverse=True)
+        gainers = items[:20]
+        losers = sorted(items, key=lambda x: x[1])[:20]
 
-    with open(os.path.join(results_dir, "top_losers.csv"), "w") as f:
-        f.write("ticker,return,entry,last,qty\n")
-        for t, r, e, l, q in losers:
-            f.write(f"{t},{r},{e},{l},{q}\n")
+    _write_csv(os.path.join(results_dir, "top_gainers.csv"), "ticker,return,entry,last,qty", gainers)
+    _write_csv(os.path.join(results_dir, "top_losers.csv"), "ticker,return,entry,last,qty", losers)
 
     print("Wrote:")
     print(" - results/net_liquidation.csv")
     print(" - results/net_liquidation.png (if matplotlib available)")
+    print(" - results/series.parquet (if pyarrow available)")
     print(" - results/top_gainers.csv")
     print(" - results/top_losers.csv")
 
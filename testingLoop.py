@@ -1,10 +1,16 @@
 import argparse
-import copy
+import functools
+import json
+import math
+import pickle
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 import time
+import pandas as pd
 
 from tradingagents.graph.trading_graph import TradingAgentsGraph  # [`tradingagents.graph.trading_graph.TradingAgentsGraph`](tradingagents/graph/trading_graph.py)
 from tradingagents.default_config import DEFAULT_CONFIG  # [`DEFAULT_CONFIG`](tradingagents/default_config.py)
@@ -13,15 +19,21 @@ from tradingagents.agents.utils.agent_utils import Toolkit
 from tradingagents.agents.managers.MVO_BLM import size_positions
 from tradingagents.dataflows import interface as data_interface
 import yfinance as yf
-from tradingagents.agents.managers.MVO_BLM import size_positions
-from tradingagents.dataflows import interface as data_interface
-import yfinance as yf
 
 
 #./venv/bin/python testingLoop.py AAPL 2025-07-09 2025-07-10 --batch-5-range --outdir testing | cat
 
 
 dotenv.load_dotenv()
+GRAPH_INIT_LOCK = Lock()
+BATCH5_TICKERS = ["AAPL", "AMZN", "GOOG", "META", "NVDA"]
+
+# DEFAULT_CONFIG is never mutated, so pickle it once; unpickling gives a fresh deep copy
+# far cheaper than copy.deepcopy
+_DEFAULT_CONFIG_BLOB = pickle.dumps(DEFAULT_CONFIG)
+
+# get_price_from_csv re-reads the whole ticker CSV on every call
+_csv_close = functools.lru_cache(maxsize=None)(data_interface.get_price_from_csv)
 
 def daterange(start: datetime, end: datetime):
     days = (end - start).days
@@ -29,6 +41,11 @@ def daterange(start: datetime, end: datetime):
         yield start + timedelta(n)
 
 
+def day_strings(start: datetime, end: datetime) -> List[str]:
+    # YYYY-MM-DD for each day in [start, end], formatted once before the day loop
+    return [d.date().isoformat() for d in daterange(start, end)]
+
+
 def run_range(
     ticker: str,
     start_date: str,
@@ -41,8 +58,8 @@ def run_range(
 ):
     # Validate dates
     try:
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+        start_dt = datetime.fromisoformat(start_date)
+        end_dt = datetime.fromisoformat(end_date)
     except ValueError as e:
         raise ValueError(f"Invalid date format: {e} (expected YYYY-MM-DD)") from e
     if end_dt < start_dt:
@@ -54,11 +71,10 @@ def run_range(
     # Start banner
     print(f"🟢 Starting testing run: {ticker.upper()} {start_date} -> {end_date} | outdir={outdir}")
 
-    base_config = copy.deepcopy(DEFAULT_CONFIG) if deep_copy_config else DEFAULT_CONFIG.copy()
+    base_config = pickle.loads(_DEFAULT_CONFIG_BLOB) if deep_copy_config else DEFAULT_CONFIG.copy()
     graph = TradingAgentsGraph(debug=debug, config=base_config)
 
-    for current in daterange(start_dt, end_dt):
-        day_str = current.strftime("%Y-%m-%d")
+    for day_str in day_strings(start_dt, end_dt):
         fname = f"{ticker.upper()}_{day_str}.txt"
         fpath = out_path / fname
         if fpath.exists():
@@ -152,23 +168,37 @@ def _extract_action_and_rationale(final_state, final_decision) -> Tuple[str, str
         return str(final_decision), ""
 
 
+_ACTION_SCORES = {"BUY": 1.5, "SELL": 0.2, "HOLD": 1.0}
+
+
 def _weights_from_actions(actions: Dict[str, str]) -> Dict[str, float]:
     # Simple heuristic: BUY=1.5, HOLD=1.0, SELL=0.2, then normalize
-    raw = {}
-    for t, a in actions.items():
-        a_up = (a or "").upper()
-        score = 1.0
-        if a_up == "BUY":
-            score = 1.5
-        elif a_up == "SELL":
-            score = 0.2
-        elif a_up == "HOLD":
-            score = 1.0
-        raw[t] = max(0.0, float(score))
+    raw = {t: _ACTION_SCORES.get((a or "").upper(), 1.0) for t, a in actions.items()}
     s = sum(raw.values()) or 1.0
     return {t: round(v / s, 4) for t, v in raw.items()}
 
 
+def _format_decision(ticker: str, date_str: str, action: str, rationale: str) -> str:
+    # Per-ticker decision file body, built in one piece
+    return f"TICKER: {ticker}\nDATE: {date_str}\nDECISION: {action}\nRATIONALE:\n{rationale or ''}\n"
+
+
+def _read_saved_decision(path: Path) -> Tuple[str, str]:
+    # Inverse of _format_decision
+    text = path.read_text(encoding="utf-8")
+    action = "HOLD"
+    for ln in text.splitlines()[:5]:
+        if ln.startswith("DECISION:"):
+            action = ln.split(":", 1)[1].strip()
+            break
+    marker = "\nRATIONALE:\n"
+    ix = text.find(marker)
+    rationale = text[ix + len(marker):] if ix >= 0 else ""
+    if rationale.endswith("\n"):
+        rationale = rationale[:-1]
+    return action, rationale
+
+
 def run_batch5_single_day(
     date_str: str,
     out_root: str = "testing",
@@ -176,13 +206,22 @@ def run_batch5_single_day(
     deep_copy_config: bool = True,
     fail_fast: bool = False,
     show_trace: bool = False,
+    bulk_prices: pd.DataFrame | None = None,
 ):
-    tickers = ["AAPL", "AMZN", "GOOG", "META", "NVDA"]
+    tickers = list(BATCH5_TICKERS)
     out_date_dir = Path(out_root) / date_str
     out_date_dir.mkdir(parents=True, exist_ok=True)
 
-    base_config = copy.deepcopy(DEFAULT_CONFIG) if deep_copy_config else DEFAULT_CONFIG.copy()
-    graph = TradingAgentsGraph(debug=debug, config=base_config)
+    ticker_paths = {t: out_date_dir / f"{t}.txt" for t in tickers}
+    required = list(ticker_paths.values()) + [
+        out_date_dir / "portfolio_optimizer_report.md",
+        out_date_dir / "resizingReport.md",
+    ]
+    if all(p.exists() for p in required):
+        print(f"⏭️  Skip {date_str} (exists)")
+        return
+
+    base_config = pickle.loads(_DEFAULT_CONFIG_BLOB) if deep_copy_config else DEFAULT_CONFIG.copy()
 
     print(f"🟢 Starting batch-5 testing run for {date_str}: {', '.join(tickers)} | outdir={out_date_dir}")
     t0 = time.time()
@@ -190,31 +229,61 @@ def run_batch5_single_day(
     decisions: Dict[str, str] = {}
     rationales: Dict[str, str] = {}
 
-    for ticker in tickers:
+    def _ticker_config(ticker: str) -> Dict:
+        # The suffix keeps each graph's memory collections apart; nested values are
+        # only copied per ticker when a deep copy was requested
+        config = pickle.loads(_DEFAULT_CONFIG_BLOB) if deep_copy_config else base_config
+        return {**config, "memory_suffix": f"{ticker}_{date_str}"}
+
+    def _propagate(ticker: str, config: Dict):
+        # One graph per ticker so the LLM calls overlap; init is serialized
+        with GRAPH_INIT_LOCK:
+            graph = TradingAgentsGraph(debug=debug, config=config)
         print(f"🚀 {ticker} {date_str} starting")
-        try:
-            final_state, final_decision = graph.propagate(ticker, date_str)
-        except Exception as e:
-            print(f"❌ Error {ticker} {date_str}: {e}")
-            if show_trace:
-                traceback.print_exc()
-            if fail_fast:
-                raise
-            continue
+        return graph.propagate(ticker, date_str)
 
-        action, rationale = _extract_action_and_rationale(final_state, final_decision)
-        decisions[ticker] = action
-        rationales[ticker] = rationale
+    # Results are handled on this thread as they finish, so saves and prints never interleave
+    results: Dict[str, Tuple[str, str]] = {}
+    # Tickers already decided on an earlier run are read back instead of propagated again
+    pending = []
+    for t in tickers:
+        if ticker_paths[t].exists():
+            print(f"⏭️  Skip {t} {date_str} (exists)")
+            results[t] = _read_saved_decision(ticker_paths[t])
+        else:
+            pending.append(t)
+    executor = ThreadPoolExecutor(max_workers=max(1, len(pending)))
+    try:
+        futures = {executor.submit(_propagate, t, _ticker_config(t)): t for t in pending}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                final_state, final_decision = future.result()
+            except Exception as e:
+                print(f"❌ Error {ticker} {date_str}: {e}")
+                if show_trace:
+                    traceback.print_exc()
+                if fail_fast:
+                    # The handler below drops queued tickers and does not wait on running ones
+                    raise
+                continue
+
+            action, rationale = _extract_action_and_rationale(final_state, final_decision)
+            results[ticker] = (action, rationale)
+
+            ticker_paths[ticker].write_text(
+                _format_decision(ticker, date_str, action, rationale), encoding="utf-8"
+            )
+            print(f"✅ Saved -> {ticker_paths[ticker].as_posix()}")
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
 
-        file_text = "\n".join([
-            f"TICKER: {ticker}",
-            f"DATE: {date_str}",
-            f"DECISION: {action}",
-            "RATIONALE:", 
-            rationale or "",
-        ]) + "\n"
-        (out_date_dir / f"{ticker}.txt").write_text(file_text, encoding="utf-8")
-        print(f"✅ Saved -> {(out_date_dir / f'{ticker}.txt').as_posix()}")
+    # Keep decisions in ticker order regardless of completion order
+    for t in tickers:
+        if t in results:
+            decisions[t], rationales[t] = results[t]
 
     # Consolidated portfolio optimization based on decisions
     weights = _weights_from_actions(decisions)
@@ -239,8 +308,7 @@ def run_batch5_single_day(
         lines.append(f"- {t}: {w}")
     lines.append("\n## Risk Parity Reference\n")
     lines.append("```json")
-    import json as _json
-    lines.append(_json.dumps(rp, indent=2))
+    lines.append(json.dumps(rp, indent=2))
     lines.append("```")
     (out_date_dir / "portfolio_optimizer_report.md").write_text("\n".join(lines), encoding="utf-8")
     print(f"✅ Saved -> {(out_date_dir / 'portfolio_optimizer_report.md').as_posix()}")
@@ -250,11 +318,21 @@ def run_batch5_single_day(
         prices: Dict[str, float] = {}
         for t in tks:
             try:
-                prices[t] = float(data_interface.get_price_from_csv(t, d))
+                prices[t] = float(_csv_close(t, d))
             except Exception:
                 try:
-                    hist = yf.Ticker(t).history(period="1d")
-                    prices[t] = float(hist['Close'].iloc[-1]) if not hist.empty else 0.0
+                    px = math.nan
+                    if bulk_prices is not None and not bulk_prices.empty:
+                        # Range runs pass one prefetched download; take the last close on or before d
+                        try:
+                            px = float(bulk_prices[t]["Close"].dropna().asof(pd.Timestamp(d)))
+                        except KeyError:
+                            pass
+                    if math.isnan(px):
+                        # Not in the prefetch (or a failed, empty download): per-ticker lookup as before
+                        hist = yf.Ticker(t).history(period="1d")
+                        px = float(hist['Close'].iloc[-1]) if not hist.empty else 0.0
+                    prices[t] = px
                 except Exception:
                     prices[t] = 0.0
         return prices
@@ -304,11 +382,21 @@ def main():
             show_trace=args.trace,
         )
     elif args.batch_5_range:
-        start_dt = datetime.strptime(args.start_date, "%Y-%m-%d")
-        end_dt = datetime.strptime(resolved_end_date, "%Y-%m-%d")
-        cur = start_dt
-        while cur <= end_dt:
-            day = cur.strftime("%Y-%m-%d")
+        start_dt = datetime.fromisoformat(args.start_date)
+        end_dt = datetime.fromisoformat(resolved_end_date)
+        # One bulk download for the whole range instead of a yfinance call per ticker per day
+        try:
+            bulk_prices = yf.download(
+                BATCH5_TICKERS,
+                start=args.start_date,
+                end=(end_dt + timedelta(days=1)).date().isoformat(),
+                auto_adjust=True,
+                progress=False,
+                group_by="ticker",
+            )
+        except Exception:
+            bulk_prices = None
+        for day in day_strings(start_dt, end_dt):
             run_batch5_single_day(
                 date_str=day,
                 out_root=args.outdir,
@@ -316,8 +404,8 @@ def main():
                 deep_copy_config=not args.shallow_config,
                 fail_fast=args.fail_fast,
                 show_trace=args.trace,
+                bulk_prices=bulk_prices,
             )
-            cur += timedelta(days=1)
     else:
         run_range(
             args.ticker,
@@ -1,6 +1,8 @@
 import argparse
+import contextlib
 import copy
 import json
+import re
 import traceback
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -10,17 +12,25 @@ from typing import Dict, Tuple, List
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
+import numpy as np
 import pandas as pd
 try:
     import pandas_market_calendars as mcal
 except Exception:
     mcal = None
+try:
+    from filelock import FileLock  # type: ignore
+except Exception:
+    FileLock = None
 
+from tradingagents.utils.njit import njit
 from tradingagents.graph.trading_graph import TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
 from tradingagents.agents.utils.agent_utils import Toolkit
 from tradingagents.agents.managers.MVO_BLM.pipeline import size_positions
 from tradingagents.dataflows import interface as data_interface
+from tradingagents.dataflows.json_io import dumps_json, write_atomic
+from tradingagents.dataflows.price_cache import cached_close_price
 from langchain_openai import ChatOpenAI
 import yfinance as yf
 import dotenv
@@ -28,6 +38,123 @@ dotenv.load_dotenv()
 GRAPH_INIT_LOCK = Lock()
 
 
+def _portfolio_lock(portfolio_path: Path):
+    # Advisory lock around portfolio.json read-modify-write cycles (no-op without filelock)
+    if FileLock is None:
+        return contextlib.nullcontext()
+    return FileLock(f"{portfolio_path}.lock")
+
+
+_FTP_RE = re.compile(r"FINAL TRANSACTION PROPOSAL: \*\*(BUY|SELL|HOLD)\*\*", re.IGNORECASE)
+# Whole lines carrying a proposal, rewritten to the final decision when syncing .txt files
+_FTP_LINE_RE = re.compile(r"^.*FINAL TRANSACTION PROPOSAL:.*$", re.MULTILINE)
+_RATIONALE_RE = re.compile(r"^RATIONALE:$", re.MULTILINE)
+_SYNTH_RATIONALE = (
+    "RATIONALE:\n"
+    "Summary: Direction set to {decision} under long-only constraints.\n"
+    "Data sources: Polygon close (primary), local CSV, yfinance fallback.\n"
+    "Sizing: MVO-BLM long-only; HOLD treated as invest-at-minimum; SELL exits to zero.\n"
+    "FINAL TRANSACTION PROPOSAL: **{decision}**\n"
+    "\n"
+)
+
+
+def _position_arrays(portfolio: Dict[str, Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    qtys = np.fromiter((float(h.get("totalAmount", 0) or 0) for h in portfolio.values()), dtype=np.float64, count=len(portfolio))
+    pxs = np.fromiter((float(h.get("last_price", 0.0) or 0.0) for h in portfolio.values()), dtype=np.float64, count=len(portfolio))
+    return qtys, pxs
+
+
+def _net_liq(data: Dict) -> float:
+    qtys, pxs = _position_arrays(data.get("portfolio", {}))
+    return float(data.get("liquid", 0.0) or 0.0) + float(qtys @ pxs)
+
+
+@njit(cache=True)
+def _apply_trades(prices, proposed_targets, current_qtys, entry_prices, liquid):
+    """Execute the sized trades in order against liquid cash (long-only).
+
+    Rows with price <= 0 are skipped. Returns (new_qtys, new_entries, liquid, applied) where
+    applied[i] is 0 for untouched, 1 for last price only, 2 to also set the quantity and
+    3 to also set the entry price.
+    """
+    n = prices.shape[0]
+    new_qtys = current_qtys.copy()
+    new_entries = entry_prices.copy()
+    applied = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        price = prices[i]
+        if price <= 0:
+            continue
+        current_qty = current_qtys[i]
+        # Enforce no-shorting: clamp target to non-negative
+        delta = max(0, proposed_targets[i]) - current_qty
+        if delta > 0:
+            buy_qty = min(delta, int(liquid // price))
+            if buy_qty > 0:
+                new_qty = current_qty + buy_qty
+                # Entry price: weighted average for adds; reset when opening (or flipping from short)
+                if current_qty > 0 and entry_prices[i] > 0:
+                    new_entries[i] = ((entry_prices[i] * current_qty) + (price * buy_qty)) / max(new_qty, 1)
+                else:
+                    new_entries[i] = price
+                new_qtys[i] = new_qty
+                liquid -= buy_qty * price
+                applied[i] = 3
+        elif delta < 0:
+            # current_qty > 0 here; never sell below zero
+            sell_qty = min(-delta, current_qty)
+            new_qtys[i] = current_qty - sell_qty
+            applied[i] = 2
+            if new_qtys[i] == 0:
+                new_entries[i] = 0.0
+                applied[i] = 3
+            liquid += sell_qty * price
+        else:
+            # HOLD: update last_price only
+            applied[i] = 1
+    return new_qtys, new_entries, liquid, applied
+
+
+def _write_reval_snapshot(portfolio_path: Path, date_str: str, out_date_dir: Path, note: str) -> None:
+    """Revalue the saved portfolio at date_str closes and write the day's snapshot (no trades)."""
+    try:
+        with _portfolio_lock(portfolio_path):
+            data = json.loads(portfolio_path.read_bytes())
+    except FileNotFoundError:
+        data = {"portfolio": {}, "liquid": 1000000}
+    # Revalue last prices using close-price resolver (now prefers testing CSV)
+    for sym, info in list(data.get("portfolio", {}).items()):
+        try:
+            px = cached_close_price(sym, date_str)
+        except Exception:
+            px = float(info.get('last_price', 0.0) or 0.0)
+        info["last_price"] = px
+        data["portfolio"][sym] = info
+    # Compute net liquidation and write snapshot
+    liquid_cash = float(data.get("liquid", 0.0) or 0.0)
+    net_liq = _net_liq(data)
+    snap_path = out_date_dir / f"portfolio_snapshot_{date_str}.json"
+    enriched = dict(data)
+    enriched["net_liquidation"] = net_liq
+    enriched["portfolio_value"] = net_liq
+    enriched["cash"] = liquid_cash
+    enriched["buying_power"] = net_liq
+    snap_path.write_bytes(dumps_json(enriched))
+    print(f"📸 Portfolio snapshot saved ({note}) -> {snap_path.as_posix()}")
+
+
+def _proposal(text: str, priority: Tuple[str, ...]) -> str | None:
+    # Highest-priority action among every proposal in text, not simply the first one
+    found = {m.group(1).upper() for m in _FTP_RE.finditer(text)}
+    return next((a for a in priority if a in found), None)
+
+
+def _line_at(text: str, pos: int) -> str:
+    end = text.find("\n", pos)
+    return text[text.rfind("\n", 0, pos) + 1:end if end >= 0 else len(text)]
+
+
 def _extract_action_and_rationale(final_state, final_decision) -> Tuple[str, str]:
     try:
         action = None
@@ -41,13 +168,7 @@ def _extract_action_and_rationale(final_state, final_decision) -> Tuple[str, str
                     action = str(exec_info.get("action")).upper()
         if not action and isinstance(final_state, dict):
             plan = final_state.get("trader_investment_plan") or ""
-            text = str(plan).upper()
-            if "FINAL TRANSACTION PROPOSAL: **BUY**" in text:
-                action = "BUY"
-            elif "FINAL TRANSACTION PROPOSAL: **SELL**" in text:
-                action = "SELL"
-            elif "FINAL TRANSACTION PROPOSAL: **HOLD**" in text:
-                action = "HOLD"
+            action = _proposal(str(plan), ("BUY", "SELL", "HOLD"))
         if not action:
             action = "HOLD"
         rationale = ""
@@ -70,13 +191,7 @@ def _extract_action_and_rationale(final_state, final_decision) -> Tuple[str, str
                     rationale = " \n".join(parts)
         # Harmonize action with any explicit final proposal text in rationale
         if isinstance(rationale, str) and rationale:
-            up = rationale.upper()
-            if "FINAL TRANSACTION PROPOSAL: **SELL**" in up:
-                action = "SELL"
-            elif "FINAL TRANSACTION PROPOSAL: **BUY**" in up:
-                action = "BUY"
-            elif "FINAL TRANSACTION PROPOSAL: **HOLD**" in up:
-                action = "HOLD"
+            action = _proposal(rationale, ("SELL", "BUY", "HOLD")) or action
         return action, rationale
     except Exception:
         return str(final_decision), ""
@@ -150,14 +265,14 @@ def run_batch5_multithreaded(
     portfolio_path = (Path.cwd() / "testing" / "portfolio.json").resolve()
     portfolio_path.parent.mkdir(parents=True, exist_ok=True)
     if reset_portfolio or (not portfolio_path.exists()):
-        with open(portfolio_path, 'w') as f:
-            json.dump({"portfolio": {}, "liquid": 1000000}, f, indent=2)
+        with _portfolio_lock(portfolio_path):
+            write_atomic(portfolio_path, dumps_json({"portfolio": {}, "liquid": 1000000}))
         # Keep config/portfolio.json in sync (in case tools write there)
         try:
             config_portfolio_path = (Path.cwd() / "config" / "portfolio.json").resolve()
             config_portfolio_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(config_portfolio_path, 'w') as cf:
-                json.dump({"portfolio": {}, "liquid": 1000000}, cf, indent=2)
+            with _portfolio_lock(config_portfolio_path):
+                write_atomic(config_portfolio_path, dumps_json({"portfolio": {}, "liquid": 1000000}))
         except Exception:
             pass
 
@@ -166,41 +281,16 @@ def run_batch5_multithreaded(
     # Fast path: if today is NOT a rebalance day, skip any per-ticker decision/tech work
     # and only revalue the existing portfolio using testing CSV -> snapshot + metrics.
     if not rebalance_mode:
-        portfolio_path = (Path.cwd() / "testing" / "portfolio.json").resolve()
-        try:
-            with open(portfolio_path, 'r') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            data = {"portfolio": {}, "liquid": 1000000}
-        # Revalue last prices using close-price resolver (now prefers testing CSV)
-        for sym, info in list(data.get("portfolio", {}).items()):
-            try:
-                px = float(data_interface.get_close_price(sym, date_str))
-            except Exception:
-                px = float(info.get('last_price', 0.0) or 0.0)
-            info["last_price"] = px
-            data["portfolio"][sym] = info
-        # Compute net liquidation and write snapshot
-        liquid_cash = float(data.get("liquid", 0.0) or 0.0)
-        net_liq = liquid_cash
-        for sym, info in data.get("portfolio", {}).items():
-            qty = float(info.get("totalAmount", 0) or 0); px = float(info.get("last_price", 0.0) or 0.0)
-            net_liq += qty * px
-        snap_path = out_date_dir / f"portfolio_snapshot_{date_str}.json"
-        enriched = dict(data)
-        enriched["net_liquidation"] = net_liq
-        enriched["portfolio_value"] = net_liq
-        enriched["cash"] = liquid_cash
-        enriched["buying_power"] = net_liq
-        snap_path.write_text(json.dumps(enriched, indent=2), encoding="utf-8")
-        print(f"📸 Portfolio snapshot saved (reval only) -> {snap_path.as_posix()}")
+        _write_reval_snapshot(portfolio_path, date_str, out_date_dir, "reval only")
         return
 
     if run_pipelines:
+        # The pipelines mostly wait on LLM and data-vendor calls, so size the pool for I/O
         max_workers = min(32, max(1, len(tickers)))
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # base_config is only read; run_ticker layers memory_suffix on a shallow copy
             futures = [
-                executor.submit(run_ticker, t, date_str, out_date_dir, copy.deepcopy(base_config), debug, show_trace)
+                executor.submit(run_ticker, t, date_str, out_date_dir, base_config, debug, show_trace)
                 for t in tickers
             ]
             for future in as_completed(futures):
@@ -221,53 +311,69 @@ def run_batch5_multithreaded(
             d = "HOLD"
             if txt_path.exists():
                 try:
-                    lines = txt_path.read_text(encoding="utf-8").splitlines()
-                    for ln in lines[:5]:
+                    text = txt_path.read_text(encoding="utf-8")
+                    for ln in text.splitlines()[:5]:
                         if ln.startswith("DECISION:"):
                             d = ln.split(":", 1)[1].strip().upper()
                             break
                     if d == "HOLD":
                         # Check rationale FINAL TRANSACTION PROPOSAL if DECISION not found
-                        for ln in lines:
-                            up = ln.upper()
-                            if "FINAL TRANSACTION PROPOSAL: **BUY**" in up:
-                                d = "BUY"; break
-                            if "FINAL TRANSACTION PROPOSAL: **SELL**" in up:
-                                d = "SELL"; break
+                        # (first line with a BUY/SELL proposal; BUY wins within that line)
+                        for m in _FTP_RE.finditer(text):
+                            if m.group(1).upper() != "HOLD":
+                                d = _proposal(_line_at(text, m.start()), ("BUY", "SELL"))
+                                break
                 except Exception:
                     pass
             decisions[t] = d if d in ("BUY", "SELL", "HOLD") else "HOLD"
 
     # Technical regime and direction biasing (direction stays BUY/SELL/HOLD, MVO sizes only)
-    def _compute_tech_direction(sym: str, d: str) -> str:
+    tech_end = datetime.strptime(date_str, "%Y-%m-%d")
+    tech_start = tech_end - timedelta(days=260)
+
+    def _local_history(sym: str):
+        try:
+            df = data_interface.get_YFin_data(sym, tech_start.strftime('%Y-%m-%d'), date_str)
+            if isinstance(df, list) or isinstance(df, str):
+                return None
+            return df
+        except Exception:
+            return None
+
+    def _remote_history(sym: str, bulk):
+        # Slice the shared download; fetch the symbol alone only if it did not come back
+        try:
+            hist = bulk[sym].reset_index()[["Date", "Close"]]
+            if hist["Close"].notna().any():
+                return hist
+        except Exception:
+            pass
+        try:
+            hist = yf.Ticker(sym).history(start=tech_start, end=tech_end + timedelta(days=1))
+            if not hist.empty:
+                hist = hist.reset_index()[["Date", "Close"]]
+            return hist
+        except Exception:
+            return None
+
+    def _compute_tech_direction(hist) -> str:
         try:
-            end_dt = datetime.strptime(d, "%Y-%m-%d")
-            start_dt = end_dt - timedelta(days=260)
-            hist = None
-            try:
-                df = data_interface.get_YFin_data(sym, start_dt.strftime('%Y-%m-%d'), d)
-                if isinstance(df, list) or isinstance(df, str):
-                    raise Exception("bad df")
-                hist = df
-            except Exception:
-                hist = yf.Ticker(sym).history(start=start_dt, end=end_dt + timedelta(days=1))
-                if not hist.empty:
-                    hist = hist.reset_index()[["Date", "Close"]]
             if hist is None:
                 return "HOLD"
             if "Close" not in hist.columns:
                 return "HOLD"
-            closes = hist["Close"].astype(float).dropna()
+            closes = hist["Close"].astype(float).dropna().to_numpy()
             if len(closes) < 200:
                 return "HOLD"
-            sma50 = closes.rolling(50).mean().iloc[-1]
-            sma200 = closes.rolling(200).mean().iloc[-1]
+            # Only today's indicator values are used, so reduce the trailing windows directly
+            sma50 = closes[-50:].mean()
+            sma200 = closes[-200:].mean()
             # basic RSI (14)
-            delta = closes.diff()
-            up = delta.clip(lower=0)
-            down = -1 * delta.clip(upper=0)
-            rs = (up.rolling(14).mean() / (down.rolling(14).mean() + 1e-12)).iloc[-1]
-            rsi = 100 - (100 / (1 + rs)) if rs is not None else 50
+            delta = np.diff(closes[-15:])
+            up = delta.clip(min=0).mean()
+            down = -delta.clip(max=0).mean()
+            rs = up / (down + 1e-12)
+            rsi = 100 - (100 / (1 + rs))
             # More permissive BUY in uptrend; stricter SELL in downtrend
             if sma50 > sma200 and rsi < 80:
                 return "BUY"
@@ -277,29 +383,48 @@ def run_batch5_multithreaded(
         except Exception:
             return "HOLD"
 
-    def _market_regime(d: str) -> str:
+    def _market_regime(hist) -> str:
         try:
-            end_dt = datetime.strptime(d, "%Y-%m-%d")
-            start_dt = end_dt - timedelta(days=260)
-            hist = yf.Ticker("SPY").history(start=start_dt, end=end_dt + timedelta(days=1))
             if hist.empty:
                 return "NEUTRAL"
-            closes = hist["Close"].astype(float).dropna()
+            closes = hist["Close"].astype(float).dropna().to_numpy()
             if len(closes) < 200:
                 return "NEUTRAL"
-            sma50 = closes.rolling(50).mean().iloc[-1]
-            sma200 = closes.rolling(200).mean().iloc[-1]
+            sma50 = closes[-50:].mean()
+            sma200 = closes[-200:].mean()
             return "BULL" if sma50 > sma200 else "BEAR"
         except Exception:
             return "NEUTRAL"
 
-    regime = _market_regime(date_str)
-    tech_cache: Dict[str, str] = {}
+    # Each lookup waits on a price fetch: read local histories, then pull SPY and every
+    # ticker without one in a single multi-symbol download, and slice it per symbol
+    tech_syms = list(decisions.keys()) if run_pipelines else list(tickers)
+    with ThreadPoolExecutor(max_workers=min(32, len(tech_syms) + 1)) as executor:
+        local_hist = dict(zip(tech_syms, executor.map(_local_history, tech_syms)))
+        remote_syms = [sym for sym in tech_syms if local_hist[sym] is None]
+        try:
+            bulk = yf.download(
+                remote_syms + ["SPY"],
+                start=tech_start,
+                end=tech_end + timedelta(days=1),
+                group_by="ticker",
+                auto_adjust=True,
+                progress=False,
+                threads=True,
+            )
+        except Exception:
+            bulk = None
+        spy_future = executor.submit(_remote_history, "SPY", bulk)
+        remote_hist = dict(zip(remote_syms, executor.map(lambda sym: _remote_history(sym, bulk), remote_syms)))
+        regime = _market_regime(spy_future.result())
+    tech_cache: Dict[str, str] = {
+        sym: _compute_tech_direction(local_hist[sym] if local_hist[sym] is not None else remote_hist[sym])
+        for sym in tech_syms
+    }
     if run_pipelines:
         # Apply biasing only when pipelines produced initial decisions
         for t in list(decisions.keys()):
-            tech_dir = _compute_tech_direction(t, date_str)
-            tech_cache[t] = tech_dir
+            tech_dir = tech_cache[t]
             if regime == "BULL":
                 if decisions[t] == "SELL" and tech_dir != "SELL":
                     decisions[t] = "BUY"
@@ -311,10 +436,6 @@ def run_batch5_multithreaded(
             elif regime == "BEAR":
                 if decisions[t] == "BUY" and tech_dir == "SELL":
                     decisions[t] = "HOLD"
-    else:
-        # Populate tech cache even if not biasing
-        for t in tickers:
-            tech_cache[t] = _compute_tech_direction(t, date_str)
 
     # Global guardrails: cap total SELLs; ensure minimum BUYs
     sell_names = [t for t, a in decisions.items() if a == "SELL"]
@@ -333,16 +454,13 @@ def run_batch5_multithreaded(
 
     # Cap sells (only applicable when pipelines run)
     if run_pipelines:
-        while len([t for t, a in decisions.items() if a == "SELL"]) > max_sells:
-            for t, a in list(decisions.items()):
-                if a == "SELL" and tech_cache.get(t) != "SELL":
-                    decisions[t] = "BUY" if regime != "BEAR" else "HOLD"
-                    break
-            else:
-                for t, a in list(decisions.items()):
-                    if a == "SELL":
-                        decisions[t] = "HOLD"
-                        break
+        excess = len(sell_names) - max_sells
+        if excess > 0:
+            # Flip SELLs the technicals disagree with first (to BUY, or HOLD in a bear regime),
+            # then the remaining ones to HOLD; the stable sort keeps decision order within each group
+            flip = sorted(sell_names, key=lambda t: tech_cache.get(t) == "SELL")[:excess]
+            for t in flip:
+                decisions[t] = "BUY" if (regime != "BEAR" and tech_cache.get(t) != "SELL") else "HOLD"
 
     # Ensure minimum BUYs
     def _ensure_min_buys(target: int) -> None:
@@ -390,89 +508,31 @@ def run_batch5_multithreaded(
         if not txt_path.exists():
             continue
         try:
-            content = txt_path.read_text(encoding="utf-8").splitlines()
+            content = txt_path.read_text(encoding="utf-8")
+            decision_str = (decisions.get(t, 'HOLD') or 'HOLD').upper()
+            header = f"TICKER: {t}\nDATE: {date_str}\nDECISION: {decisions.get(t, 'HOLD')}\n"
             # Find rationale start
-            try:
-                r_ix = content.index("RATIONALE:")
-            except ValueError:
-                r_ix = None
-            header = [f"TICKER: {t}", f"DATE: {date_str}", f"DECISION: {decisions.get(t, 'HOLD')}"]
-            if r_ix is not None:
+            r_match = _RATIONALE_RE.search(content)
+            if r_match is not None:
+                tail = content[r_match.start():]
+                if not tail.endswith("\n"):
+                    tail += "\n"
                 # Rewrite any FINAL TRANSACTION PROPOSAL to match final decision
-                tail = content[r_ix:]
-                decision_str = (decisions.get(t, 'HOLD') or 'HOLD').upper()
-                for i in range(len(tail)):
-                    ln = tail[i]
-                    if "FINAL TRANSACTION PROPOSAL:" in ln:
-                        tail[i] = f"FINAL TRANSACTION PROPOSAL: **{decision_str}**"
+                tail = _FTP_LINE_RE.sub(f"FINAL TRANSACTION PROPOSAL: **{decision_str}**", tail)
                 # If rationale is empty/minimal, synthesize a concise rationale
-                if len(tail) <= 2:
-                    synth = [
-                        "RATIONALE:",
-                        f"Summary: Direction set to {decision_str} under long-only constraints.",
-                        "Data sources: Polygon close (primary), local CSV, yfinance fallback.",
-                        "Sizing: MVO-BLM long-only; HOLD treated as invest-at-minimum; SELL exits to zero.",
-                        f"FINAL TRANSACTION PROPOSAL: **{decision_str}**",
-                        "",
-                    ]
-                    tail = synth
-                new_lines = header + tail
+                if tail.count("\n") <= 2:
+                    tail = _SYNTH_RATIONALE.format(decision=decision_str)
             else:
-                # If no rationale marker, append a blank rationale section
-                decision_str = (decisions.get(t, 'HOLD') or 'HOLD').upper()
-                new_lines = header + [
-                    "RATIONALE:",
-                    f"Summary: Direction set to {decision_str} under long-only constraints.",
-                    "Data sources: Polygon close (primary), local CSV, yfinance fallback.",
-                    "Sizing: MVO-BLM long-only; HOLD treated as invest-at-minimum; SELL exits to zero.",
-                    f"FINAL TRANSACTION PROPOSAL: **{decision_str}**",
-                    "",
-                ]
+                # If no rationale marker, append a synthesized rationale section
+                tail = _SYNTH_RATIONALE.format(decision=decision_str)
+            final_text = header + tail
             # Truncate overly long files to keep rationale readable
-            final_text = "\n".join(new_lines) + "\n"
             if len(final_text) > 4000:
                 final_text = final_text[:4000] + "\n..."
             txt_path.write_text(final_text, encoding="utf-8")
         except Exception:
             pass
 
-    # If today is not a rebalance day, only revalue snapshot and exit
-    if not rebalance_mode:
-        portfolio_path = (Path.cwd() / "testing" / "portfolio.json").resolve()
-        try:
-            with open(portfolio_path, 'r') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            data = {"portfolio": {}, "liquid": 1000000}
-        # Revalue last prices using Polygon-backed resolver
-        for sym, info in list(data.get("portfolio", {}).items()):
-            try:
-                px = float(data_interface.get_close_price(sym, date_str))
-            except Exception:
-                try:
-                    start = datetime.strptime(date_str, "%Y-%m-%d"); end = start + timedelta(days=1)
-                    hist = yf.Ticker(sym).history(start=start, end=end)
-                    px = float(hist['Close'].iloc[-1]) if not hist.empty else float(info.get('last_price', 0.0) or 0.0)
-                except Exception:
-                    px = float(info.get('last_price', 0.0) or 0.0)
-            info["last_price"] = px
-            data["portfolio"][sym] = info
-        # Compute net liquidation and write snapshot
-        liquid_cash = float(data.get("liquid", 0.0) or 0.0)
-        net_liq = liquid_cash
-        for sym, info in data.get("portfolio", {}).items():
-            qty = float(info.get("totalAmount", 0) or 0); px = float(info.get("last_price", 0.0) or 0.0)
-            net_liq += qty * px
-        snap_path = out_date_dir / f"portfolio_snapshot_{date_str}.json"
-        enriched = dict(data)
-        enriched["net_liquidation"] = net_liq
-        enriched["portfolio_value"] = net_liq
-        enriched["cash"] = liquid_cash
-        enriched["buying_power"] = net_liq
-        snap_path.write_text(json.dumps(enriched, indent=2), encoding="utf-8")
-        print(f"📸 Portfolio snapshot saved (reval only) -> {snap_path.as_posix()}")
-        return
-
     # After threads finish: generate LLM-based views for BL (fallback to decisions mapping)
     def _generate_llm_views(cfg: Dict, syms: list[str], d: str) -> Dict[str, float]:
         try:
@@ -507,19 +567,34 @@ def run_batch5_multithreaded(
 
     # Run MVO-BLM sizing for the day (no shorting enforced in pipeline)
     def _get_prices_for_date(tks, d):
-        prices: Dict[str, float] = {}
-        for t in tks:
+        # Resolver lookups are I/O bound, so run them concurrently (memoized via cached_close_price)
+        def _resolve(t):
             try:
-                prices[t] = float(data_interface.get_close_price(t, d))
+                return cached_close_price(t, d)
             except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(16, len(tks) + 1)) as executor:
+            resolved = dict(zip(tks, executor.map(_resolve, tks)))
+        prices: Dict[str, float] = {t: px for t, px in resolved.items() if px is not None}
+        missing = [t for t in resolved if t not in prices]
+        if missing:
+            # One batched Yahoo request for every symbol the resolver could not price
+            start = datetime.strptime(d, "%Y-%m-%d")
+            end = start + timedelta(days=1)
+            try:
+                hist = yf.download(missing, start=start, end=end, group_by="ticker", auto_adjust=True, progress=False, threads=True)
+            except Exception:
+                hist = None
+            for t in missing:
                 try:
-                    start = datetime.strptime(d, "%Y-%m-%d")
-                    end = start + timedelta(days=1)
-                    hist = yf.Ticker(t).history(start=start, end=end)
-                    prices[t] = float(hist['Close'].iloc[-1]) if not hist.empty else 0.0
+                    # Single-symbol downloads may come back with flat columns
+                    closes = (hist[t]["Close"] if getattr(hist.columns, "nlevels", 1) > 1 else hist["Close"]).dropna()
+                    prices[t] = float(closes.iloc[-1]) if not closes.empty else 0.0
                 except Exception:
                     prices[t] = 0.0
-        return prices
+        # Keep the caller's ticker order
+        return {t: prices[t] for t in tks}
 
     print(f"🧮 [MVO-BLM] Fetching prices for {date_str}...")
     prices = _get_prices_for_date(tickers, date_str)
@@ -528,32 +603,7 @@ def run_batch5_multithreaded(
     if nonzero_prices == 0:
         print(f"Skipping {date_str}: no usable prices for any tickers.")
         # Fallback to revaluation-only snapshot
-        portfolio_path = (Path.cwd() / "testing" / "portfolio.json").resolve()
-        try:
-            with open(portfolio_path, 'r') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            data = {"portfolio": {}, "liquid": 1000000}
-        for sym, info in list(data.get("portfolio", {}).items()):
-            try:
-                px = float(data_interface.get_close_price(sym, date_str))
-            except Exception:
-                px = float(info.get('last_price', 0.0) or 0.0)
-            info["last_price"] = px
-            data["portfolio"][sym] = info
-        liquid_cash = float(data.get("liquid", 0.0) or 0.0)
-        net_liq = liquid_cash
-        for sym, info in data.get("portfolio", {}).items():
-            qty = float(info.get("totalAmount", 0) or 0); px = float(info.get("last_price", 0.0) or 0.0)
-            net_liq += qty * px
-        snap_path = out_date_dir / f"portfolio_snapshot_{date_str}.json"
-        enriched = dict(data)
-        enriched["net_liquidation"] = net_liq
-        enriched["portfolio_value"] = net_liq
-        enriched["cash"] = liquid_cash
-        enriched["buying_power"] = net_liq
-        snap_path.write_text(json.dumps(enriched, indent=2), encoding="utf-8")
-        print(f"📸 Portfolio snapshot saved (prices unavailable; reval best-effort) -> {snap_path.as_posix()}")
+        _write_reval_snapshot(portfolio_path, date_str, out_date_dir, "prices unavailable; reval best-effort")
         return
     portfolio_path = (Path.cwd() / "testing" / "portfolio.json").resolve()
     print(f"🚀 [MVO-BLM] Running sizing (long-only) for {date_str}...")
@@ -561,7 +611,9 @@ def run_batch5_multithreaded(
     # If rebalance_mode, derive decisions from LLM view signs so new positions can be opened
     if rebalance_mode and llm_views:
         decisions = {t: ("BUY" if llm_views.get(t, 0.0) > 0 else ("SELL" if llm_views.get(t, 0.0) < 0 else "HOLD")) for t in tickers}
-    trades = size_positions(tickers, date_str, decisions, str(portfolio_path), prices, views=llm_views)
+    # size_positions reads portfolio.json, so size against a consistent file
+    with _portfolio_lock(portfolio_path):
+        trades = size_positions(tickers, date_str, decisions, str(portfolio_path), prices, views=llm_views)
     mvo_runtime = round(time.time() - mvo_t0, 2)
     print(f"✅ [MVO-BLM] Completed sizing for {date_str} in {mvo_runtime}s")
 
@@ -576,104 +628,61 @@ def run_batch5_multithreaded(
     (out_date_dir / "resizingReport.md").write_text("\n".join(rr_lines), encoding="utf-8")
     print(f"✅ Saved -> {(out_date_dir / 'resizingReport.md').as_posix()}")
 
-    # Execute aggregated trades and then snapshot
-    try:
-        with open(portfolio_path, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = {"portfolio": {}, "liquid": 1000000}
-    if "portfolio" not in data or not isinstance(data["portfolio"], dict):
-        data["portfolio"] = {}
-    if "liquid" not in data or not isinstance(data["liquid"], (int, float)):
-        data["liquid"] = 1000000
-    # Enforce short exposure cap while executing aggregated trades
+    # Short exposure cap, applied to buying power on the post-trade snapshot
     MAX_SHORT_NOTIONAL = 200000.0
-    def _compute_short_notional(portfolio_dict: Dict[str, Dict[str, float]]) -> float:
-        total_short = 0.0
-        for _sym, _h in portfolio_dict.items():
-            qty = float(_h.get("totalAmount", 0) or 0)
-            px = float(_h.get("last_price", 0) or 0)
-            if qty < 0 and px > 0:
-                total_short += abs(qty) * px
-        return total_short
-
-    for sym, tr in (trades or {}).items():
-        price = float(tr.get("price", 0.0) or 0.0)
-        if price <= 0:
-            continue
-        holdings = data["portfolio"].get(sym, {"totalAmount": 0})
-        current_qty = int(holdings.get("totalAmount", 0))
-        # Enforce no-shorting: positions must be >= 0 at all times
-        decision_dir = (decisions.get(sym, "HOLD") or "HOLD").upper()
-        proposed_delta = int(tr.get("delta_shares", 0))
-        proposed_target = int(tr.get("target_qty", current_qty + proposed_delta))
-        # Clamp target to non-negative
-        desired_target_qty = max(0, proposed_target)
-        delta = desired_target_qty - current_qty
-        if delta > 0:
-            max_affordable = int((float(data.get("liquid", 0.0)) // price))
-            buy_qty = min(delta, max_affordable)
-            if buy_qty > 0:
-                cost = buy_qty * price
-                prev_qty = int(holdings.get("totalAmount", 0))
-                new_qty = prev_qty + buy_qty
-                holdings["totalAmount"] = new_qty
-                holdings["last_price"] = price
-                # Entry price: weighted average for adds; reset on side flip
-                prev_entry = float(holdings.get("entry_price", 0.0) or 0.0)
-                if prev_qty >= 0 and new_qty > 0:
-                    if prev_qty > 0 and prev_entry > 0:
-                        holdings["entry_price"] = ((prev_entry * prev_qty) + (price * buy_qty)) / max(new_qty, 1)
-                    else:
-                        holdings["entry_price"] = price
-                else:
-                    # Crossing from short to long in same tick: treat as new long entry
-                    holdings["entry_price"] = price
-                data["liquid"] = float(data.get("liquid", 0.0)) - cost
-        elif delta < 0:
-            sell_qty = abs(delta)
+
+    # Execute aggregated trades and then snapshot; hold the lock across read-modify-write
+    with _portfolio_lock(portfolio_path):
+        try:
+            data = json.loads(portfolio_path.read_bytes())
+        except FileNotFoundError:
+            data = {"portfolio": {}, "liquid": 1000000}
+        if "portfolio" not in data or not isinstance(data["portfolio"], dict):
+            data["portfolio"] = {}
+        if "liquid" not in data or not isinstance(data["liquid"], (int, float)):
+            data["liquid"] = 1000000
+        trade_rows = [(sym, tr, data["portfolio"].get(sym, {"totalAmount": 0})) for sym, tr in (trades or {}).items()]
+        trade_prices = np.zeros(len(trade_rows))
+        proposed_targets = np.zeros(len(trade_rows), dtype=np.int64)
+        current_qtys = np.zeros(len(trade_rows), dtype=np.int64)
+        entry_prices = np.zeros(len(trade_rows))
+        for i, (sym, tr, holdings) in enumerate(trade_rows):
+            price = float(tr.get("price", 0.0) or 0.0)
+            if price <= 0:
+                continue
             current_qty = int(holdings.get("totalAmount", 0))
-            # Do not allow crossing below zero
-            sell_qty = min(sell_qty, max(0, current_qty))
-
-            new_qty = current_qty - sell_qty
-            holdings["totalAmount"] = new_qty
-            proceeds = sell_qty * price
-            holdings["last_price"] = price
-            prev_entry = float(holdings.get("entry_price", 0.0) or 0.0)
-            # If selling increases short (current >=0 to <0, or already <0 and more negative)
-            if current_qty >= 0 and new_qty < 0:
-                # New short entry
-                holdings["entry_price"] = price
-            elif current_qty < 0 and new_qty < 0:
-                # Adding to existing short -> weighted average based on absolute shares
-                prev_abs = abs(current_qty)
-                new_abs = abs(new_qty)
-                add_abs = abs(delta)
-                if prev_abs > 0 and prev_entry > 0:
-                    holdings["entry_price"] = ((prev_entry * prev_abs) + (price * add_abs)) / max(new_abs, 1)
-                else:
-                    holdings["entry_price"] = price
-            elif new_qty == 0:
-                # Flat
-                holdings["entry_price"] = 0.0
-            data["liquid"] = float(data.get("liquid", 0.0)) + proceeds
-        else:
-            # HOLD: update last_price only
-            holdings["last_price"] = price
-        data["portfolio"][sym] = holdings
-    with open(portfolio_path, 'w') as f:
-        json.dump(data, f, indent=2)
+            proposed_delta = int(tr.get("delta_shares", 0))
+            trade_prices[i] = price
+            current_qtys[i] = current_qty
+            proposed_targets[i] = int(tr.get("target_qty", current_qty + proposed_delta))
+            entry_prices[i] = float(holdings.get("entry_price", 0.0) or 0.0)
+        new_qtys, new_entries, new_liquid, applied = _apply_trades(
+            trade_prices, proposed_targets, current_qtys, entry_prices, float(data.get("liquid", 0.0))
+        )
+        for i, (sym, _tr, holdings) in enumerate(trade_rows):
+            if trade_prices[i] <= 0:
+                continue
+            if applied[i] >= 2:
+                holdings["totalAmount"] = int(new_qtys[i])
+            if applied[i] >= 1:
+                holdings["last_price"] = float(trade_prices[i])
+            if applied[i] >= 3:
+                holdings["entry_price"] = float(new_entries[i])
+            data["portfolio"][sym] = holdings
+        if (applied >= 2).any():
+            data["liquid"] = float(new_liquid)
+        write_atomic(portfolio_path, dumps_json(data))
 
     # Snapshot now from persisted portfolio file but revalue positions with date-specific prices
     try:
-        persisted = json.loads(portfolio_path.read_text(encoding="utf-8"))
+        with _portfolio_lock(portfolio_path):
+            persisted = json.loads(portfolio_path.read_bytes())
     except Exception:
         persisted = data
     # Revalue last_price for each holding using the date's close
     for sym, info in list(persisted.get("portfolio", {}).items()):
         try:
-            px = float(data_interface.get_close_price(sym, date_str))
+            px = cached_close_price(sym, date_str)
         except Exception:
             try:
                 start = datetime.strptime(date_str, "%Y-%m-%d")
@@ -686,27 +695,22 @@ def run_batch5_multithreaded(
         persisted["portfolio"][sym] = info
     # Compute net liquidation and buying power with short cap
     liquid_cash = float(persisted.get("liquid", 0.0) or 0.0)
-    net_liq = liquid_cash
-    total_short_notional = 0.0
-    for sym, info in persisted.get("portfolio", {}).items():
-        qty = float(info.get("totalAmount", 0) or 0)
-        px = float(info.get("last_price", 0.0) or 0.0)
-        net_liq += qty * px
-        if qty < 0 and px > 0:
-            total_short_notional += abs(qty) * px
+    qtys, pxs = _position_arrays(persisted.get("portfolio", {}))
+    net_liq = liquid_cash + float(qtys @ pxs)
+    short = (qtys < 0) & (pxs > 0)
+    total_short_notional = float(-qtys[short] @ pxs[short])
     short_capacity_remaining = max(0.0, MAX_SHORT_NOTIONAL - total_short_notional)
     # Buying power: do not equate to liquid; combine long capacity proxy (net_liq positive) and remaining short capacity
     buying_power = max(0.0, net_liq) + short_capacity_remaining
     snap_path = out_date_dir / f"portfolio_snapshot_{date_str}.json"
-    with open(snap_path, 'w') as f:
-        # enrich snapshot with value metrics
-        enriched = dict(persisted)
-        enriched["net_liquidation"] = net_liq
-        # maintain legacy fields for compatibility
-        enriched["portfolio_value"] = net_liq
-        enriched["cash"] = liquid_cash
-        enriched["buying_power"] = buying_power
-        json.dump(enriched, f, indent=2)
+    # enrich snapshot with value metrics
+    enriched = dict(persisted)
+    enriched["net_liquidation"] = net_liq
+    # maintain legacy fields for compatibility
+    enriched["portfolio_value"] = net_liq
+    enriched["cash"] = liquid_cash
+    enriched["buying_power"] = buying_power
+    snap_path.write_bytes(dumps_json(enriched))
     print(f"📸 Portfolio snapshot saved -> {snap_path.as_posix()}")
 
     # Consolidated portfolio optimization based on decisions (summary)
@@ -786,9 +790,10 @@ def main():
             return
         for txt_path in out_date_dir.glob("*.txt"):
             try:
-                lines = txt_path.read_text(encoding="utf-8").splitlines()
+                text = txt_path.read_text(encoding="utf-8")
             except Exception:
                 continue
+            lines = text.splitlines()
             ticker = None
             decision = None
             for ln in lines[:5]:
@@ -798,16 +803,9 @@ def main():
                     decision = ln.split(":", 1)[1].strip().upper()
             if not ticker:
                 ticker = txt_path.stem.upper()
-            # Find final proposal
-            final = None
-            for ln in lines:
-                up = ln.upper()
-                if "FINAL TRANSACTION PROPOSAL: **BUY**" in up:
-                    final = "BUY"; break
-                if "FINAL TRANSACTION PROPOSAL: **SELL**" in up:
-                    final = "SELL"; break
-                if "FINAL TRANSACTION PROPOSAL: **HOLD**" in up:
-                    final = "HOLD"; break
+            # Find final proposal (first line with one; BUY > SELL > HOLD within that line)
+            m = _FTP_RE.search(text)
+            final = _proposal(_line_at(text, m.start()), ("BUY", "SELL", "HOLD")) if m else None
             dec = (final or decision or "HOLD").upper()
             # Long-only enforcement: convert SELL to HOLD
             if dec == "SELL":
@@ -819,10 +817,7 @@ def main():
                 r_ix = None
             header = [f"TICKER: {ticker}", f"DATE: {date_str}", f"DECISION: {dec}"]
             if r_ix is not None:
-                tail = lines[r_ix:]
-                for i in range(len(tail)):
-                    if "FINAL TRANSACTION PROPOSAL:" in tail[i]:
-                        tail[i] = f"FINAL TRANSACTION PROPOSAL: **{dec}**"
+                tail = _FTP_LINE_RE.sub(f"FINAL TRANSACTION PROPOSAL: **{dec}**", "\n".join(lines[r_ix:])).split("\n")
                 if len(tail) <= 2:
                     tail = [
                         "RATIONALE:",
@@ -1074,7 +1069,7 @@ def compute_backtest_statistics(start_date: str, end_date: str, out_root: str, m
                 snap["rolling_sharpe"] = rolling_sharpe[d]
                 snap["rolling_sortino"] = rolling_sortino[d]
                 snap["rolling_calmar"] = rolling_calmar[d]
-                snap_path.write_text(json.dumps(snap, indent=2), encoding="utf-8")
+                snap_path.write_bytes(dumps_json(snap))
         except Exception:
             pass
 
@@ -1095,16 +1090,17 @@ def compute_backtest_statistics(start_date: str, end_date: str, out_root: str, m
     try:
         portfolio_json = Path("testing/portfolio.json").resolve()
         if portfolio_json.exists():
-            port = json.loads(portfolio_json.read_text(encoding="utf-8"))
-            port["metrics"] = {
-                "as_of": ordered_days[-1],
-                "total_return": total_return,
-                "max_drawdown": max_drawdown,
-                "rolling_sharpe": rolling_sharpe[ordered_days[-1]],
-                "rolling_sortino": rolling_sortino[ordered_days[-1]],
-                "rolling_calmar": rolling_calmar[ordered_days[-1]],
-            }
-            portfolio_json.write_text(json.dumps(port, indent=2), encoding="utf-8")
+            with _portfolio_lock(portfolio_json):
+                port = json.loads(portfolio_json.read_bytes())
+                port["metrics"] = {
+                    "as_of": ordered_days[-1],
+                    "total_return": total_return,
+                    "max_drawdown": max_drawdown,
+                    "rolling_sharpe": rolling_sharpe[ordered_days[-1]],
+                    "rolling_sortino": rolling_sortino[ordered_days[-1]],
+                    "rolling_calmar": rolling_calmar[ordered_days[-1]],
+                }
+                write_atomic(portfolio_json, dumps_json(port))
     except Exception:
         pass
 
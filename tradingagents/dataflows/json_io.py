@@ -0,0 +1,34 @@
+"""JSON snapshot I/O shared by the backtest runners.
+
+Uses orjson when it is installed and falls back to the standard library.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None
+
+
+def dumps_json(data: Dict) -> bytes:
+    """Serialize data as indented JSON bytes (numpy values included with orjson)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+def read_json(path: Path) -> Dict:
+    raw = Path(path).read_bytes()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def write_atomic(path: Path, payload: bytes) -> None:
+    # Write a sibling temp file and swap it in so readers never see a partial file
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
@@ -0,0 +1,94 @@
+"""Memoized front for ``interface.get_close_price``, optionally disk-backed.
+
+Backtest runners ask for the same (symbol, date) closes many times across
+rebalance and revaluation days. Each pair is resolved once per process and kept
+in a per-symbol dict keyed by date. When ``MVO_BLM_CACHE_DIR`` is set, those
+closes are also persisted under ``$MVO_BLM_CACHE_DIR/<symbol>.parquet`` so later
+runs skip the resolver chain.
+"""
+
+import atexit
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Set
+
+import pandas as pd
+
+from . import interface
+
+# Disk cache is opt-in; without it closes are only memoized in-process
+CACHE_DIR = Path(os.environ["MVO_BLM_CACHE_DIR"]) if os.getenv("MVO_BLM_CACHE_DIR") else None
+# Closes for dates this close to the file's mtime may have been captured intraday
+STALE_AFTER_SECONDS = 24 * 60 * 60
+
+_closes: Dict[str, Dict[str, float]] = {}
+# Symbols with closes resolved since the last flush (only tracked with a disk cache)
+_dirty: Set[str] = set()
+_lock = threading.Lock()
+
+
+def _cache_path(symbol: str) -> Path:
+    return CACHE_DIR / f"{symbol.replace('/', '_')}.parquet"
+
+
+def _load_closes(symbol: str) -> Dict[str, float]:
+    if CACHE_DIR is None:
+        return {}
+    path = _cache_path(symbol)
+    try:
+        df = pd.read_parquet(path)
+        series = pd.Series(df["close"].to_numpy(dtype=float), index=df["date"].astype(str))
+    except Exception:
+        return {}
+    # Drop entries that were not at least one day old when the file was written
+    cutoff = time.strftime("%Y-%m-%d", time.localtime(path.stat().st_mtime - STALE_AFTER_SECONDS))
+    return series[series.index < cutoff].to_dict()
+
+
+def _persist(symbol: str, closes: Dict[str, float]) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        dates = sorted(closes)
+        df = pd.DataFrame({"date": dates, "close": [closes[d] for d in dates]})
+        df.to_parquet(_cache_path(symbol), index=False)
+    except Exception:
+        # No parquet engine or unwritable cache dir: keep the in-process cache only
+        pass
+
+
+def cached_close_price(ticker: str, date: str) -> float:
+    """Close for ticker on date, resolved once and then served from cache.
+
+    Raises like ``interface.get_close_price`` when no source has a price.
+    """
+    symbol = interface._normalize_ticker_base(ticker)
+    date_str = str(date).strip()[:10]
+    with _lock:
+        closes = _closes.get(symbol)
+        if closes is None:
+            closes = _closes[symbol] = _load_closes(symbol)
+        px = closes.get(date_str)
+    if px is not None:
+        return px
+    # Resolve outside the lock so concurrent lookups do not serialize on the network
+    px = float(interface.get_close_price(symbol, date_str))
+    with _lock:
+        closes[date_str] = px
+        if CACHE_DIR is not None:
+            _dirty.add(symbol)
+    return px
+
+
+def flush() -> None:
+    """Write symbols with newly resolved closes back to the disk cache."""
+    if CACHE_DIR is None:
+        return
+    with _lock:
+        for symbol in sorted(_dirty):
+            _persist(symbol, _closes[symbol])
+        _dirty.clear()
+
+
+atexit.register(flush)
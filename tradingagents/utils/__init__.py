@@ -0,0 +1,6 @@
+"""Small numeric helpers shared by the runners, the backtests under testing/ and the
+comparison algorithms.
+
+Kept free of the LLM and data-vendor imports so scripts that only need these helpers
+load without them.
+"""
@@ -0,0 +1,25 @@
+"""Optional numba JIT.
+
+Kernels decorated with ``njit`` compile with numba when it is installed and run as
+plain Python otherwise, so numba stays an optional dependency. This is the one shim
+for the repo: the indicator kernels, the MVO kernels under testing/, the visualize
+script and the multithreaded loop all import it from here.
+"""
+
+
+def no_jit(*args, **kwargs):
+    # Supports both ``@njit`` and ``@njit(cache=True)``
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+
+    def decorator(fn):
+        return fn
+    return decorator
+
+
+try:
+    from numba import njit  # type: ignore
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False
+    njit = no_jit
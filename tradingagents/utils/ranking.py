@@ -0,0 +1,14 @@
+import numpy as np
+
+
+def top_by_value(values: np.ndarray, n: int) -> np.ndarray:
+    # Indices of the n largest values, largest first; ties keep list order like a stable sort
+    k = min(n, len(values))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    if k < len(values):
+        kth = values[np.argpartition(-values, k - 1)[:k]].min()
+        cand = np.flatnonzero(values >= kth)
+    else:
+        cand = np.arange(len(values))
+    return cand[np.argsort(-values[cand], kind="stable")][:k]